@@ -0,0 +1,22 @@
+import pytest
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from response_fixtures import ResponseFactory
+
+
+@pytest.fixture(scope='session')
+def lambda_responses():
+    return ResponseFactory()
+
+
+@pytest.fixture
+def lambda_response(request, lambda_responses):
+    # Parametrize indirectly with a shape name or (name, overrides)
+    param = getattr(request, 'param', None)
+    if param is None:
+        pytest.fail('lambda_response needs indirect parametrization')
+    name, overrides = (param, None) if isinstance(param, str) else param
+    return lambda_responses.response(name, overrides)
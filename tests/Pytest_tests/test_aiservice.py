@@ -8,6 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import FUNCTION_NAME_PREFIX
 import lambda_utils as lutils
+from lambda_response import LambdaResponse
 
 @pytest.fixture
 def mock_lambda_client():
@@ -33,25 +34,11 @@ def mock_successful_response():
 
 def assert_response_format(response):
     """Helper function to validate response format"""
-    if isinstance(response, str):
-        try:
-            response_json = json.loads(response)
-        except json.JSONDecodeError:
-            pytest.fail("Response is not valid JSON")
-            return None
-    else:
-        response_json = response
-
-    if isinstance(response_json, dict) and "Payload" in response_json:
-        try:
-            payload = json.loads(response_json["Payload"])
-            if "body" in payload:
-                response_json = json.loads(payload["body"])
-        except json.JSONDecodeError:
-            pytest.fail("Response body is not valid JSON")
-            return None
-    
-    return response_json
+    try:
+        return LambdaResponse.parse(response).body
+    except ValueError:
+        pytest.fail("Response is not valid JSON")
+        return None
 
 class TestAiService:
     def test_get_service_by_id(self, mock_lambda_client, mock_successful_response):
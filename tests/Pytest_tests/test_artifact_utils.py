@@ -0,0 +1,110 @@
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lambda_utils as lutils
+import artifact_utils
+
+
+@pytest.fixture
+def local_s3():
+    return artifact_utils.LocalS3Client()
+
+
+@pytest.fixture
+def big_zip(tmp_path):
+    zip_file_name = tmp_path / 'yasanthi_launchTrain.zip'
+    zip_file_name.write_bytes(os.urandom(2500))
+    return str(zip_file_name)
+
+
+class TestArtifactStaging:
+    def test_multipart_upload_in_chunks(self, local_s3, big_zip):
+        """Test that large zips are uploaded part by part"""
+        code = artifact_utils.stage_artifact(big_zip, 'staging', 'lambda-artifacts/launchTrain.zip',
+                                             s3_client=local_s3, chunk_size=1000)
+
+        assert code == {'S3Bucket': 'staging', 'S3Key': 'lambda-artifacts/launchTrain.zip'}
+        assert local_s3.part_sizes == [1000, 1000, 500]
+        with open(big_zip, 'rb') as data:
+            assert local_s3.objects[('staging', 'lambda-artifacts/launchTrain.zip')] == data.read()
+        assert local_s3.uploads == {}
+
+    def test_failed_part_aborts_upload(self, local_s3, big_zip):
+        """Test that a failing part aborts the multipart upload"""
+        local_s3.upload_part = MagicMock(side_effect=Exception('SlowDown'))
+
+        with pytest.raises(Exception):
+            artifact_utils.stage_artifact(big_zip, 'staging', 'key.zip', s3_client=local_s3, chunk_size=1000)
+
+        assert local_s3.uploads == {}
+        assert ('staging', 'key.zip') not in local_s3.objects
+
+    def test_small_zip_stays_inline(self, local_s3, big_zip):
+        """Test that zips below the threshold are sent as ZipFile"""
+        code = artifact_utils.get_code(big_zip, 'yasanthi_launchTrain', 'staging', s3_client=local_s3)
+
+        assert set(code) == {'ZipFile'}
+        assert local_s3.objects == {}
+
+    def test_large_zip_is_staged(self, local_s3, big_zip):
+        """Test that zips above the threshold are passed as S3Bucket/S3Key"""
+        code = artifact_utils.get_code(big_zip, 'yasanthi_launchTrain', 'staging', s3_client=local_s3, threshold=100)
+
+        assert code == {'S3Bucket': 'staging', 'S3Key': 'lambda-artifacts/yasanthi_launchTrain.zip'}
+
+    def test_update_lambda_code_uses_staging_bucket(self, local_s3, big_zip):
+        """Test that update_lambda_code passes S3 locations for large zips"""
+        client = MagicMock()
+        output_dir = os.path.dirname(big_zip) + os.sep
+
+        with patch.object(artifact_utils, 'INLINE_ZIP_LIMIT', 100), \
+                patch.object(artifact_utils, '_s3_client', local_s3):
+            lutils.update_lambda_code('yasanthi_launchTrain', output_dir, 'ZIP', client=client, staging_bucket='staging')
+
+        kwargs = client.update_function_code.call_args.kwargs
+        assert kwargs['S3Bucket'] == 'staging'
+        assert 'ZipFile' not in kwargs
+
+
+@pytest.fixture
+def artifact_cache(tmp_path):
+    return artifact_utils.ArtifactCache(cache_dir=str(tmp_path / 'cache'), max_bytes=2500)
+
+
+class TestArtifactCache:
+    def test_one_download_serves_every_caller(self, local_s3, artifact_cache):
+        """Test that repeated lookups reuse the cached zip"""
+        local_s3.put_object(Bucket='code', Key='predict.zip', Body=b'predict code')
+        local_s3.download_file = MagicMock(side_effect=local_s3.download_file)
+
+        for _ in range(3):
+            assert artifact_cache.get_bytes('code', 'predict.zip', s3_client=local_s3) == b'predict code'
+
+        assert local_s3.download_file.call_count == 1
+        assert artifact_cache.hits == 2
+        assert artifact_cache.misses == 1
+
+    def test_changed_etag_downloads_again(self, local_s3, artifact_cache):
+        """Test that a new object version is not served from the cache"""
+        local_s3.put_object(Bucket='code', Key='predict.zip', Body=b'old code')
+        artifact_cache.get_bytes('code', 'predict.zip', s3_client=local_s3)
+        local_s3.put_object(Bucket='code', Key='predict.zip', Body=b'new code')
+
+        assert artifact_cache.get_bytes('code', 'predict.zip', s3_client=local_s3) == b'new code'
+        assert artifact_cache.misses == 2
+
+    def test_least_recently_used_is_evicted(self, local_s3, artifact_cache):
+        """Test that the cache stays under its size bound"""
+        for name in ['a.zip', 'b.zip', 'c.zip']:
+            local_s3.put_object(Bucket='code', Key=name, Body=os.urandom(1000))
+        first = artifact_cache.get('code', 'a.zip', s3_client=local_s3)
+        os.utime(first, (0, 0))
+        artifact_cache.get('code', 'b.zip', s3_client=local_s3)
+        artifact_cache.get('code', 'c.zip', s3_client=local_s3)
+
+        assert not os.path.exists(first)
+        assert artifact_cache.size() <= 2500
@@ -3,6 +3,12 @@ import json
 import boto3
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lambda_response import LambdaResponse
 
 FUNCTION_NAME_PREFIX = "yasanthi_"
 
@@ -31,25 +37,11 @@ def mock_successful_response():
 
 def assert_response_format(response):
     """Helper function to validate response format"""
-    if isinstance(response, str):
-        try:
-            response_json = json.loads(response)
-        except json.JSONDecodeError:
-            pytest.fail("Response is not valid JSON")
-            return None
-    else:
-        response_json = response
-
-    if isinstance(response_json, dict) and "Payload" in response_json:
-        try:
-            payload = json.loads(response_json["Payload"])
-            if "body" in payload:
-                response_json = json.loads(payload["body"])
-        except json.JSONDecodeError:
-            pytest.fail("Response body is not valid JSON")
-            return None
-    
-    return response_json
+    try:
+        return LambdaResponse.parse(response).body
+    except ValueError:
+        pytest.fail("Response is not valid JSON")
+        return None
 
 class TestAskAI:
     def test_ask_ai_with_service_id(self, mock_lambda_client, mock_successful_response):
@@ -0,0 +1,128 @@
+import pytest
+import asyncio
+import json
+import threading
+from unittest.mock import MagicMock, patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import boto3
+from config import FUNCTION_NAME_PREFIX
+import async_lambda
+import tracing
+
+
+class FakeLambdaHandler(BaseHTTPRequestHandler):
+    # Answers the Lambda Invoke API by echoing the event back in the body
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        function_name = self.path.split('/')[3]
+        event = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.connections.add(self.client_address)
+        if function_name.endswith('broken'):
+            status, payload = 404, {'Type': 'User', 'Message': 'Function not found'}
+            self.send_response(status)
+            self.send_header('x-amzn-ErrorType', 'ResourceNotFoundException')
+        else:
+            payload = {
+                'statusCode': 200,
+                'body': json.dumps({'function': function_name, 'event': event})
+            }
+            self.send_response(200)
+        data = json.dumps(payload).encode('utf-8')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_lambda_endpoint():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeLambdaHandler)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def endpoint_client(fake_lambda_endpoint):
+    return boto3.client('lambda',
+                        endpoint_url='http://127.0.0.1:{}'.format(fake_lambda_endpoint.server_port),
+                        region_name='us-east-1',
+                        aws_access_key_id='testing',
+                        aws_secret_access_key='testing')
+
+
+class TestAsyncLambdaClient:
+    def test_invoke_keeps_payload_contract(self, endpoint_client):
+        """Test that the async invoke sends the same payload as invoke_lambda"""
+        async def run():
+            async with async_lambda.AsyncLambdaClient(endpoint_client, concurrency=2) as client:
+                return await client.invoke(FUNCTION_NAME_PREFIX + 'askAI',
+                                           body=json.dumps({'serviceId': 'service123'}),
+                                           query_string_params={'predictionId': 'pred123'},
+                                           http_method='GET',
+                                           path='/askai')
+
+        response = asyncio.run(run())
+
+        body = json.loads(response['body'])
+        assert body['function'] == FUNCTION_NAME_PREFIX + 'askAI'
+        assert body['event'] == {
+            'body': json.dumps({'serviceId': 'service123'}),
+            'queryStringParameters': {'predictionId': 'pred123'},
+            'httpMethod': 'GET',
+            'path': '/askai'
+        }
+
+    def test_invoke_many_reuses_connections(self, endpoint_client, fake_lambda_endpoint):
+        """Test that a batch keeps input order and stays within the connection limit"""
+        events = [{'body': json.dumps({'index': index})} for index in range(40)]
+
+        async def run():
+            async with async_lambda.AsyncLambdaClient(endpoint_client, concurrency=4) as client:
+                return await client.invoke_many(FUNCTION_NAME_PREFIX + 'trainStatus', events)
+
+        responses = asyncio.run(run())
+
+        indexes = [json.loads(json.loads(response['body'])['event']['body'])['index'] for response in responses]
+        assert indexes == list(range(40))
+        assert len(fake_lambda_endpoint.connections) <= 4
+
+    def test_errors_return_none(self, endpoint_client):
+        """Test that a failed invocation returns None like invoke_lambda"""
+        response = asyncio.run(async_lambda.invoke_lambda_async(FUNCTION_NAME_PREFIX + 'broken',
+                                                                client=endpoint_client))
+
+        assert response is None
+
+    def test_invokes_are_traced(self, endpoint_client, caplog):
+        """Test that async invokes run the tracing hooks and metrics"""
+        tracer = tracing.Tracer()
+        post = MagicMock()
+        tracer.add_post_invoke_hook(post)
+
+        async def invoke_both():
+            async with async_lambda.AsyncLambdaClient(endpoint_client) as client:
+                return await asyncio.gather(client.invoke(FUNCTION_NAME_PREFIX + 'askAI', body='{}'),
+                                            client.invoke(FUNCTION_NAME_PREFIX + 'broken'))
+
+        with patch.object(tracing, 'TRACER', tracer):
+            ok, broken = asyncio.run(invoke_both())
+
+        assert ok['statusCode'] == 200 and broken is None
+        stats = tracer.metrics.snapshot()
+        assert stats[FUNCTION_NAME_PREFIX + 'askAI']['count'] == 1
+        assert stats[FUNCTION_NAME_PREFIX + 'broken']['errors'] == 1
+        assert post.call_count == 2
+        assert 'ResourceNotFoundException' in caplog.text
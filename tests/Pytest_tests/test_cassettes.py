@@ -0,0 +1,97 @@
+import pytest
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FUNCTION_NAME_PREFIX
+import lambda_utils as lutils
+import cassettes
+
+
+def report_response(**kwargs):
+    payload = json.loads(kwargs['Payload'])
+    body = {'status': 'ready', 'method': payload['httpMethod'], 'query': payload.get('queryStringParameters')}
+    return {
+        'StatusCode': 200,
+        'LogResult': 'U1RBUlQ=',
+        'Payload': io.BytesIO(json.dumps({'statusCode': 200, 'body': json.dumps(body)}).encode('utf-8'))
+    }
+
+
+@pytest.fixture
+def aws_client():
+    client = MagicMock()
+    client.invoke.side_effect = report_response
+    return client
+
+
+class TestCassettes:
+    def test_record_then_replay(self, tmp_path, aws_client):
+        """Test that a recorded invoke_lambda call replays without the client"""
+        with cassettes.use_cassette('launch_fe', 'record', str(tmp_path), aws_client) as cassette:
+            recorded = lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'launchFE', http_method='GET',
+                                            query_string_params={'reportId': 'report123'})
+        assert cassette.recorded == 1
+
+        with cassettes.use_cassette('launch_fe', 'replay', str(tmp_path), MagicMock()) as cassette:
+            replayed = lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'launchFE', http_method='GET',
+                                            query_string_params={'reportId': 'report123'})
+            response = lutils.LAMBDA.invoke(FunctionName=FUNCTION_NAME_PREFIX + 'launchFE', LogType='Tail',
+                                            Payload=json.dumps({'queryStringParameters': {'reportId': 'report123'},
+                                                                'httpMethod': 'GET', 'body': ''}))
+
+        assert replayed == recorded
+        assert response['LogResult'] == 'U1RBUlQ='
+        assert cassette.replayed == 2
+        assert aws_client.invoke.call_count == 1
+
+    def test_key_ignores_json_formatting(self):
+        """Test that key order and spacing of JSON bodies do not change the hash"""
+        first = {'httpMethod': 'POST', 'body': json.dumps({'a': 1, 'b': [1, 2]}),
+                 'queryStringParameters': {'x': '1', 'y': '2'}}
+        second = {'queryStringParameters': {'y': '2', 'x': 1}, 'body': '{"b": [1, 2],   "a": 1}',
+                  'httpMethod': 'POST'}
+
+        assert cassettes.request_key('f', first) == cassettes.request_key('f', json.dumps(second))
+        assert cassettes.request_key('f', first) != cassettes.request_key('f', dict(first, httpMethod='PATCH'))
+        assert cassettes.request_key('f', first) != cassettes.request_key('g', first)
+
+    def test_replay_miss_raises(self, tmp_path):
+        """Test that replay mode never calls AWS"""
+        with cassettes.use_cassette('empty', 'replay', str(tmp_path), MagicMock()) as cassette:
+            with pytest.raises(cassettes.CassetteMiss):
+                cassette.invoke(FunctionName=FUNCTION_NAME_PREFIX + 'retrain', Payload='{}')
+            assert lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'retrain', body='{}') is None
+
+    def test_once_mode_records_only_missing(self, tmp_path, aws_client):
+        """Test that once mode records new requests and replays known ones"""
+        path = cassettes.cassette_path('train_experiments', str(tmp_path))
+        cassette = cassettes.Cassette(path, 'once', aws_client)
+        for experiment in ['exp1', 'exp2', 'exp1']:
+            cassette.invoke(FunctionName=FUNCTION_NAME_PREFIX + 'trainExperiments',
+                            Payload=json.dumps({'httpMethod': 'GET', 'queryStringParameters': {'id': experiment}}))
+
+        assert aws_client.invoke.call_count == 2
+        assert len(cassettes.Cassette(path, 'replay')) == 2
+        with open(path) as cassette_file:
+            assert json.loads(cassette_file.readline())['request']['query'] == {'id': 'exp1'}
+
+    def test_parallel_replay(self, tmp_path, aws_client):
+        """Test that replayed responses are fresh streams safe to read concurrently"""
+        path = cassettes.cassette_path('retrain', str(tmp_path))
+        cassettes.Cassette(path, 'record', aws_client).invoke(FunctionName='retrain', Payload='{"httpMethod": "GET"}')
+        cassette = cassettes.Cassette(path, 'replay')
+
+        def replay(_):
+            return json.loads(cassette.invoke(FunctionName='retrain', Payload='{"httpMethod": "GET"}')['Payload'].read())
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            payloads = list(pool.map(replay, range(100)))
+
+        assert all(payload == payloads[0] for payload in payloads)
+        assert cassette.replayed == 100
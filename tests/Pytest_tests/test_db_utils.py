@@ -0,0 +1,194 @@
+import pytest
+import io
+import json
+import threading
+from unittest.mock import patch
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FUNCTION_NAME_PREFIX
+import db_utils
+
+
+def batch_response(payload):
+    # Echoes one result per row, rows with "bad" set are rejected
+    items = json.loads(payload['body'])['items']
+    results = [{'error': 'invalid row'} if item.get('bad') else {'inserted': item['id']} for item in items]
+    return {
+        'StatusCode': 200,
+        'Payload': io.BytesIO(json.dumps({'statusCode': 200, 'body': json.dumps(results)}).encode('utf-8'))
+    }
+
+
+@pytest.fixture
+def mock_db_lambda():
+    calls = []
+    lock = threading.Lock()
+
+    def invoke(**kwargs):
+        payload = json.loads(kwargs['Payload'])
+        with lock:
+            calls.append(payload)
+        return batch_response(payload)
+
+    with patch('lambda_utils.LAMBDA') as mock_lambda:
+        mock_lambda.invoke.side_effect = invoke
+        yield calls
+
+
+class TestBatchWriter:
+    def test_rows_are_coalesced_by_count(self, mock_db_lambda):
+        """Test that 250 rows cost three POST invocations"""
+        with db_utils.BatchWriter(FUNCTION_NAME_PREFIX + 'trainExperiments', max_rows=100) as writer:
+            futures = writer.add_many({'id': i} for i in range(250))
+
+        assert [len(json.loads(call['body'])['items']) for call in mock_db_lambda] == [100, 100, 50]
+        assert all(call['httpMethod'] == 'POST' for call in mock_db_lambda)
+        assert [future.result() for future in futures] == [{'inserted': i} for i in range(250)]
+
+    def test_byte_bound_splits_batches(self, mock_db_lambda):
+        """Test that a batch never grows past max_bytes"""
+        row_size = len(json.dumps({'id': 0, 'name': 'x' * 100}))
+        with db_utils.BatchWriter(FUNCTION_NAME_PREFIX + 'trainExperiments', max_bytes=row_size * 3) as writer:
+            writer.add_many({'id': i, 'name': 'x' * 100} for i in range(7))
+
+        assert sorted(len(json.loads(call['body'])['items']) for call in mock_db_lambda) == [1, 3, 3]
+
+    def test_timer_flushes_idle_rows(self, mock_db_lambda):
+        """Test that buffered rows are sent after flush_interval without closing"""
+        writer = db_utils.BatchWriter(FUNCTION_NAME_PREFIX + 'trainExperiments', flush_interval=0.05)
+        try:
+            future = writer.add({'id': 1})
+            assert future.result(timeout=2) == {'inserted': 1}
+        finally:
+            writer.close()
+        assert len(mock_db_lambda) == 1
+
+    def test_per_row_failures(self, mock_db_lambda):
+        """Test that rejected rows fail without failing the rest of the batch"""
+        outcomes = db_utils.insert_many_into_db(FUNCTION_NAME_PREFIX + 'trainExperiments',
+                                                [{'id': 1}, {'id': 2, 'bad': True}, {'id': 3}])
+
+        assert outcomes[0] == (True, {'inserted': 1})
+        assert outcomes[1][0] is False
+        assert isinstance(outcomes[1][1], db_utils.BatchError)
+        assert outcomes[2] == (True, {'inserted': 3})
+        assert len(mock_db_lambda) == 1
+
+    def test_failed_batch_fails_every_row(self):
+        """Test that an invoke error is reported on every row of the batch"""
+        with patch('lambda_utils.LAMBDA') as mock_lambda:
+            mock_lambda.invoke.side_effect = Exception('TooManyRequestsException')
+            outcomes = db_utils.insert_many_into_db(FUNCTION_NAME_PREFIX + 'trainExperiments',
+                                                    [{'id': 1}, {'id': 2}])
+
+        assert [ok for ok, _ in outcomes] == [False, False]
+
+    def test_unbatched_answer_fails_every_row(self):
+        """Test that a body without one result per row is not taken as success"""
+        response = {
+            'StatusCode': 200,
+            'Payload': io.BytesIO(json.dumps({'statusCode': 200,
+                                              'body': json.dumps({'message': 'Unknown field items'})}).encode('utf-8'))
+        }
+        with patch('lambda_utils.LAMBDA') as mock_lambda:
+            mock_lambda.invoke.return_value = response
+            outcomes = db_utils.insert_many_into_db(FUNCTION_NAME_PREFIX + 'trainExperiments',
+                                                    [{'id': 1}, {'id': 2}])
+
+        assert [ok for ok, _ in outcomes] == [False, False]
+        assert all(isinstance(error, db_utils.BatchError) for _, error in outcomes)
+
+    def test_closed_writer_rejects_rows(self, mock_db_lambda):
+        """Test that rows cannot be added after close"""
+        writer = db_utils.BatchWriter(FUNCTION_NAME_PREFIX + 'trainExperiments')
+        writer.close()
+
+        with pytest.raises(db_utils.BatchError):
+            writer.add({'id': 1})
+
+
+@pytest.fixture
+def mock_patch_lambda():
+    calls = []
+    lock = threading.Lock()
+
+    def invoke(**kwargs):
+        payload = json.loads(kwargs['Payload'])
+        request = json.loads(payload['body'])
+        with lock:
+            calls.append(request)
+        results = [{'error': 'not found'} if key['experimentId'] == 'missing' else {'updated': key['experimentId']}
+                   for key in request['keys']]
+        return {
+            'StatusCode': 200,
+            'Payload': io.BytesIO(json.dumps({'statusCode': 200, 'body': json.dumps(results)}).encode('utf-8'))
+        }
+
+    with patch('lambda_utils.LAMBDA') as mock_lambda:
+        mock_lambda.invoke.side_effect = invoke
+        yield calls
+
+
+class TestBulkUpdate:
+    def test_identical_bodies_share_a_patch(self, mock_patch_lambda):
+        """Test that keys with the same update are sent together"""
+        updates = [({'experimentId': 'exp{}'.format(i)}, {'status': 'done' if i % 2 else 'failed'})
+                   for i in range(10)]
+
+        outcomes = db_utils.bulk_update_db_entries(FUNCTION_NAME_PREFIX + 'trainExperiments', updates)
+
+        assert len(mock_patch_lambda) == 2
+        assert sorted(len(call['keys']) for call in mock_patch_lambda) == [5, 5]
+        assert outcomes['exp3'] == {'ok': True, 'response': {'updated': 'exp3'}, 'error': None}
+
+    def test_groups_are_chunked_by_max_keys(self, mock_patch_lambda):
+        """Test that large groups are split into several PATCH calls"""
+        updates = [({'experimentId': 'exp{}'.format(i)}, {'cost': 0}) for i in range(25)]
+
+        outcomes = db_utils.bulk_update_db_entries(FUNCTION_NAME_PREFIX + 'trainExperiments', updates, max_keys=10)
+
+        assert sorted(len(call['keys']) for call in mock_patch_lambda) == [5, 10, 10]
+        assert len(outcomes) == 25
+
+    def test_last_update_of_a_key_wins(self, mock_patch_lambda):
+        """Test that repeated keys are only updated once with their last body"""
+        updates = [({'experimentId': 'exp1'}, {'status': 'running'}),
+                   ({'experimentId': 'exp1'}, {'status': 'done'})]
+
+        db_utils.bulk_update_db_entries(FUNCTION_NAME_PREFIX + 'trainExperiments', updates)
+
+        assert mock_patch_lambda == [{'keys': [{'experimentId': 'exp1'}], 'update': {'status': 'done'}}]
+
+    def test_outcomes_are_reported_per_key(self, mock_patch_lambda):
+        """Test per-key errors and whole-batch failures"""
+        updates = [({'experimentId': 'exp1'}, {'status': 'done'}), ({'experimentId': 'missing'}, {'status': 'done'})]
+        outcomes = db_utils.bulk_update_db_entries(FUNCTION_NAME_PREFIX + 'trainExperiments', updates)
+
+        assert outcomes['exp1']['ok']
+        assert outcomes['missing'] == {'ok': False, 'response': None, 'error': 'not found'}
+
+        with patch('lambda_utils.LAMBDA') as mock_lambda:
+            mock_lambda.invoke.side_effect = Exception('TooManyRequestsException')
+            outcomes = db_utils.bulk_update_db_entries(FUNCTION_NAME_PREFIX + 'trainExperiments', updates)
+
+        assert not any(outcome['ok'] for outcome in outcomes.values())
+
+        with patch('lambda_utils.LAMBDA') as mock_lambda:
+            mock_lambda.invoke.return_value = {
+                'StatusCode': 200,
+                'Payload': io.BytesIO(json.dumps({'statusCode': 200, 'body': json.dumps({'updated': 1})}).encode())
+            }
+            outcomes = db_utils.bulk_update_db_entries(FUNCTION_NAME_PREFIX + 'trainExperiments', updates)
+
+        assert not any(outcome['ok'] for outcome in outcomes.values())
+        assert 'Expected 2 row results' in outcomes['exp1']['error']
+
+    def test_composite_keys(self, mock_patch_lambda):
+        """Test the outcome map key for multi-field primary keys"""
+        key = {'experimentId': 'exp1', 'userId': 'u1'}
+
+        assert db_utils.primary_key_id(key) == (('experimentId', 'exp1'), ('userId', 'u1'))
+        assert db_utils.primary_key_id({'experimentId': 'exp1'}) == 'exp1'
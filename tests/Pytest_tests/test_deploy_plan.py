@@ -0,0 +1,228 @@
+import pytest
+import json
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import zipfile
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lambda_utils as lutils
+import deploy_plan
+
+FUNCTION = 'yasanthi_askAI'
+FUNCTION_ARN = 'arn:aws:lambda:us-east-1:787991150675:function:' + FUNCTION
+SOURCE_ARN = 'arn:aws:execute-api:us-east-1:787991150675:api/*/POST/yasanthi_askAI'
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    with zipfile.ZipFile(tmp_path / (FUNCTION + '.zip'), 'w') as archive:
+        archive.writestr('lambda_function.py', 'def lambda_handler(event, context):\n    return {}\n')
+    return str(tmp_path) + '/'
+
+
+def make_spec(output_dir, prefix='yasanthi_', **config):
+    spec = {
+        'function': FUNCTION,
+        'mappings': {
+            'environment': {'Variables': {'FN_NAME_PREFIX': '', 'STAGE': 'dev'}},
+            'layers': ['arn:aws:lambda:us-east-1:1:layer:numpy:3'],
+            'permissions': {'principal': 'apigateway.amazonaws.com', 'sourceArn': SOURCE_ARN},
+            'eventRule': 'nightly-retrain',
+            'overwriteEvent': True
+        },
+        'config': {
+            'runtime': 'python3.12',
+            'role': 'arn:aws:iam::787991150675:role/NavigatorBot',
+            'handler': 'lambda_function.lambda_handler',
+            'timeout': 30,
+            'memory': 256,
+            'codeSource': 'local',
+            'outputDir': output_dir,
+            'functionNamePrefix': prefix
+        }
+    }
+    spec['config'].update(config)
+    return spec
+
+
+def live_function(output_dir, prefix='yasanthi_', **changes):
+    configuration = {
+        'FunctionName': FUNCTION,
+        'FunctionArn': FUNCTION_ARN,
+        'CodeSha256': lutils.file_sha256(output_dir + FUNCTION + '.zip'),
+        'Runtime': 'python3.12',
+        'Handler': 'lambda_function.lambda_handler',
+        'Timeout': 30,
+        'MemorySize': 256,
+        'Layers': [{'Arn': 'arn:aws:lambda:us-east-1:1:layer:numpy:3'}],
+        'Environment': {'Variables': {'FN_NAME_PREFIX': prefix, 'STAGE': 'dev'}},
+        'State': 'Active',
+        'LastUpdateStatus': 'Successful'
+    }
+    configuration.update(changes)
+    return {'ResponseMetadata': {'HTTPStatusCode': 200}, 'Configuration': configuration}
+
+
+def policy(source_arn=SOURCE_ARN):
+    return {'Policy': json.dumps({'Statement': [{
+        'Sid': FUNCTION + 'statement1',
+        'Condition': {'ArnLike': {'AWS:SourceArn': source_arn}}
+    }]})}
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    client.get_policy.return_value = policy()
+    client.get_function_configuration.return_value = {'State': 'Active', 'LastUpdateStatus': 'Successful',
+                                                      'FunctionArn': FUNCTION_ARN}
+    client.update_function_code.return_value = {'FunctionName': FUNCTION}
+    client.update_function_configuration.return_value = {'FunctionName': FUNCTION}
+    return client
+
+
+@pytest.fixture
+def events_client():
+    events_client = MagicMock()
+    events_client.list_targets_by_rule.return_value = {'Targets': [{'Id': FUNCTION, 'Arn': FUNCTION_ARN}]}
+    return events_client
+
+
+class TestCompileSpec:
+    def test_missing_config_is_rejected(self, output_dir):
+        """Test validation of the config keys create_lambda needs"""
+        spec = make_spec(output_dir)
+        del spec['config']['role']
+
+        with pytest.raises(deploy_plan.SpecError, match='role'):
+            deploy_plan.compile_spec(spec['function'], spec['mappings'], spec['config'])
+
+    def test_prefixes_are_resolved_on_a_copy(self, output_dir):
+        """Test FN_NAME_PREFIX substitution without changing the input"""
+        spec = make_spec(output_dir)
+
+        compiled = deploy_plan.compile_spec(spec['function'], spec['mappings'], spec['config'])
+
+        assert compiled.environment['Variables']['FN_NAME_PREFIX'] == 'yasanthi_'
+        assert spec['mappings']['environment']['Variables']['FN_NAME_PREFIX'] == ''
+        assert compiled.code_sha256 == lutils.file_sha256(output_dir + FUNCTION + '.zip')
+        assert compiled.event_rule is None
+
+
+class TestPlan:
+    def test_unchanged_function_needs_nothing(self, output_dir, client, events_client):
+        """Test that a function in the desired state plans no operations"""
+        client.get_function.return_value = live_function(output_dir)
+
+        operations, errors = deploy_plan.plan([make_spec(output_dir)], client, events_client=events_client)
+
+        assert operations == []
+        assert errors == {}
+
+    def test_only_changed_parts_are_planned(self, output_dir, client, events_client):
+        """Test the minimal diff of code, configuration and permission"""
+        client.get_function.return_value = live_function(output_dir, CodeSha256='old=', MemorySize=128)
+        client.get_policy.return_value = policy('arn:aws:execute-api:us-east-1:787991150675:old/*/POST/x')
+
+        operations, _ = deploy_plan.plan([make_spec(output_dir)], client, events_client=events_client)
+
+        assert [operation.kind for operation in operations] == ['code', 'configuration', 'permission']
+        assert operations[1].changes == {'MemorySize': (128, 256)}
+
+    def test_missing_function_is_created(self, output_dir, client):
+        """Test that an unknown function plans a single create"""
+        client.get_function.side_effect = Exception('ResourceNotFoundException')
+
+        operations, _ = deploy_plan.plan([make_spec(output_dir)], client)
+
+        assert [operation.kind for operation in operations] == ['create']
+
+    def test_unreadable_function_is_an_error(self, output_dir, client):
+        """Test that throttling or access errors are reported instead of planning a create"""
+        client.get_function.side_effect = Exception('An error occurred (TooManyRequestsException): Rate exceeded')
+
+        operations, errors = deploy_plan.plan([make_spec(output_dir)], client)
+
+        assert operations == []
+        assert 'TooManyRequestsException' in errors[FUNCTION]
+
+    def test_production_event_rule_target(self, output_dir, client, events_client):
+        """Test that a missing rule target is planned in production"""
+        client.get_function.return_value = live_function(output_dir, prefix='production_')
+        events_client.list_targets_by_rule.return_value = {'Targets': []}
+
+        operations, _ = deploy_plan.plan([make_spec(output_dir, prefix='production_')], client,
+                                         events_client=events_client)
+
+        assert [operation.kind for operation in operations] == ['event_rule']
+
+    def test_invalid_specs_are_reported(self, output_dir, client):
+        """Test that specs that do not compile are returned as errors"""
+        operations, errors = deploy_plan.plan([make_spec(output_dir, codeSource='git')], client)
+
+        assert operations == []
+        assert 'unsupported code type' in errors[FUNCTION]
+
+
+class TestApply:
+    def test_operations_run_in_dependency_order(self, output_dir, client, events_client):
+        """Test that code goes before configuration and only changed parts are sent"""
+        client.get_function.return_value = live_function(output_dir, CodeSha256='old=', MemorySize=128)
+        calls = []
+        client.update_function_code.side_effect = lambda **kwargs: calls.append('code') or {'FunctionName': FUNCTION}
+        client.update_function_configuration.side_effect = \
+            lambda **kwargs: calls.append('configuration') or {'FunctionName': FUNCTION}
+
+        output = deploy_plan.rollout([make_spec(output_dir)], client, events_client=events_client)
+
+        assert calls == ['code', 'configuration']
+        assert output['results'][FUNCTION]['ok']
+        assert output['results'][FUNCTION]['operations'] == ['code', 'configuration']
+        assert client.update_function_configuration.call_args.kwargs['MemorySize'] == 256
+        client.add_permission.assert_not_called()
+
+    def test_create_uses_create_lambda(self, output_dir, client):
+        """Test that new functions go through create_lambda"""
+        client.get_function.side_effect = Exception('ResourceNotFoundException')
+        client.create_function.side_effect = lambda **kwargs: {
+            'ResponseMetadata': {'HTTPStatusCode': 201},
+            'FunctionName': kwargs['FunctionName'],
+            'FunctionArn': FUNCTION_ARN
+        }
+        client.add_permission.return_value = {'Statement': '{}'}
+
+        output = deploy_plan.rollout([make_spec(output_dir)], client)
+
+        assert output['results'][FUNCTION]['ok']
+        client.create_function.assert_called_once()
+        client.update_function_code.assert_not_called()
+
+    def test_image_update_retries_conflicts(self, output_dir, client):
+        """Test that image code updates go through the conflict retry"""
+        spec = make_spec(output_dir)
+        spec = deploy_plan.compile_spec(FUNCTION, spec['mappings'], spec['config'], lambda_type='DOCKER',
+                                        base_function_name='askAI')
+        image_uri = '787991150675.dkr.ecr.us-east-1.amazonaws.com/askai:abc'
+        client.update_function_code.side_effect = [
+            Exception('An error occurred (ResourceConflictException): update in progress'),
+            {'FunctionName': FUNCTION}
+        ]
+
+        with patch('lambda_utils.process_docker_image', return_value=image_uri), patch('lambda_utils.sleep'):
+            results = deploy_plan.apply([deploy_plan.Operation(FUNCTION, 'code', spec, {})], client)
+
+        assert results[FUNCTION]['ok']
+        assert client.update_function_code.call_count == 2
+        client.update_function_code.assert_called_with(FunctionName=FUNCTION, ImageUri=image_uri)
+
+    def test_dry_run_changes_nothing(self, output_dir, client, events_client):
+        """Test that a dry run only plans"""
+        client.get_function.return_value = live_function(output_dir, CodeSha256='old=')
+
+        output = deploy_plan.rollout([make_spec(output_dir)], client, dry_run=True, events_client=events_client)
+
+        assert [operation.kind for operation in output['operations']] == ['code']
+        assert output['results'] == {}
+        client.update_function_code.assert_not_called()
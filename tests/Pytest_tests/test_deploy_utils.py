@@ -0,0 +1,517 @@
+import pytest
+import base64
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import shutil
+import zipfile
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lambda_utils as lutils
+import artifact_utils
+import deploy_utils
+
+
+def created_response(function):
+    return {
+        'ResponseMetadata': {'HTTPStatusCode': 201},
+        'FunctionName': function,
+        'FunctionArn': 'arn:aws:lambda:us-east-1:787991150675:function:' + function
+    }
+
+
+def make_spec(function, mode='create'):
+    return {
+        'function': function,
+        'mode': mode,
+        'mappings': {'code': {'S3Bucket': 'code-bucket', 'S3Key': function + '.zip'}},
+        'config': {
+            'runtime': 'python3.12',
+            'role': 'arn:aws:iam::787991150675:role/NavigatorBot',
+            'handler': 'lambda_function.lambda_handler',
+            'timeout': 30,
+            'memory': 256,
+            'codeSource': 's3',
+            'outputDir': '',
+            'functionNamePrefix': 'yasanthi_'
+        }
+    }
+
+
+@pytest.fixture
+def mock_client():
+    client = MagicMock()
+    client.create_function.side_effect = lambda **kwargs: created_response(kwargs['FunctionName'])
+    return client
+
+
+class TestDeployMany:
+    def test_creates_every_function(self, mock_client):
+        """Test that every spec is created and reported in input order"""
+        specs = [make_spec('yasanthi_' + name) for name in ['launchTrain', 'askAI', 'launchFE']]
+
+        output = deploy_utils.deploy_many(specs, max_workers=3, client=mock_client)
+
+        assert [result['function'] for result in output['results']] == [spec['function'] for spec in specs]
+        assert all(result['ok'] and result['action'] == 'create' for result in output['results'])
+        assert output['summary']['created'] == 3
+        assert output['summary']['failed'] == 0
+        assert mock_client.create_function.call_count == 3
+
+    def test_auto_mode_updates_existing_function(self, mock_client):
+        """Test that auto mode updates functions that already exist"""
+        mock_client.get_function.return_value = {
+            'ResponseMetadata': {'HTTPStatusCode': 200},
+            'Configuration': {'FunctionName': 'yasanthi_askAI'}
+        }
+        mock_client.update_function_code.return_value = {'FunctionName': 'yasanthi_askAI'}
+        mock_client.update_function_configuration.return_value = {'FunctionName': 'yasanthi_askAI'}
+
+        output = deploy_utils.deploy_many([make_spec('yasanthi_askAI', mode='auto')], client=mock_client)
+
+        assert output['results'][0]['action'] == 'update'
+        assert output['summary']['updated'] == 1
+        mock_client.create_function.assert_not_called()
+        mock_client.update_function_code.assert_called_once_with(FunctionName='yasanthi_askAI',
+                                                                 S3Bucket='code-bucket',
+                                                                 S3Key='yasanthi_askAI.zip')
+
+    def test_update_configuration_matches_create(self, mock_client):
+        """Test updates substitute the prefix and suffix and pass timeout and memory"""
+        mock_client.get_function.return_value = {
+            'ResponseMetadata': {'HTTPStatusCode': 200},
+            'Configuration': {'FunctionName': 'yasanthi_askAI'}
+        }
+        mock_client.update_function_code.return_value = {'FunctionName': 'yasanthi_askAI'}
+        mock_client.update_function_configuration.return_value = {'FunctionName': 'yasanthi_askAI'}
+        spec = make_spec('yasanthi_askAI', mode='auto')
+        spec['mappings']['environment'] = {'Variables': {'FN_NAME_PREFIX': '', 'DB_NAME_SUFFIX': ''}}
+        spec['config']['databaseNameSuffix'] = '_dev'
+
+        output = deploy_utils.deploy_many([spec], client=mock_client)
+
+        assert output['results'][0]['ok']
+        mock_client.update_function_configuration.assert_called_once_with(
+            FunctionName='yasanthi_askAI',
+            Environment={'Variables': {'FN_NAME_PREFIX': 'yasanthi_', 'DB_NAME_SUFFIX': '_dev'}},
+            Handler='lambda_function.lambda_handler',
+            Layers=[],
+            Runtime='python3.12',
+            Timeout=30,
+            MemorySize=256)
+        assert spec['mappings']['environment']['Variables']['FN_NAME_PREFIX'] == ''
+
+    def test_failures_are_reported_per_function(self, mock_client):
+        """Test that one failing function does not hide the others"""
+        def create_function(**kwargs):
+            if kwargs['FunctionName'] == 'yasanthi_broken':
+                raise Exception('InvalidParameterValueException')
+            return created_response(kwargs['FunctionName'])
+        mock_client.create_function.side_effect = create_function
+
+        output = deploy_utils.deploy_many([make_spec('yasanthi_askAI'), make_spec('yasanthi_broken')],
+                                          client=mock_client)
+
+        assert output['results'][0]['ok']
+        assert not output['results'][1]['ok']
+        assert 'InvalidParameterValueException' in output['results'][1]['error']
+        assert output['summary']['failed'] == 1
+
+    def test_throttling_budget_is_shared(self, mock_client):
+        """Test that a throttled create backs off through the shared budget"""
+        calls = []
+
+        def create_function(**kwargs):
+            calls.append(kwargs['FunctionName'])
+            if len(calls) == 1:
+                raise Exception('TooManyRequestsException: Rate exceeded')
+            return created_response(kwargs['FunctionName'])
+        mock_client.create_function.side_effect = create_function
+        throttle = lutils.ThrottleBudget(base_delay=0.01, max_delay=0.01)
+
+        output = deploy_utils.deploy_many([make_spec('yasanthi_askAI')], client=mock_client, throttle=throttle)
+
+        assert output['results'][0]['ok']
+        assert output['summary']['throttled'] == 1
+        assert len(calls) == 2
+
+    def test_throttled_update_is_retried(self, mock_client):
+        """Test that throttled update stages back off through the shared budget"""
+        mock_client.get_function.return_value = {
+            'ResponseMetadata': {'HTTPStatusCode': 200},
+            'Configuration': {'FunctionName': 'yasanthi_askAI'}
+        }
+        mock_client.update_function_code.side_effect = [
+            Exception('An error occurred (TooManyRequestsException): Rate exceeded'),
+            {'FunctionName': 'yasanthi_askAI'}
+        ]
+        mock_client.update_function_configuration.side_effect = [
+            Exception('An error occurred (TooManyRequestsException): Rate exceeded'),
+            {'FunctionName': 'yasanthi_askAI'}
+        ]
+        throttle = lutils.ThrottleBudget(base_delay=0.01, max_delay=0.01)
+
+        output = deploy_utils.deploy_many([make_spec('yasanthi_askAI', mode='auto')], client=mock_client,
+                                          throttle=throttle)
+
+        assert output['results'][0]['ok']
+        assert output['summary']['updated'] == 1
+        assert output['summary']['throttled'] == 2
+        assert mock_client.update_function_code.call_count == 2
+        assert mock_client.update_function_configuration.call_count == 2
+
+    def test_docker_update_uses_image(self, mock_client):
+        """Test that image functions are updated with an ImageUri, not the zip"""
+        mock_client.get_function.return_value = {
+            'ResponseMetadata': {'HTTPStatusCode': 200},
+            'Configuration': {'FunctionName': 'yasanthi_launchTrain'}
+        }
+        mock_client.update_function_code.return_value = {'FunctionName': 'yasanthi_launchTrain'}
+        mock_client.update_function_configuration.return_value = {'FunctionName': 'yasanthi_launchTrain'}
+        spec = make_spec('yasanthi_launchTrain', mode='auto')
+        spec['lambda_type'] = 'DOCKER'
+        spec['base_function_name'] = 'launchTrain'
+        spec['config']['codeSource'] = 'local'
+        image_uri = '787991150675.dkr.ecr.us-east-1.amazonaws.com/launchtrain:yasanthi_abc'
+
+        with patch('lambda_utils.process_docker_image', return_value=image_uri) as mock_build:
+            output = deploy_utils.deploy_many([spec], client=mock_client)
+
+        assert output['results'][0]['ok']
+        assert mock_build.call_args.args[:2] == ('launchTrain', 'yasanthi_')
+        mock_client.update_function_code.assert_called_once_with(FunctionName='yasanthi_launchTrain',
+                                                                 ImageUri=image_uri)
+        kwargs = mock_client.update_function_configuration.call_args.kwargs
+        assert 'Handler' not in kwargs and 'Layers' not in kwargs and 'Runtime' not in kwargs
+
+
+@pytest.fixture
+def zip_dir(tmp_path):
+    for name in ['yasanthi_askAI', 'yasanthi_launchFE']:
+        (tmp_path / (name + '.zip')).write_bytes(b'zip contents of ' + name.encode('utf-8'))
+    return str(tmp_path) + os.sep
+
+
+class TestContentHashSkip:
+    def test_code_sha256_matches_file_sha256(self, zip_dir):
+        """Test that in-memory and streamed hashes agree"""
+        zip_file = lutils.get_zipfile_bytes('yasanthi_askAI', zip_dir)
+        assert lutils.code_sha256(zip_file) == lutils.file_sha256(lutils.get_zip_file_name(zip_dir, 'yasanthi_askAI'))
+
+    def test_update_lambda_code_skips_unchanged(self, mock_client, zip_dir):
+        """Test that an unchanged zip is not uploaded"""
+        zip_file = lutils.get_zipfile_bytes('yasanthi_askAI', zip_dir)
+        mock_client.get_function_configuration.return_value = {'CodeSha256': lutils.code_sha256(zip_file)}
+
+        response = lutils.update_lambda_code('yasanthi_askAI', zip_dir, 'ZIP', client=mock_client, skip_unchanged=True)
+
+        assert response['CodeSha256'] == lutils.code_sha256(zip_file)
+        mock_client.update_function_code.assert_not_called()
+
+    def test_update_function_code_uploads_changed(self, mock_client):
+        """Test that a changed zip is uploaded"""
+        mock_client.get_function_configuration.return_value = {'CodeSha256': 'stale'}
+
+        lutils.update_function_code('yasanthi_askAI', None, None, zipfile=b'new code', client=mock_client,
+                                    skip_unchanged=True)
+
+        mock_client.update_function_code.assert_called_once_with(FunctionName='yasanthi_askAI', ZipFile=b'new code')
+
+    def test_batch_only_uploads_changed_functions(self, mock_client, zip_dir):
+        """Test that the batch variant uploads only the changed functions"""
+        unchanged_sha = lutils.file_sha256(lutils.get_zip_file_name(zip_dir, 'yasanthi_askAI'))
+        mock_client.get_function_configuration.side_effect = lambda FunctionName: {
+            'CodeSha256': unchanged_sha if FunctionName == 'yasanthi_askAI' else 'stale'
+        }
+
+        results = deploy_utils.update_code_if_changed(['yasanthi_askAI', 'yasanthi_launchFE'], zip_dir,
+                                                      client=mock_client)
+
+        assert results['yasanthi_askAI']['action'] == 'unchanged'
+        assert results['yasanthi_launchFE']['action'] == 'updated'
+        mock_client.update_function_code.assert_called_once()
+
+
+def fan_out(tmp_path, mode, existing=False):
+    # Deploys two specs into three accounts from a local S3 and cache
+    local_s3 = artifact_utils.LocalS3Client()
+    local_s3.put_object(Bucket='code-bucket', Key='predict.zip', Body=b'predict code')
+    local_s3.download_file = MagicMock(side_effect=local_s3.download_file)
+    cache = artifact_utils.ArtifactCache(cache_dir=str(tmp_path))
+    clients = {}
+
+    def create_client_resource(account, region, max_connections=None):
+        client = MagicMock()
+        client.create_function.side_effect = lambda **kwargs: created_response(kwargs['FunctionName'])
+        if existing:
+            client.get_function.side_effect = lambda FunctionName: {
+                'ResponseMetadata': {'HTTPStatusCode': 200},
+                'Configuration': {'FunctionName': FunctionName}
+            }
+            client.update_function_code.side_effect = lambda **kwargs: {'FunctionName': kwargs['FunctionName']}
+            client.update_function_configuration.side_effect = \
+                lambda **kwargs: {'FunctionName': kwargs['FunctionName']}
+        clients[account['AccountId']] = client
+        return client
+
+    specs = []
+    for name in ['yasanthi_askAI', 'yasanthi_launchFE']:
+        spec = make_spec(name, mode=mode)
+        spec['mappings']['code'] = {'S3Bucket': 'code-bucket', 'S3Key': 'predict.zip'}
+        specs.append(spec)
+    accounts = [{'AccountId': str(index), 'AccessKeyId': 'a', 'SecretAccessKey': 's', 'SessionToken': 't'}
+                for index in range(3)]
+
+    with patch.object(lutils, 'create_client_resource', side_effect=create_client_resource), \
+            patch.object(artifact_utils, '_artifact_cache', cache), \
+            patch.object(artifact_utils, '_s3_client', local_s3):
+        outputs = deploy_utils.deploy_to_accounts(specs, accounts)
+    return outputs, clients, local_s3
+
+
+class TestDeployToAccounts:
+    def test_fan_out_shares_one_download(self, tmp_path):
+        """Test that every account is deployed from a single cached download"""
+        outputs, clients, local_s3 = fan_out(tmp_path, 'create')
+
+        assert sorted(outputs) == ['0', '1', '2']
+        assert all(output['summary']['created'] == 2 for output in outputs.values())
+        assert local_s3.download_file.call_count == 1
+        for client in clients.values():
+            assert client.create_function.call_args.kwargs['Code'] == {'ZipFile': b'predict code'}
+
+    def test_fan_out_updates_with_zip_bytes(self, tmp_path):
+        """Test that existing functions in connected accounts are updated without reading the source bucket"""
+        outputs, clients, local_s3 = fan_out(tmp_path, 'auto', existing=True)
+
+        assert all(output['summary']['updated'] == 2 for output in outputs.values())
+        assert local_s3.download_file.call_count == 1
+        for client in clients.values():
+            client.create_function.assert_not_called()
+            for call in client.update_function_code.call_args_list:
+                assert call.kwargs == {'FunctionName': call.kwargs['FunctionName'], 'ZipFile': b'predict code'}
+
+
+@pytest.fixture
+def docker_sources(tmp_path):
+    zip_location = str(tmp_path / 'yasanthi_launchTrain.zip')
+    with zipfile.ZipFile(zip_location, 'w') as archive:
+        archive.writestr('lambda_function.py', 'def lambda_handler(event, context):\n    return {}\n')
+    req_file_loc = str(tmp_path / 'requirements.txt')
+    with open(req_file_loc, 'w') as f:
+        f.write('scikit-learn\n')
+    return zip_location, req_file_loc
+
+
+class TestDockerBuilds:
+    def test_build_tag_follows_content(self, docker_sources):
+        """Test that the image tag only changes when the content changes"""
+        zip_location, req_file_loc = docker_sources
+        tag = lutils.get_build_tag('yasanthi_', zip_location, req_file_loc, '12')
+
+        assert tag.startswith('yasanthi_')
+        assert tag == lutils.get_build_tag('yasanthi_', zip_location, req_file_loc, '12')
+        assert tag != lutils.get_build_tag('yasanthi_', zip_location, req_file_loc, '11')
+
+    def test_build_contexts_are_isolated(self, docker_sources):
+        """Test that every build writes its own Dockerfile and code directory"""
+        zip_location, req_file_loc = docker_sources
+        first = lutils.create_build_context(req_file_loc, zip_location, '12')
+        second = lutils.create_build_context(req_file_loc, zip_location, '12')
+        try:
+            assert first != second
+            for context_dir in [first, second]:
+                assert os.path.exists(os.path.join(context_dir, 'Dockerfile'))
+                assert os.path.exists(os.path.join(context_dir, 'code', 'lambda_function.py'))
+                assert os.path.exists(os.path.join(context_dir, 'requirements.txt'))
+        finally:
+            shutil.rmtree(first)
+            shutil.rmtree(second)
+
+    def test_existing_image_skips_build(self, docker_sources):
+        """Test that an image already in ECR is neither built nor pushed"""
+        zip_location, req_file_loc = docker_sources
+        with patch.object(lutils, 'ecr_client') as ecr_client, \
+                patch.object(lutils, 'ECR_REPOSITORIES', lutils.EcrRepositoryIndex()), \
+                patch('lambda_utils.subprocess') as subprocess:
+            ecr_client.get_paginator.return_value.paginate.return_value = [
+                {'repositories': [{'repositoryName': 'launchtrain'}]}
+            ]
+            image_uri = lutils.process_docker_image('launchTrain', 'yasanthi_', req_file_loc, zip_location, '12')
+
+        tag = lutils.get_build_tag('yasanthi_', zip_location, req_file_loc, '12')
+        assert image_uri == lutils.get_image_uri('launchtrain', tag)
+        ecr_client.describe_images.assert_called_once()
+        subprocess.run.assert_not_called()
+        subprocess.call.assert_not_called()
+
+    def test_build_images_reports_failures(self, docker_sources):
+        """Test that missing images are built in parallel and failures are reported"""
+        zip_location, req_file_loc = docker_sources
+        builds = [
+            {'function_name': name, 'prefix': 'yasanthi_', 'req_file_loc': req_file_loc, 'zip_location': zip_location}
+            for name in ['launchTrain', 'trainExperiments']
+        ]
+
+        def run(command):
+            return MagicMock(returncode=1 if 'trainexperiments' in command[-2] else 0)
+
+        with patch.object(lutils, 'ecr_client') as ecr_client, \
+                patch.object(lutils, 'ECR_REPOSITORIES', lutils.EcrRepositoryIndex()), \
+                patch.object(lutils, 'ECR_AUTH'), \
+                patch('lambda_utils.subprocess') as subprocess:
+            ecr_client.describe_images.side_effect = Exception('ImageNotFoundException')
+            subprocess.run.side_effect = run
+            results = deploy_utils.build_images(builds, max_workers=2)
+
+        assert results['launchTrain']['ok']
+        assert not results['trainExperiments']['ok']
+        assert subprocess.run.call_count == 2
+
+
+@pytest.fixture
+def mock_ecr_client():
+    client = MagicMock()
+    client.get_paginator.return_value.paginate.return_value = [
+        {'repositories': [{'repositoryName': 'launchtrain'}]},
+        {'repositories': [{'repositoryName': 'askai'}]}
+    ]
+    client.get_authorization_token.return_value = {
+        'authorizationData': [{
+            'authorizationToken': base64.b64encode(b'AWS:secret').decode('utf-8'),
+            'expiresAt': datetime.now(timezone.utc) + timedelta(hours=12)
+        }]
+    }
+    return client
+
+
+class TestEcrCaching:
+    def test_repository_index_loads_once(self, mock_ecr_client):
+        """Test that repository lookups share one paginated listing"""
+        index = lutils.EcrRepositoryIndex(mock_ecr_client)
+
+        assert index.exists('launchtrain')
+        assert index.exists('askai')
+        assert not index.exists('trainexperiments')
+        mock_ecr_client.get_paginator.assert_called_once_with('describe_repositories')
+        mock_ecr_client.describe_repositories.assert_not_called()
+
+    def test_only_missing_repositories_are_created(self, mock_ecr_client):
+        """Test that ensure creates only the repositories that are missing"""
+        index = lutils.EcrRepositoryIndex(mock_ecr_client)
+
+        with patch.object(lutils, 'ecr_client', mock_ecr_client):
+            created = [index.ensure(name) for name in ['launchtrain', 'trainexperiments', 'trainexperiments']]
+
+        assert created == [False, True, False]
+        mock_ecr_client.create_repository.assert_called_once()
+        assert mock_ecr_client.create_repository.call_args.kwargs['repositoryName'] == 'trainexperiments'
+
+    def test_ensure_after_invalidate(self, mock_ecr_client):
+        """Test that ensure reloads the names after an invalidate"""
+        index = lutils.EcrRepositoryIndex(mock_ecr_client)
+        index.load()
+
+        with patch.object(lutils, 'ecr_client', mock_ecr_client):
+            index.invalidate()
+            assert not index.ensure('askai')
+            # Invalidated between the exists() check and the locked re-check
+            with patch.object(index, 'exists', side_effect=lambda name: index.invalidate() or False):
+                assert not index.ensure('launchtrain')
+                assert index.ensure('trainexperiments')
+
+        mock_ecr_client.create_repository.assert_called_once()
+        assert mock_ecr_client.create_repository.call_args.kwargs['repositoryName'] == 'trainexperiments'
+
+    def test_login_is_reused_until_expiry(self, mock_ecr_client):
+        """Test that docker login runs once per token lifetime"""
+        auth = lutils.EcrAuthCache(mock_ecr_client)
+
+        with patch('lambda_utils.subprocess') as subprocess:
+            subprocess.run.return_value = MagicMock(returncode=0)
+            assert auth.login()
+            assert not auth.login()
+            assert subprocess.run.call_args.kwargs['input'] == b'secret'
+
+            mock_ecr_client.get_authorization_token.return_value['authorizationData'][0]['expiresAt'] = \
+                datetime.now(timezone.utc) + timedelta(minutes=1)
+            auth.invalidate()
+            assert auth.login()
+            assert auth.login()
+
+        assert subprocess.run.call_count == 3
+
+
+@pytest.fixture
+def mock_image_registry():
+    client = MagicMock()
+    client.batch_get_image.return_value = {
+        'images': [{
+            'imageManifest': '{"schemaVersion": 2}',
+            'imageManifestMediaType': 'application/vnd.docker.distribution.manifest.v2+json'
+        }]
+    }
+    client.get_paginator.return_value.paginate.return_value = [{
+        'imageDetails': [
+            {'imageTags': ['yasanthi_aaaa'], 'imagePushedAt': datetime(2025, 1, 1)},
+            {'imageTags': ['yasanthi_bbbb'], 'imagePushedAt': datetime(2025, 3, 1)},
+            {'imageTags': ['production_aaaa'], 'imagePushedAt': datetime(2025, 2, 1)}
+        ]
+    }]
+    return client
+
+
+class TestImagePromotion:
+    def test_promote_copies_manifest(self, mock_image_registry):
+        """Test that promotion re-tags the manifest with put_image"""
+        with patch.object(lutils, 'ecr_client', mock_image_registry):
+            image_uri = lutils.promote_image('launchTrain', 'yasanthi_bbbb', 'production_bbbb')
+
+        assert image_uri == lutils.get_image_uri('launchtrain', 'production_bbbb')
+        mock_image_registry.put_image.assert_called_once_with(
+            repositoryName='launchtrain',
+            imageManifest='{"schemaVersion": 2}',
+            imageTag='production_bbbb',
+            imageManifestMediaType='application/vnd.docker.distribution.manifest.v2+json'
+        )
+
+    def test_promote_tolerates_existing_tag(self, mock_image_registry):
+        """Test that promoting an already promoted image succeeds"""
+        mock_image_registry.put_image.side_effect = Exception('ImageAlreadyExistsException')
+
+        with patch.object(lutils, 'ecr_client', mock_image_registry):
+            image_uri = lutils.promote_image('launchTrain', 'yasanthi_bbbb', 'production_bbbb')
+
+        assert image_uri.endswith(':production_bbbb')
+
+    def test_promote_images_uses_latest_source_build(self, mock_image_registry):
+        """Test that the fleet promotion picks the newest source tag"""
+        with patch.object(lutils, 'ecr_client', mock_image_registry):
+            results = deploy_utils.promote_images(['launchTrain', 'askAI'], 'yasanthi_', 'production_')
+
+        assert all(result['ok'] for result in results.values())
+        assert results['launchTrain']['image_uri'].endswith(':production_bbbb')
+        assert mock_image_registry.put_image.call_count == 2
+
+    def test_process_docker_image_promotes_matching_build(self, docker_sources, mock_image_registry):
+        """Test that a build already pushed under another prefix is re-tagged instead of rebuilt"""
+        zip_location, req_file_loc = docker_sources
+        tag = lutils.get_build_tag('production_', zip_location, req_file_loc, '12')
+        digest = tag.removeprefix('production_')
+        mock_image_registry.describe_images.side_effect = Exception('ImageNotFoundException')
+        mock_image_registry.get_paginator.return_value.paginate.side_effect = [
+            [{'repositories': [{'repositoryName': 'launchtrain'}]}],
+            [{'imageDetails': [{'imageTags': ['yasanthi_' + digest], 'imagePushedAt': datetime(2025, 1, 1)}]}]
+        ]
+
+        with patch.object(lutils, 'ecr_client', mock_image_registry), \
+                patch.object(lutils, 'ECR_REPOSITORIES', lutils.EcrRepositoryIndex()), \
+                patch('lambda_utils.subprocess') as subprocess:
+            image_uri = lutils.process_docker_image('launchTrain', 'production_', req_file_loc, zip_location, '12')
+
+        assert image_uri == lutils.get_image_uri('launchtrain', tag)
+        mock_image_registry.batch_get_image.assert_called_once_with(repositoryName='launchtrain',
+                                                                    imageIds=[{'imageTag': 'yasanthi_' + digest}])
+        subprocess.run.assert_not_called()
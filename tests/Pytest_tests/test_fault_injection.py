@@ -0,0 +1,122 @@
+import pytest
+import json
+from unittest.mock import patch
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lambda_utils as lutils
+import deploy_utils
+import fault_injection
+from fault_injection import FakeLambdaBackend, FaultInjector, Scenario
+
+
+class RecordingSleep:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, seconds):
+        self.calls.append(seconds)
+
+
+def make_backend(scenario):
+    sleep = RecordingSleep()
+    return FakeLambdaBackend(FaultInjector(scenario, sleep=sleep)), sleep
+
+
+class TestFaultInjection:
+    def test_latency_is_injected_per_call(self):
+        """Test that every API call sleeps for a drawn latency"""
+        backend, sleep = make_backend(Scenario('slow', latency_ms=100, latency_sigma=0.5))
+        deploy_utils.deploy_many(fault_injection.make_specs(3), client=backend)
+
+        assert len(sleep.calls) == backend.injector.counts['calls'] == 3
+        assert all(0.01 < seconds < 1 for seconds in sleep.calls)
+
+    def test_throttling_exercises_create_backoff(self):
+        """Test that create_lambda retries TooManyRequestsException with the shared budget"""
+        backend, _ = make_backend(Scenario('throttled', latency_ms=0, throttle_rate=0.5, seed=3))
+        throttle = lutils.ThrottleBudget(base_delay=0.001, max_delay=0.01, max_retries=10)
+
+        output = deploy_utils.deploy_many(fault_injection.make_specs(10), client=backend, throttle=throttle)
+
+        assert output['summary']['created'] == 10
+        assert backend.injector.counts['throttled'] > 0
+        assert output['summary']['throttled'] == backend.injector.counts['throttled']
+
+    def test_conflicts_exercise_configuration_retries(self):
+        """Test that update_function_configuration waits out ResourceConflictException"""
+        backend, _ = make_backend(Scenario('conflicts', latency_ms=0, conflict_rate=0.5, seed=1))
+        deploy_utils.deploy_many(fault_injection.make_specs(1), client=backend)
+
+        with patch('lambda_utils.sleep'):
+            responses = [lutils.update_function_configuration('bench_function0', {'Variables': {'N': str(n)}},
+                                                              'lambda_function.lambda_handler', [], backend)
+                         for n in range(10)]
+
+        assert all(responses)
+        assert backend.injector.counts['conflicts'] > 0
+        assert backend.functions['bench_function0']['configuration']['Environment'] == {'Variables': {'N': '9'}}
+
+    def test_benchmark_scales_readiness_backoff(self):
+        """Test that waiting out conflicts backs off in scaled time"""
+        delays = []
+        with patch('lambda_utils.sleep', side_effect=delays.append):
+            result = fault_injection.run_benchmark(Scenario('conflicts', latency_ms=0, conflict_rate=0.5,
+                                                            update_ms=50, seed=1),
+                                                   functions=4, invocations=4, time_scale=0.01)
+
+        assert result['update_failed'] == 0
+        assert result['injected']['conflicts'] > 0
+        assert delays and max(delays) <= 8 * 0.01
+
+    def test_in_progress_updates_conflict(self):
+        """Test that an update right after another one hits ResourceConflictException"""
+        backend, _ = make_backend(Scenario('busy', latency_ms=0, update_ms=60000))
+        deploy_utils.deploy_many(fault_injection.make_specs(1), client=backend)
+        backend.update_function_code(FunctionName='bench_function0', S3Bucket='b', S3Key='k')
+
+        with pytest.raises(fault_injection.FakeClientError, match='ResourceConflictException'):
+            backend.update_function_configuration(FunctionName='bench_function0', Handler='h')
+        assert backend.get_function_configuration(FunctionName='bench_function0')['LastUpdateStatus'] == 'InProgress'
+
+    def test_cold_starts_on_first_invocation(self):
+        """Test the cold start delay and the Init Duration in the tail log"""
+        backend, sleep = make_backend(Scenario('cold', latency_ms=0, cold_start_ms=500))
+        deploy_utils.deploy_many(fault_injection.make_specs(1), client=backend)
+
+        first = lutils.invoke_lambda('bench_function0', body='{}', client=backend)
+        results = list(lutils.invoke_many('bench_function0', [{'body': '{}'}, {'body': '{}'}], client=backend))
+
+        assert json.loads(first['body'])['status'] == 'success'
+        assert sleep.calls == [0.5]
+        assert [result['report'].cold_start for result in results] == [False, False]
+
+    def test_benchmark_reports_throughput(self):
+        """Test the benchmark output for each scenario"""
+        scenarios = [Scenario('baseline', latency_ms=1), Scenario('throttled', latency_ms=1, throttle_rate=0.1)]
+
+        results = fault_injection.run_benchmarks(scenarios, functions=4, invocations=20, time_scale=0.1)
+        report = fault_injection.format_report(results)
+
+        assert [result['scenario'] for result in results] == ['baseline', 'throttled']
+        assert results[0]['created'] == 4 and results[0]['invocations'] == 20
+        assert results[0]['invokes_per_second'] > 0
+        assert 'throttled' in report.splitlines()[-1]
+
+    def test_benchmark_counts_failed_invokes_as_errors(self):
+        """Test failed invocations are reported as errors, not throughput"""
+        def failing_invoke_many(function, events, **kwargs):
+            for event in events:
+                yield {'seconds': 0.001, 'error': 'TooManyRequestsException: Rate exceeded'}
+
+        with patch('lambda_utils.invoke_many', side_effect=failing_invoke_many):
+            results = fault_injection.run_benchmarks([Scenario('baseline', latency_ms=0)], functions=2,
+                                                     invocations=10, time_scale=0.01)
+        report = fault_injection.format_report(results)
+
+        assert results[0]['invoke_errors'] == 10
+        assert results[0]['invokes_per_second'] == 0
+        assert 'invoke err' in report and 'create err' in report and 'update err' in report
+        assert report.splitlines()[-1].split()[6:9] == ['10', '0', '0']
@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lambda_utils as lutils
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importing boto3 alone takes longer than this on a typical laptop
+IMPORT_BUDGET_SECONDS = float(os.environ.get('LAMBDA_UTILS_IMPORT_BUDGET', '0.3'))
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import lambda_utils
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'modules': sorted(m for m in sys.modules if m.split('.')[0] in
+                  ('boto3', 'botocore'))}))
+"""
+
+
+def measure_import():
+    env = dict(os.environ)
+    # Importing must not need a region any more
+    env.pop('AWS_DEFAULT_REGION', None)
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=TESTS_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestImportTime:
+    def test_import_does_not_load_boto3(self):
+        """Test that importing lambda_utils leaves boto3 and botocore unloaded"""
+        assert measure_import()['modules'] == []
+
+    def test_import_stays_within_budget(self):
+        """Test that startup time does not regress, best of three runs"""
+        seconds = min(measure_import()['seconds'] for _ in range(3))
+
+        assert seconds < IMPORT_BUDGET_SECONDS, 'import lambda_utils took {:.3f}s'.format(seconds)
+
+    def test_client_is_built_on_first_use(self):
+        """Test that the default client is created once, on first attribute access"""
+        client = lutils.LazyClient('lambda', region_name='us-east-1')
+        with patch('lambda_utils.boto3.client', return_value=MagicMock()) as boto3_client:
+            assert not client.created
+            client.invoke
+            client.list_functions
+        assert client.created
+        boto3_client.assert_called_once_with('lambda', region_name='us-east-1')
+
+    def test_patching_does_not_build_a_client(self):
+        """Test that patch('lambda_utils.LAMBDA') works without a real client"""
+        client = lutils.LazyClient('lambda')
+        with patch.object(lutils, 'LAMBDA', client):
+            with patch('lambda_utils.LAMBDA') as mock_lambda:
+                assert lutils.get_connection(None) is mock_lambda
+        assert not client.created
@@ -0,0 +1,116 @@
+import pytest
+import os
+import time
+from unittest.mock import MagicMock
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FUNCTION_NAME_PREFIX
+import lambda_utils as lutils
+import inventory
+
+
+def function_response(name, sha='abc=', memory=256):
+    return {
+        'ResponseMetadata': {'HTTPStatusCode': 200},
+        'Configuration': {
+            'FunctionName': name,
+            'CodeSha256': sha,
+            'Runtime': 'python3.12',
+            'MemorySize': memory,
+            'Timeout': 30,
+            'Layers': [{'Arn': 'arn:aws:lambda:us-east-1:1:layer:numpy:3'}],
+            'Environment': {'Variables': {'STAGE': 'dev'}}
+        },
+        'Code': {'RepositoryType': 'S3'}
+    }
+
+
+@pytest.fixture
+def lambda_client():
+    names = [FUNCTION_NAME_PREFIX + name for name in ['askAI', 'trainStatus', 'trainExperiments']]
+    client = MagicMock()
+    client.list_functions.side_effect = lambda **kwargs: {'Functions': [{'FunctionName': name} for name in names]}
+    client.get_function.side_effect = lambda FunctionName: function_response(FunctionName)
+    return client
+
+
+@pytest.fixture
+def index(tmp_path, lambda_client):
+    index = inventory.InventoryIndex(str(tmp_path / 'inventory.sqlite'))
+    lutils.use_inventory(index, lambda_client)
+    yield index
+    lutils.use_inventory(None)
+    index.close()
+
+
+class TestInventoryIndex:
+    def test_snapshot_stores_every_function(self, index, lambda_client):
+        """Test the full inventory snapshot"""
+        assert lutils.snapshot_inventory(index, lambda_client, max_workers=2) == 3
+
+        functions = index.functions()
+        assert [function['FunctionName'] for function in functions] == sorted(
+            FUNCTION_NAME_PREFIX + name for name in ['askAI', 'trainStatus', 'trainExperiments'])
+        assert functions[0]['Layers'] == ['arn:aws:lambda:us-east-1:1:layer:numpy:3']
+        assert functions[0]['Environment'] == {'STAGE': 'dev'}
+        assert index.get(FUNCTION_NAME_PREFIX + 'askAI')['Configuration']['CodeSha256'] == 'abc='
+
+    def test_snapshot_skips_deleted_functions(self, index, lambda_client):
+        """Test a function deleted while the snapshot runs is skipped"""
+        def get_function(FunctionName):
+            if FunctionName == FUNCTION_NAME_PREFIX + 'trainStatus':
+                raise Exception('An error occurred (ResourceNotFoundException) when calling the GetFunction '
+                                'operation: Function not found')
+            return function_response(FunctionName)
+        lambda_client.get_function.side_effect = get_function
+
+        assert lutils.snapshot_inventory(index, lambda_client, max_workers=2) == 2
+        assert [function['FunctionName'] for function in index.functions()] == [
+            FUNCTION_NAME_PREFIX + 'askAI', FUNCTION_NAME_PREFIX + 'trainExperiments']
+
+    def test_lookups_read_from_the_index(self, index, lambda_client):
+        """Test that lookups after a snapshot do not call the API"""
+        lutils.snapshot_inventory(index, lambda_client)
+        lambda_client.reset_mock()
+
+        assert lutils.is_lambda_defined(FUNCTION_NAME_PREFIX + 'askAI', lambda_client)
+        assert not lutils.is_lambda_defined(FUNCTION_NAME_PREFIX + 'unknown', lambda_client)
+        assert lutils.get_function_info(FUNCTION_NAME_PREFIX + 'askAI', lambda_client)['Code'] == {'RepositoryType': 'S3'}
+        assert lutils.get_function_configuration(FUNCTION_NAME_PREFIX + 'askAI', lambda_client)['MemorySize'] == 256
+        lambda_client.get_function.assert_not_called()
+        lambda_client.get_function_configuration.assert_not_called()
+
+    def test_stale_entries_go_to_the_api(self, index, lambda_client):
+        """Test the freshness TTL"""
+        lutils.snapshot_inventory(index, lambda_client)
+        index.ttl = 0
+        time.sleep(0.01)
+        lambda_client.get_function.reset_mock()
+
+        assert lutils.is_lambda_defined(FUNCTION_NAME_PREFIX + 'askAI', lambda_client)
+        lambda_client.get_function.assert_called_once()
+
+    def test_writes_invalidate_entries(self, index, lambda_client):
+        """Test that updates and creates are not answered from an old snapshot"""
+        lutils.snapshot_inventory(index, lambda_client)
+        lambda_client.get_function.reset_mock()
+
+        lutils.update_function_configuration(FUNCTION_NAME_PREFIX + 'askAI', {}, 'app.handler', [], lambda_client)
+        lutils.delete_lambda(FUNCTION_NAME_PREFIX + 'newFunction', lambda_client)
+
+        assert index.get(FUNCTION_NAME_PREFIX + 'askAI') is None
+        assert not index.knows_absent(FUNCTION_NAME_PREFIX + 'newFunction')
+        lutils.get_function_info(FUNCTION_NAME_PREFIX + 'askAI', lambda_client)
+        lambda_client.get_function.assert_called_once()
+        assert index.get(FUNCTION_NAME_PREFIX + 'askAI') is not None
+
+    def test_other_clients_bypass_the_index(self, index, lambda_client):
+        """Test that the index only answers for the client it was built for"""
+        lutils.snapshot_inventory(index, lambda_client)
+        other = MagicMock()
+        other.get_function.side_effect = Exception('ResourceNotFoundException')
+
+        assert not lutils.is_lambda_defined(FUNCTION_NAME_PREFIX + 'askAI', other)
+        other.get_function.assert_called_once()
@@ -0,0 +1,100 @@
+import pytest
+import base64
+import io
+import json
+from unittest.mock import patch
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FUNCTION_NAME_PREFIX
+import lambda_utils as lutils
+import invocation_report
+
+COLD_TAIL = (
+    "START RequestId: 6d0c2f1e-1 Version: $LATEST\n"
+    "END RequestId: 6d0c2f1e-1\n"
+    "REPORT RequestId: 6d0c2f1e-1\tDuration: 812.45 ms\tBilled Duration: 813 ms\t"
+    "Memory Size: 512 MB\tMax Memory Used: 301 MB\tInit Duration: 1420.10 ms\t\n"
+)
+
+WARM_TAIL = (
+    "START RequestId: 6d0c2f1e-2 Version: $LATEST\n"
+    "END RequestId: 6d0c2f1e-2\n"
+    "REPORT RequestId: 6d0c2f1e-2\tDuration: 95.12 ms\tBilled Duration: 96 ms\t"
+    "Memory Size: 512 MB\tMax Memory Used: 310 MB\t\n"
+)
+
+
+def tail_response(log_text):
+    return {
+        'StatusCode': 200,
+        'LogResult': base64.b64encode(log_text.encode('utf-8')).decode('utf-8'),
+        'Payload': io.BytesIO(json.dumps({'statusCode': 200, 'body': '{}'}).encode('utf-8'))
+    }
+
+
+@pytest.fixture
+def reports():
+    aggregator = invocation_report.ReportAggregator(window=10)
+    with patch.object(invocation_report, 'REPORTS', aggregator):
+        yield aggregator
+
+
+class TestInvocationReport:
+    def test_parse_cold_start_report(self):
+        """Test parsing a REPORT line with an init duration"""
+        report = invocation_report.parse_report(COLD_TAIL)
+
+        assert report == invocation_report.InvocationReport('6d0c2f1e-1', 812.45, 813.0, 512, 301, 1420.10)
+        assert report.cold_start
+
+    def test_parse_warm_report(self):
+        """Test parsing a REPORT line without an init duration"""
+        report = invocation_report.parse_report(WARM_TAIL)
+
+        assert report.init_duration_ms is None
+        assert not report.cold_start
+        assert invocation_report.parse_report('no report here') is None
+
+    def test_invoke_attaches_report(self, reports):
+        """Test that invoke responses carry the parsed report"""
+        with patch('lambda_utils.LAMBDA') as mock_lambda:
+            mock_lambda.invoke.side_effect = lambda **kwargs: tail_response(COLD_TAIL)
+            response = lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'askAI', invocation_type='Event')
+            results = list(lutils.invoke_many(FUNCTION_NAME_PREFIX + 'askAI', [{'body': '{}'}]))
+
+        assert response['Report'].duration_ms == 812.45
+        assert results[0]['report'].memory_size_mb == 512
+        assert len(reports.reports(FUNCTION_NAME_PREFIX + 'askAI')) == 2
+
+    def test_envelope_carries_report(self, reports):
+        """Test that the LambdaResponse envelope keeps the report and log tail"""
+        with patch('lambda_utils.LAMBDA') as mock_lambda:
+            mock_lambda.invoke.side_effect = lambda **kwargs: tail_response(WARM_TAIL)
+            response = lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'askAI', envelope=True)
+
+        assert response.report.duration_ms == 95.12
+        assert not response.report.cold_start
+        assert base64.b64decode(response.log_result).decode('utf-8') == WARM_TAIL
+
+    def test_aggregator_summary(self, reports):
+        """Test cold start rate and memory headroom per function"""
+        for log_text in [COLD_TAIL, WARM_TAIL, WARM_TAIL, WARM_TAIL]:
+            reports.record(FUNCTION_NAME_PREFIX + 'trainStatus', invocation_report.parse_report(log_text))
+
+        summary = reports.summary(FUNCTION_NAME_PREFIX + 'trainStatus')
+
+        assert summary['count'] == 4
+        assert summary['cold_start_rate'] == 0.25
+        assert summary['avg_init_duration_ms'] == 1420.10
+        assert summary['max_memory_used_mb'] == 310
+        assert summary['memory_headroom'] == pytest.approx(1 - 310 / 512)
+
+    def test_aggregator_window_is_rolling(self, reports):
+        """Test that only the most recent reports are kept"""
+        for _ in range(15):
+            reports.record(FUNCTION_NAME_PREFIX + 'askAI', invocation_report.parse_report(WARM_TAIL))
+
+        assert reports.summary(FUNCTION_NAME_PREFIX + 'askAI')['count'] == 10
@@ -0,0 +1,121 @@
+import pytest
+import base64
+import json
+import os
+import sys
+import textwrap
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FUNCTION_NAME_PREFIX
+import lambda_utils as lutils
+import invocation_report
+from lambda_emulator import LocalLambdaClient, ResourceNotFoundException
+from lambda_response import LambdaResponse
+
+HANDLER_SOURCE = textwrap.dedent("""
+    import json
+    import time
+
+    INVOCATIONS = []
+
+    def lambda_handler(event, context):
+        INVOCATIONS.append(context.aws_request_id)
+        body = json.loads(event.get('body') or '{}')
+        print('handling', event.get('httpMethod'))
+        if body.get('fail'):
+            raise ValueError('bad request')
+        time.sleep(body.get('sleep', 0))
+        return {'statusCode': 200,
+                'body': json.dumps({'status': 'success', 'data': {'echo': body, 'warm': len(INVOCATIONS)},
+                                    'errors': []})}
+""")
+
+
+@pytest.fixture
+def handler_package(tmp_path, monkeypatch):
+    package = tmp_path / 'emulated_handlers'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'askAI.py').write_text(HANDLER_SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield 'emulated_handlers'
+    for module in [name for name in sys.modules if name.startswith('emulated_handlers')]:
+        del sys.modules[module]
+
+
+@pytest.fixture
+def emulator(handler_package):
+    with LocalLambdaClient(package=handler_package, max_workers=4, timeout=2) as emulator:
+        yield emulator
+
+
+class TestLambdaEmulator:
+    def test_invoke_lambda_end_to_end(self, emulator):
+        """Test that invoke_lambda runs the real handler and parses its response"""
+        response = lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'askAI', body=json.dumps({'question': 'hi'}),
+                                        client=emulator, envelope=True)
+
+        assert isinstance(response, LambdaResponse)
+        assert response.status == 'success'
+        assert response.data['echo'] == {'question': 'hi'}
+
+    def test_modules_stay_warm(self, emulator):
+        """Test that the handler module is loaded once and only the first call is a cold start"""
+        reports = invocation_report.ReportAggregator()
+        for _ in range(3):
+            response = emulator.invoke(FunctionName=FUNCTION_NAME_PREFIX + 'askAI', LogType='Tail',
+                                       Payload=json.dumps({'body': '{}'}))
+            reports.record('askAI', invocation_report.report_from_response(response))
+
+        assert json.loads(json.loads(response['Payload'].read())['body'])['data']['warm'] == 3
+        assert [report.cold_start for report in reports.reports('askAI')] == [True, False, False]
+        assert emulator.invocations(FUNCTION_NAME_PREFIX + 'askAI') == 3
+
+    def test_tail_log_contains_handler_output(self, emulator):
+        """Test that print output of the handler ends up in LogResult"""
+        response = emulator.invoke(FunctionName=FUNCTION_NAME_PREFIX + 'askAI', LogType='Tail',
+                                   Payload=json.dumps({'httpMethod': 'PATCH'}))
+
+        log_text = base64.b64decode(response['LogResult']).decode('utf-8')
+        assert 'handling PATCH' in log_text
+        assert log_text.startswith('START RequestId:')
+
+    def test_handler_errors_are_function_errors(self, emulator):
+        """Test the botocore shape of an unhandled handler error"""
+        response = emulator.invoke(FunctionName=FUNCTION_NAME_PREFIX + 'askAI',
+                                   Payload=json.dumps({'body': json.dumps({'fail': True})}))
+
+        assert response['StatusCode'] == 200
+        assert response['FunctionError'] == 'Unhandled'
+        payload = json.loads(response['Payload'].read())
+        assert payload['errorType'] == 'ValueError'
+        assert payload['errorMessage'] == 'bad request'
+
+    def test_unknown_function(self, emulator):
+        """Test that unknown functions raise ResourceNotFoundException"""
+        with pytest.raises(ResourceNotFoundException, match='ResourceNotFoundException'):
+            emulator.invoke(FunctionName=FUNCTION_NAME_PREFIX + 'missing')
+
+    def test_registered_callable_and_event_invocation(self):
+        """Test registered handlers and asynchronous Event invocations"""
+        calls = []
+        with LocalLambdaClient({'trainStatus': lambda event, context: calls.append(event)}) as emulator:
+            response = emulator.invoke(FunctionName=FUNCTION_NAME_PREFIX + 'trainStatus', InvocationType='Event',
+                                       Payload=json.dumps({'id': 1}))
+        assert response['StatusCode'] == 202
+        assert calls == [{'id': 1}]
+
+    def test_worker_pool_runs_invocations_in_parallel(self, emulator):
+        """Test a small load test through invoke_many"""
+        events = [{'body': json.dumps({'sleep': 0.1, 'n': i})} for i in range(8)]
+
+        start = time.perf_counter()
+        results = list(lutils.invoke_many(FUNCTION_NAME_PREFIX + 'askAI', events, concurrency=4, ordered=True,
+                                          client=emulator))
+        elapsed = time.perf_counter() - start
+
+        assert [json.loads(result['response']['body'])['data']['echo']['n'] for result in results] == list(range(8))
+        assert all(result['report'] is not None for result in results)
+        assert elapsed < 0.8
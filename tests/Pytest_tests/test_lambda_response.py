@@ -0,0 +1,93 @@
+import io
+import json
+from unittest.mock import patch
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FUNCTION_NAME_PREFIX
+import lambda_utils as lutils
+import lambda_response
+from lambda_response import LambdaResponse
+
+
+def invoke_response(body, status_code=200):
+    return {
+        'StatusCode': 200,
+        'Payload': io.BytesIO(json.dumps({'statusCode': status_code, 'body': json.dumps(body)}).encode('utf-8'))
+    }
+
+
+class TestLambdaResponse:
+    def test_envelope_exposes_status_data_errors(self):
+        """Test that the standard response fields are exposed directly"""
+        response = LambdaResponse.from_invoke(invoke_response({
+            'status': 'success',
+            'data': {'experimentId': 'exp123'},
+            'errors': []
+        }))
+
+        assert response.status_code == 200
+        assert response.status == 'success'
+        assert response.data == {'experimentId': 'exp123'}
+        assert response.errors == []
+        assert response.ok
+
+    def test_body_is_decoded_lazily_once(self):
+        """Test that the inner body is only decoded on first access"""
+        with patch.object(lambda_response, 'loads', side_effect=json.loads) as loads:
+            response = LambdaResponse.from_invoke(invoke_response({'status': 'success'}))
+            assert loads.call_count == 1
+            assert response.status == 'success'
+            assert response.get('data') is None
+            assert 'status' in response
+            assert loads.call_count == 2
+
+    def test_parse_accepts_mocked_payloads(self):
+        """Test that string payloads from the test mocks are understood"""
+        mocked = {'StatusCode': 400, 'Payload': json.dumps({
+            'statusCode': 400,
+            'body': json.dumps({'status': 'error', 'errors': ['Missing personId']})
+        })}
+
+        response = LambdaResponse.parse(mocked)
+
+        assert response.errors == ['Missing personId']
+        assert not response.ok
+        assert LambdaResponse.parse(json.dumps({'status': 'success'})).status == 'success'
+
+    def test_slots_prevent_attribute_dict(self):
+        """Test that the envelope stays compact"""
+        response = LambdaResponse({'statusCode': 200, 'body': '{}'})
+
+        assert not hasattr(response, '__dict__')
+
+    def test_invoke_lambda_returns_envelope(self):
+        """Test that invoke_lambda can hand back the envelope"""
+        with patch('lambda_utils.LAMBDA') as mock_lambda:
+            mock_lambda.invoke.return_value = invoke_response({'status': 'success', 'data': [1, 2, 3]})
+            response = lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'trainExperiments', http_method='GET',
+                                            envelope=True)
+
+        assert isinstance(response, LambdaResponse)
+        assert response.data == [1, 2, 3]
+
+    def test_nan_and_big_integers_round_trip(self):
+        """Test NaN and integers beyond 64 bits decode as json does"""
+        big = 2 ** 70
+        body = '{"score": NaN, "id": ' + str(big) + '}'
+        raw = json.dumps({'statusCode': 200, 'body': body}).encode('utf-8')
+
+        with patch('lambda_utils.LAMBDA') as mock_lambda:
+            mock_lambda.invoke.return_value = {'StatusCode': 200, 'Payload': io.BytesIO(raw)}
+            payload = lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'trainExperiments', http_method='GET')
+        assert payload['body'] == body
+
+        response = LambdaResponse.from_invoke({'StatusCode': 200, 'Payload': io.BytesIO(raw)})
+        assert response['id'] == big
+        assert response['score'] != response['score']
+
+        # Opting into orjson falls back to json for the NaN it rejects
+        with patch.object(lambda_response, 'USE_ORJSON', lambda_response.orjson is not None):
+            assert lambda_response.loads(body)['id'] == big
@@ -0,0 +1,337 @@
+import pytest
+import io
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FUNCTION_NAME_PREFIX
+import lambda_utils as lutils
+
+
+def make_account(key, expires_in=timedelta(hours=1)):
+    return {
+        'AccessKeyId': key,
+        'SecretAccessKey': 'secret',
+        'SessionToken': 'token',
+        'Expiration': datetime.now(timezone.utc) + expires_in
+    }
+
+
+@pytest.fixture
+def mock_lambda_client():
+    with patch('lambda_utils.LAMBDA') as mock_lambda:
+        yield mock_lambda
+
+
+@pytest.fixture
+def mock_boto3_client():
+    with patch('lambda_utils.boto3.client', side_effect=lambda *args, **kwargs: MagicMock()) as mock_client:
+        yield mock_client
+
+
+class TestClientPool:
+    def test_default_client_is_shared(self):
+        """Test that the default account and region still use LAMBDA"""
+        assert lutils.create_client_resource() is lutils.LAMBDA
+        assert lutils.get_connection(None) is lutils.LAMBDA
+
+    def test_clients_are_reused_per_key(self, mock_boto3_client):
+        """Test that the same account, region and service share one client"""
+        pool = lutils.ClientPool()
+        account = make_account('AKIA1')
+
+        first = pool.get(account, 'us-west-2')
+        assert pool.get(account, 'us-west-2') is first
+        assert pool.get(account, 'us-east-1') is not first
+        assert pool.get(account, 'us-west-2', service='ecr') is not first
+        assert pool.get(make_account('AKIA2'), 'us-west-2') is not first
+        assert mock_boto3_client.call_count == 4
+
+    def test_expiring_credentials_are_replaced(self, mock_boto3_client):
+        """Test that clients with an expiring session token are rebuilt"""
+        pool = lutils.ClientPool(expiry_margin=300)
+        account = make_account('AKIA1', expires_in=timedelta(minutes=1))
+
+        first = pool.get(account)
+        assert pool.get(account) is not first
+        assert pool.evict_expired() == 1
+
+    def test_pool_grows_with_concurrency(self, mock_boto3_client):
+        """Test that a caller asking for more connections gets a bigger pool"""
+        pool = lutils.ClientPool()
+        account = make_account('AKIA1')
+
+        small = pool.get(account, max_connections=4)
+        large = pool.get(account, max_connections=32)
+
+        assert large is not small
+        assert pool.get(account, max_connections=8) is large
+        assert mock_boto3_client.call_args.kwargs['config'].max_pool_connections == 32
+
+    def test_get_connection_uses_pool(self, mock_boto3_client):
+        """Test that get_connection draws connected-account clients from the pool"""
+        account = make_account('AKIA1')
+        with patch.object(lutils, 'CLIENT_POOL', lutils.ClientPool()):
+            assert lutils.get_connection(None, account) is lutils.create_client_resource(account)
+        assert mock_boto3_client.call_count == 1
+
+
+def function_state(state='Active', last_update='Successful'):
+    return {'FunctionName': 'yasanthi_askAI', 'State': state, 'LastUpdateStatus': last_update}
+
+
+@pytest.fixture
+def mock_sleep():
+    with patch('lambda_utils.sleep') as mock_sleep:
+        yield mock_sleep
+
+
+class TestUpdatePipeline:
+    def test_backoff_is_capped(self):
+        """Test that the jittered backoff never exceeds the cap"""
+        assert all(0 <= lutils.backoff_delay(retries, 0.5, 8) <= 8 for retries in range(30))
+
+    def test_wait_until_ready_polls_state(self, mock_sleep):
+        """Test that waiting stops once the update has finished"""
+        client = MagicMock()
+        client.get_function_configuration.side_effect = [
+            function_state('Pending', 'InProgress'),
+            function_state('Active', 'InProgress'),
+            function_state()
+        ]
+
+        configuration = lutils.wait_until_ready('yasanthi_askAI', client)
+
+        assert configuration['LastUpdateStatus'] == 'Successful'
+        assert mock_sleep.call_count == 2
+        assert all(call.args[0] <= 8 for call in mock_sleep.call_args_list)
+
+    def test_wait_until_ready_times_out(self, mock_sleep):
+        """Test that waiting gives up after the timeout"""
+        client = MagicMock()
+        client.get_function_configuration.return_value = function_state('Active', 'InProgress')
+
+        assert lutils.wait_until_ready('yasanthi_askAI', client, timeout=0) is None
+
+    def test_conflict_waits_for_readiness(self, mock_sleep):
+        """Test that a conflicting configuration update is retried once the function is ready"""
+        client = MagicMock()
+        client.update_function_configuration.side_effect = [
+            Exception('An error occurred (ResourceConflictException): update in progress'),
+            {'FunctionName': 'yasanthi_askAI'}
+        ]
+        client.get_function_configuration.return_value = function_state()
+
+        response = lutils.update_function_configuration('yasanthi_askAI', {}, 'lambda_function.lambda_handler', [],
+                                                        client=client)
+
+        assert response == {'FunctionName': 'yasanthi_askAI'}
+        assert client.update_function_configuration.call_count == 2
+        mock_sleep.assert_not_called()
+
+    def test_code_conflict_waits_for_readiness(self, mock_sleep):
+        """Test that a conflicting code update is retried once the function is ready"""
+        client = MagicMock()
+        client.update_function_code.side_effect = [
+            Exception('An error occurred (ResourceConflictException): update in progress'),
+            {'FunctionName': 'yasanthi_askAI'}
+        ]
+        client.get_function_configuration.return_value = function_state()
+
+        pipeline = lutils.UpdatePipeline(client)
+        pipeline.add_code_update('yasanthi_askAI', 'code-bucket', 'askAI.zip')
+        result = pipeline.run()['yasanthi_askAI']
+
+        assert result['ok']
+        assert result['response'] == {'FunctionName': 'yasanthi_askAI'}
+        assert client.update_function_code.call_count == 2
+
+    def test_stages_run_back_to_back_with_timings(self, mock_sleep):
+        """Test that code and configuration updates are ordered and timed"""
+        client = MagicMock()
+        calls = []
+        client.get_function_configuration.side_effect = lambda FunctionName: calls.append('ready') or function_state()
+        client.update_function_code.side_effect = lambda **kwargs: calls.append('code') or {'stage': 'code'}
+        client.update_function_configuration.side_effect = \
+            lambda **kwargs: calls.append('configuration') or {'stage': 'configuration'}
+
+        pipeline = lutils.UpdatePipeline(client)
+        pipeline.add_code_update('yasanthi_askAI', 'code-bucket', 'askAI.zip')
+        pipeline.add_configuration_update('yasanthi_askAI', {}, 'lambda_function.lambda_handler', [])
+        results = pipeline.run()
+
+        result = results['yasanthi_askAI']
+        assert result['ok']
+        assert result['response'] == {'stage': 'configuration'}
+        assert calls == ['ready', 'code', 'ready', 'configuration', 'ready']
+        assert set(result['timings']) == {'code_wait', 'code', 'configuration_wait', 'configuration', 'ready', 'total'}
+
+    def test_failed_stage_stops_the_function(self, mock_sleep):
+        """Test that a failing code update skips the configuration update"""
+        client = MagicMock()
+        client.get_function_configuration.return_value = function_state()
+        client.update_function_code.side_effect = Exception('CodeStorageExceededException')
+
+        pipeline = lutils.UpdatePipeline(client)
+        pipeline.add_code_update('yasanthi_askAI', 'code-bucket', 'askAI.zip')
+        pipeline.add_configuration_update('yasanthi_askAI', {}, 'lambda_function.lambda_handler', [])
+        result = pipeline.run()['yasanthi_askAI']
+
+        assert not result['ok']
+        assert 'CodeStorageExceededException' in result['error']
+        client.update_function_configuration.assert_not_called()
+
+
+def echo_invoke(**kwargs):
+    payload = json.loads(kwargs['Payload'])
+    body = json.loads(payload['body'])
+    time.sleep(body.get('delay', 0))
+    if body.get('fail'):
+        raise Exception('ServiceException: boom')
+    if body.get('handler_error'):
+        return {'StatusCode': 200, 'FunctionError': 'Unhandled',
+                'Payload': io.BytesIO(json.dumps({'errorMessage': 'KeyError'}).encode('utf-8'))}
+    return {'StatusCode': 200,
+            'Payload': io.BytesIO(json.dumps({'statusCode': 200, 'body': payload['body']}).encode('utf-8'))}
+
+
+class TestInvokeMany:
+    def test_ordered_results_follow_input(self, mock_lambda_client):
+        """Test that ordered mode yields results in input order"""
+        mock_lambda_client.invoke.side_effect = echo_invoke
+        events = [{'body': json.dumps({'index': index, 'delay': 0.01 * (5 - index)})} for index in range(5)]
+
+        results = list(lutils.invoke_many(FUNCTION_NAME_PREFIX + 'askAI', events, concurrency=5, ordered=True))
+
+        assert [result['index'] for result in results] == list(range(5))
+        assert [json.loads(result['response']['body'])['index'] for result in results] == list(range(5))
+
+    def test_completion_order_yields_fast_results_first(self, mock_lambda_client):
+        """Test that unordered mode yields results as they complete"""
+        mock_lambda_client.invoke.side_effect = echo_invoke
+        events = [{'body': json.dumps({'delay': 0.2})}, {'body': json.dumps({'delay': 0})}]
+
+        results = list(lutils.invoke_many(FUNCTION_NAME_PREFIX + 'askAI', events, concurrency=2))
+
+        assert [result['index'] for result in results] == [1, 0]
+
+    def test_errors_are_captured_per_item(self, mock_lambda_client):
+        """Test that client and handler errors are reported on their item"""
+        mock_lambda_client.invoke.side_effect = echo_invoke
+        events = [{'body': json.dumps({})}, {'body': json.dumps({'fail': True})},
+                  {'body': json.dumps({'handler_error': True})}]
+
+        results = list(lutils.invoke_many(FUNCTION_NAME_PREFIX + 'dashboardStudent', events, ordered=True))
+
+        assert results[0]['error'] is None
+        assert 'ServiceException' in results[1]['error']
+        assert results[2]['error'] == 'Unhandled: KeyError'
+
+    def test_events_are_consumed_lazily(self, mock_lambda_client):
+        """Test that only a bounded window of events is read ahead"""
+        mock_lambda_client.invoke.side_effect = echo_invoke
+        consumed = []
+
+        def events():
+            for index in range(1000):
+                consumed.append(index)
+                yield {'body': json.dumps({'index': index})}
+
+        results = lutils.invoke_many(FUNCTION_NAME_PREFIX + 'askAI', events(), concurrency=2, ordered=True)
+        first = next(results)
+        results.close()
+
+        assert first['index'] == 0
+        assert len(consumed) < 10
+
+    def test_ordered_window_waits_for_slow_head(self, mock_lambda_client):
+        """Test that ordered mode stops reading ahead while the first result is outstanding"""
+        mock_lambda_client.invoke.side_effect = echo_invoke
+        consumed = []
+
+        def events():
+            for index in range(500):
+                consumed.append(index)
+                yield {'body': json.dumps({'index': index, 'delay': 0.3 if index == 0 else 0})}
+
+        results = lutils.invoke_many(FUNCTION_NAME_PREFIX + 'askAI', events(), concurrency=2, ordered=True)
+        first = next(results)
+        results.close()
+
+        # The window of 4 waiting on the head, then the refill after it was yielded
+        assert first['index'] == 0
+        assert len(consumed) <= 2 * 4
+
+
+def paged_list(items, result_key):
+    # list_* stand-in that pages with MaxItems/Marker like the Lambda API
+    def list_call(MaxItems=50, Marker=None, **kwargs):
+        start = int(Marker or 0)
+        response = {result_key: items[start:start + MaxItems]}
+        if start + MaxItems < len(items):
+            response['NextMarker'] = str(start + MaxItems)
+        return response
+    return MagicMock(side_effect=list_call)
+
+
+class TestInventoryIterators:
+    def test_iter_functions_follows_marker(self, mock_lambda_client):
+        """Test that every page is walked"""
+        functions = [{'FunctionName': 'f{}'.format(i)} for i in range(23)]
+        mock_lambda_client.list_functions = paged_list(functions, 'Functions')
+
+        assert list(lutils.iter_functions(page_size=10)) == functions
+        assert mock_lambda_client.list_functions.call_count == 3
+
+    def test_pages_are_fetched_lazily(self, mock_lambda_client):
+        """Test that later pages are only requested when consumed"""
+        mock_lambda_client.list_functions = paged_list([{'FunctionName': 'f{}'.format(i)} for i in range(30)],
+                                                      'Functions')
+
+        functions = lutils.iter_functions(page_size=10)
+        next(functions)
+
+        assert mock_lambda_client.list_functions.call_count == 1
+
+    def test_layers_and_versions(self, mock_lambda_client):
+        """Test the layer iterators and their filters"""
+        mock_lambda_client.list_layers = paged_list([{'LayerName': 'numpy'}, {'LayerName': 'pandas'}], 'Layers')
+        mock_lambda_client.list_layer_versions = paged_list([{'Version': v} for v in range(5)], 'LayerVersions')
+
+        assert [layer['LayerName'] for layer in lutils.iter_layers(compatible_runtime='python3.12', page_size=1)] \
+            == ['numpy', 'pandas']
+        assert len(list(lutils.iter_layer_versions('numpy', page_size=2))) == 5
+        assert mock_lambda_client.list_layer_versions.call_args.kwargs['LayerName'] == 'numpy'
+
+    def test_regions_are_merged(self):
+        """Test the concurrent multi-region scan"""
+        clients = {region: MagicMock() for region in ['us-east-1', 'us-west-2', 'eu-west-1']}
+        for region, client in clients.items():
+            client.list_functions = paged_list([{'FunctionName': '{}-{}'.format(region, i)} for i in range(7)],
+                                               'Functions')
+
+        with patch('lambda_utils.create_client_resource', side_effect=lambda account, region: clients[region]):
+            results = list(lutils.iter_functions_in_regions(clients, page_size=3, buffer_size=2))
+
+        assert len(results) == 21
+        assert all(function['FunctionName'].startswith(region) for region, function in results)
+
+    def test_failing_region_is_raised(self):
+        """Test that a failed region is reported after the others are drained"""
+        good, bad = MagicMock(), MagicMock()
+        good.list_functions = paged_list([{'FunctionName': 'f1'}], 'Functions')
+        bad.list_functions.side_effect = Exception('AccessDeniedException')
+        clients = {'us-east-1': good, 'eu-west-1': bad}
+        seen = []
+
+        with patch('lambda_utils.create_client_resource', side_effect=lambda account, region: clients[region]):
+            with pytest.raises(Exception, match='AccessDeniedException'):
+                for region, function in lutils.iter_functions_in_regions(clients):
+                    seen.append(function['FunctionName'])
+
+        assert seen == ['f1']
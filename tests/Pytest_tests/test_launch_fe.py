@@ -30,104 +30,32 @@ def mock_s3_client():
         yield mock_client
 
 @pytest.fixture
-def mock_successful_fe_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'report_id': 'report123',
-                'service_id': 'service123',
-                'data_id': 'data123',
-                'predict_col': 'target',
-                'status': 'ready',
-                'cloud': 'AWS',
-                'result': 'success',
-                'engine': 'aws-sklearn-serverless'
-            })
-        })
-    }
+def mock_successful_fe_response(lambda_responses):
+    return lambda_responses.response('launch_fe_ready')
 
 @pytest.fixture
-def mock_data_prep_status():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'report123': {
-                    'status': 'ready',
-                    'engine': 'aws-sklearn-serverless',
-                    'result': 'success'
-                }
-            })
-        })
-    }
+def mock_data_prep_status(lambda_responses):
+    return lambda_responses.response('launch_fe_status')
 
 @pytest.fixture
-def mock_train_file_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'result': 'success',
-                'url': 'https://s3-url.com/train.csv'
-            })
-        })
-    }
+def mock_train_file_response(lambda_responses):
+    return lambda_responses.response('download_url')
 
 @pytest.fixture
-def mock_test_file_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'result': 'success',
-                'url': 'https://s3-url.com/test.csv'
-            })
-        })
-    }
+def mock_test_file_response(lambda_responses):
+    return lambda_responses.response('download_url', {'url': 'https://s3-url.com/test.csv'})
 
 @pytest.fixture
-def mock_artifacts_url_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'result': 'success',
-                'url': 'https://s3-url.com/code.py'
-            })
-        })
-    }
+def mock_artifacts_url_response(lambda_responses):
+    return lambda_responses.response('download_url', {'url': 'https://s3-url.com/code.py'})
 
 @pytest.fixture
-def mock_unsupported_method_response():
-    return {
-        'StatusCode': 400,
-        'Payload': json.dumps({
-            'statusCode': 400,
-            'body': json.dumps({
-                'result': 'failure',
-                'error': 'Unsupported Method: PUT'
-            })
-        })
-    }
+def mock_unsupported_method_response(lambda_responses):
+    return lambda_responses.response('failure', {'error': 'Unsupported Method: PUT'})
 
 @pytest.fixture
-def mock_missing_params_response():
-    return {
-        'StatusCode': 400,
-        'Payload': json.dumps({
-            'statusCode': 400,
-            'body': json.dumps({
-                'result': 'failure',
-                'error': 'Missing required parameters'
-            })
-        })
-    }
+def mock_missing_params_response(lambda_responses):
+    return lambda_responses.response('failure')
 
 class TestLaunchFE:
     def test_process_data_prep_post_request(self, mock_lambda_client, mock_successful_fe_response):
@@ -0,0 +1,70 @@
+import pytest
+import json
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from response_fixtures import ResponseFactory
+
+
+@pytest.fixture
+def factory():
+    return ResponseFactory()
+
+
+class TestResponseFactory:
+    def test_payload_built_once(self, factory):
+        """Test each shape is serialized once and shared afterwards"""
+        first = factory.response('retrain_result')
+        second = factory.response('retrain_result')
+
+        assert first is not second
+        assert first['Payload'] is second['Payload']
+        assert factory.builds == 1
+        assert json.loads(json.loads(first['Payload'])['body']) == {'result': 'success', 'retrainId': 'retrain123'}
+
+    def test_overrides(self, factory):
+        """Test overrides replace body keys and are cached by value"""
+        response = factory.response('failure', {'error': 'Unsupported Method: PUT'}, status_code=405)
+        again = factory.response('failure', {'error': 'Unsupported Method: PUT'}, status_code=405)
+        payload = json.loads(response['Payload'])
+
+        assert response['StatusCode'] == 405
+        assert payload['statusCode'] == 405
+        assert json.loads(payload['body']) == {'result': 'failure', 'error': 'Unsupported Method: PUT'}
+        assert again['Payload'] is response['Payload']
+        assert factory.builds == 1
+        assert json.loads(json.loads(factory.payload('failure'))['body'])['error'] == 'Missing required parameters'
+
+    def test_identical_payloads_interned(self, factory):
+        """Test equal payloads of different keys share one bytes object"""
+        default = factory.payload('download_url')
+        overridden = factory.payload('download_url', {'url': 'https://s3-url.com/train.csv'})
+
+        assert overridden is default
+        assert isinstance(default, bytes)
+
+    def test_stream_payload(self, factory):
+        """Test stream=True gives a fresh readable stream per response"""
+        first = factory.response('launch_fe_ready', stream=True)
+        second = factory.response('launch_fe_ready', stream=True)
+
+        assert json.loads(first['Payload'].read())['statusCode'] == 200
+        assert second['Payload'].read() == factory.payload('launch_fe_ready')
+
+    @pytest.mark.parametrize('lambda_response', [
+        'retrain_updated',
+        ('launch_fe_status', {'report456': {'status': 'running'}}),
+    ], indirect=True)
+    def test_indirect_parametrization(self, lambda_response):
+        """Test the lambda_response fixture with shape names and overrides"""
+        body = json.loads(json.loads(lambda_response['Payload'])['body'])
+
+        assert lambda_response['StatusCode'] == 200
+        assert 'retrainId' in body or body['report456'] == {'status': 'running'}
+
+    def test_session_factory(self, lambda_responses):
+        """Test the session fixture returns the shared factory"""
+        assert isinstance(lambda_responses, ResponseFactory)
+        assert lambda_responses.response('retrain_result')['Payload'] is lambda_responses.payload('retrain_result')
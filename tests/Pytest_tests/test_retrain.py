@@ -14,68 +14,20 @@ def mock_lambda_client():
         yield mock_lambda
 
 @pytest.fixture
-def mock_get_retrain_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'retrain123': {
-                    'retrainId': 'retrain123',
-                    'serId': 'service123',
-                    'dataId': 'data123',
-                    'userId': 'user123',
-                    'predictCol': 'target',
-                    'reportId': 'report123',
-                    'expId': 'exp123',
-                    'depId': 'dep123',
-                    'timestamp': '2025-04-09T10:25:14',
-                    'currentStage': 'training',
-                    'status': 'Running',
-                    'message': 'Training in progress',
-                    'dataLocation': 's3://bucket/data123'
-                }
-            })
-        })
-    }
+def mock_get_retrain_response(lambda_responses):
+    return lambda_responses.response('retrain_details')
 
 @pytest.fixture
-def mock_post_retrain_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'result': 'success',
-                'retrainId': 'retrain123'
-            })
-        })
-    }
+def mock_post_retrain_response(lambda_responses):
+    return lambda_responses.response('retrain_result')
 
 @pytest.fixture
-def mock_patch_retrain_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'retrainId': 'retrain123'
-            })
-        })
-    }
+def mock_patch_retrain_response(lambda_responses):
+    return lambda_responses.response('retrain_updated')
 
 @pytest.fixture
-def mock_delete_retrain_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'result': 'success',
-                'retrainId': 'retrain123'
-            })
-        })
-    }
+def mock_delete_retrain_response(lambda_responses):
+    return lambda_responses.response('retrain_result')
 
 class TestRetrain:
     def test_get_retrain_experiment(self, mock_lambda_client, mock_get_retrain_response):
@@ -248,18 +200,10 @@ class TestRetrain:
         assert 'retrain123' in response_json
         mock_lambda_client.invoke.assert_called_once()
 
-    def test_error_handling(self, mock_lambda_client):
+    def test_error_handling(self, mock_lambda_client, lambda_responses):
         """Test error handling for invalid requests"""
-        mock_lambda_client.invoke.return_value = {
-            'StatusCode': 400,
-            'Payload': json.dumps({
-                'statusCode': 400,
-                'body': json.dumps({
-                    'result': 'failure',
-                    'error': 'Invalid request parameters'
-                })
-            })
-        }
+        mock_lambda_client.invoke.return_value = lambda_responses.response(
+            'failure', {'error': 'Invalid request parameters'})
         
         event = {
             'httpMethod': 'POST',
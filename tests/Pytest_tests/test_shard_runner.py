@@ -0,0 +1,109 @@
+import pytest
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import shard_runner
+
+
+SAMPLE_TESTS = '''
+import time
+
+
+def test_slow():
+    time.sleep(0.3)
+
+
+def test_medium():
+    time.sleep(0.1)
+
+
+def test_fast():
+    pass
+
+
+def test_failing():
+    assert False
+'''
+
+
+@pytest.fixture
+def suite(tmp_path):
+    (tmp_path / 'suite').mkdir()
+    (tmp_path / 'suite' / 'test_sample.py').write_text(SAMPLE_TESTS)
+    return tmp_path
+
+
+class TestShardRunner:
+    def test_pack_balances_known_durations(self):
+        """Test longest-first packing gives balanced shards"""
+        durations = {'a': 5.0, 'b': 4.0, 'c': 3.0, 'd': 3.0, 'e': 2.0, 'f': 1.0}
+        packed = shard_runner.pack(list('abcdef'), durations, 2)
+
+        assert sorted(load for load, _ in packed) == [9.0, 9.0]
+        assert sorted(test for _, tests in packed for test in tests) == list('abcdef')
+        assert all(tests == sorted(tests) for _, tests in packed)
+
+    def test_unknown_tests_use_median(self):
+        """Test tests without history are estimated from the known ones"""
+        estimates = shard_runner.estimate(['a', 'b', 'c', 'new'], {'a': 1.0, 'b': 2.0, 'c': 6.0})
+
+        assert estimates['new'] == 2.0
+        assert shard_runner.estimate(['new'], {}) == {'new': shard_runner.DEFAULT_DURATION}
+
+    def test_more_shards_than_tests(self):
+        """Test extra shards stay empty"""
+        packed = shard_runner.pack(['a'], {}, 3)
+
+        assert [tests for _, tests in packed] == [['a'], [], []]
+
+    def test_save_durations_merges_history(self, tmp_path):
+        """Test the history keeps tests that did not run"""
+        path = str(tmp_path / 'durations.json')
+        shard_runner.save_durations({'a': 1.0, 'b': 2.0}, path)
+        history = shard_runner.save_durations({'b': 3.0}, path)
+
+        assert history == {'a': 1.0, 'b': 3.0}
+        assert shard_runner.load_durations(path) == history
+        assert shard_runner.load_durations(str(tmp_path / 'missing.json')) == {}
+
+    def test_imbalance(self):
+        """Test the imbalance of shard wall times"""
+        results = [shard_runner.ShardResult(i, [], 0.0, wall, 0, '', {}) for i, wall in enumerate([3.0, 1.0])]
+
+        assert shard_runner.imbalance(results) == pytest.approx(0.5)
+        assert shard_runner.imbalance([]) == 0.0
+
+    def test_run_shards_records_durations(self, suite):
+        """Test running shards records durations and reports failures"""
+        durations_file = str(suite / 'durations.json')
+        results = shard_runner.run_shards(['suite'], shards=2, durations_file=durations_file, cwd=str(suite))
+        history = shard_runner.load_durations(durations_file)
+
+        assert len(results) == 2
+        assert sorted(test for result in results for test in result.tests) == sorted(history)
+        assert history['suite/test_sample.py::test_slow'] >= 0.3
+        assert [result.returncode for result in results].count(1) == 1
+        assert 'test_failing' in ''.join(result.output for result in results if result.returncode)
+
+        # The slow test gets a shard to itself on the next run
+        results = shard_runner.run_shards(['suite'], shards=2, durations_file=durations_file, cwd=str(suite))
+        assert ['suite/test_sample.py::test_slow'] in [result.tests for result in results]
+
+        report = shard_runner.format_report(results, slowest=2)
+        assert report.splitlines()[1].endswith('suite/test_sample.py::test_slow')
+        assert 'FAILED (1)' in report
+        assert 'Imbalance:' in report
+
+    def test_shards_are_timed_as_they_exit(self, suite):
+        """Test each shard's wall time ends when that shard exits"""
+        durations_file = str(suite / 'durations.json')
+        history = {'suite/test_sample.py::test_' + name: 0.1 for name in ('medium', 'fast', 'failing')}
+        shard_runner.save_durations(dict(history, **{'suite/test_sample.py::test_slow': 1.0}), durations_file)
+        slow, fast = shard_runner.run_shards(['suite'], shards=2, durations_file=durations_file, cwd=str(suite))
+
+        assert slow.tests == ['suite/test_sample.py::test_slow']
+        assert slow.wall - fast.wall >= 0.1
+        # The shards take their tests from a file and deselect the rest
+        assert '1 passed, 3 deselected' in slow.output
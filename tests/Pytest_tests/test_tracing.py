@@ -0,0 +1,99 @@
+import pytest
+import io
+import json
+import logging
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FUNCTION_NAME_PREFIX
+import lambda_utils as lutils
+import tracing
+
+
+SUCCESS_PAYLOAD = json.dumps({'statusCode': 200, 'body': json.dumps({'status': 'success'})}).encode('utf-8')
+
+
+@pytest.fixture
+def mock_lambda_client():
+    with patch('lambda_utils.LAMBDA') as mock_lambda:
+        mock_lambda.invoke.side_effect = lambda **kwargs: {
+            'StatusCode': 200,
+            'Payload': io.BytesIO(SUCCESS_PAYLOAD)
+        }
+        yield mock_lambda
+
+
+@pytest.fixture
+def tracer():
+    tracer = tracing.Tracer()
+    with patch.object(tracing, 'TRACER', tracer):
+        yield tracer
+
+
+class TestTracing:
+    def test_hooks_see_payload_and_response(self, mock_lambda_client, tracer):
+        """Test that pre and post invoke hooks receive the call details"""
+        pre, post = MagicMock(), MagicMock()
+        tracer.add_pre_invoke_hook(pre)
+        tracer.add_post_invoke_hook(post)
+
+        lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'askAI', body='{}')
+
+        pre.assert_called_once_with(FUNCTION_NAME_PREFIX + 'askAI',
+                                    {'body': '{}', 'queryStringParameters': '', 'httpMethod': 'POST'})
+        function_name, payload, response, error, seconds = post.call_args.args
+        assert response['StatusCode'] == 200
+        assert error is None
+        assert seconds >= 0
+
+    def test_sampling_skips_hooks(self, mock_lambda_client, tracer):
+        """Test that unsampled calls do not run hooks but are still measured"""
+        tracer.sample_rate = 0
+        hook = MagicMock()
+        tracer.add_post_invoke_hook(hook)
+
+        lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'askAI', body='{}')
+
+        hook.assert_not_called()
+        assert tracer.metrics.snapshot()[FUNCTION_NAME_PREFIX + 'askAI']['count'] == 1
+
+    def test_disabled_tracing_serializes_once(self, mock_lambda_client, tracer):
+        """Test that without debug logging the payload is serialized only for the request"""
+        tracer.metrics_enabled = False
+        logging.getLogger('lambda_utils').setLevel(logging.WARNING)
+
+        with patch('json.dumps', side_effect=json.dumps) as dumps:
+            lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'askAI', body='{}')
+            lutils.update_db_entry(FUNCTION_NAME_PREFIX + 'trainExperiments', {'experimentId': 'exp123'},
+                                   {'status': 'done'})
+
+        # invoke_lambda: request payload, update_db_entry: body and request payload
+        assert dumps.call_count == 3
+        assert tracer.start(FUNCTION_NAME_PREFIX + 'askAI', {}) is None
+
+    def test_metrics_count_latency_and_errors(self, mock_lambda_client, tracer):
+        """Test that histograms and error counts are kept per function"""
+        lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'askAI', body='{}')
+        mock_lambda_client.invoke.side_effect = Exception('TooManyRequestsException')
+        lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'askAI', body='{}')
+
+        stats = tracer.metrics.snapshot()[FUNCTION_NAME_PREFIX + 'askAI']
+        assert stats['count'] == 2
+        assert stats['errors'] == 1
+        assert sum(stats['buckets']) == 2
+
+        text = tracer.metrics.render_prometheus()
+        assert 'lambda_invoke_seconds_count{function="yasanthi_askAI"} 2' in text
+        assert 'lambda_invoke_errors_total{function="yasanthi_askAI"} 1' in text
+        assert 'lambda_invoke_seconds_bucket{function="yasanthi_askAI",le="+Inf"} 2' in text
+
+    def test_failing_hook_does_not_break_invoke(self, mock_lambda_client, tracer):
+        """Test that a broken hook is logged and ignored"""
+        tracer.add_pre_invoke_hook(MagicMock(side_effect=ValueError('bad hook')))
+
+        response = lutils.invoke_lambda(FUNCTION_NAME_PREFIX + 'askAI', body='{}')
+
+        assert response['statusCode'] == 200
@@ -22,93 +22,28 @@ def mock_s3_client():
         yield mock_client
 
 @pytest.fixture
-def mock_successful_train_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'exp_id': 'exp123',
-                'experimentId': 'exp123',
-                'jobIds': ['job1', 'job2'],
-                'user': 'user123',
-                'serviceId': 'service123',
-                'startTimeStamp': 1234567890
-            })
-        })
-    }
+def mock_successful_train_response(lambda_responses):
+    return lambda_responses.response('train_started')
 
 @pytest.fixture
-def mock_fetch_logs_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'logs': ['log1', 'log2', 'log3'],
-                'result': 'success'
-            })
-        })
-    }
+def mock_fetch_logs_response(lambda_responses):
+    return lambda_responses.response('train_logs')
 
 @pytest.fixture
-def mock_code_generator_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'code': 'def train_model():\n    pass',
-                'result': 'success'
-            })
-        })
-    }
+def mock_code_generator_response(lambda_responses):
+    return lambda_responses.response('train_code')
 
 @pytest.fixture
-def mock_train_import_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'importId': 'import123',
-                'result': 'success'
-            })
-        })
-    }
+def mock_train_import_response(lambda_responses):
+    return lambda_responses.response('train_import')
 
 @pytest.fixture
-def mock_train_status_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'status': 'completed',
-                'jobIds': ['job1', 'job2'],
-                'result': 'success'
-            })
-        })
-    }
+def mock_train_status_response(lambda_responses):
+    return lambda_responses.response('train_status')
 
 @pytest.fixture
-def mock_train_params_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'params': {
-                    'algorithm': 'RandomForest',
-                    'hyperparameters': {
-                        'n_estimators': 100,
-                        'max_depth': 10
-                    }
-                },
-                'result': 'success'
-            })
-        })
-    }
+def mock_train_params_response(lambda_responses):
+    return lambda_responses.response('train_params')
 
 class TestTrain:
     def test_fetch_logs(self, mock_lambda_client, mock_fetch_logs_response):
@@ -292,18 +227,10 @@ class TestTrain:
         assert 'hyperparameters' in response_json['params']
         mock_lambda_client.invoke.assert_called_once()
 
-    def test_error_handling(self, mock_lambda_client):
+    def test_error_handling(self, mock_lambda_client, lambda_responses):
         """Test error handling for invalid requests"""
-        mock_lambda_client.invoke.return_value = {
-            'StatusCode': 400,
-            'Payload': json.dumps({
-                'statusCode': 400,
-                'body': json.dumps({
-                    'result': 'failure',
-                    'error': 'Invalid request parameters'
-                })
-            })
-        }
+        mock_lambda_client.invoke.return_value = lambda_responses.response(
+            'failure', {'error': 'Invalid request parameters'})
         
         event = {
             'httpMethod': 'POST',
@@ -13,76 +13,20 @@ def mock_lambda_client():
         yield mock_lambda
 
 @pytest.fixture
-def mock_get_experiment_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'exp123': {
-                    'exp_id': 'exp123',
-                    'ser_id': 'service123',
-                    'report_id': 'report123',
-                    'creation_date': '2025-04-09T10:25:14',
-                    'name': 'test_experiment',
-                    'mode': 'aws-sklearn-serverless',
-                    'launch_mode': 'automatic',
-                    'instance_type': 'ml.m5.large',
-                    'status': 'Completed',
-                    'train_data_id': 'train123',
-                    'test_data_id': 'test123',
-                    'predict_column': 'target',
-                    'job_ids': '["job1", "job2"]',
-                    'hyper_params': '{"n_estimators": 100}',
-                    'job_status_details': '{"status": "Completed"}',
-                    'result': '{"accuracy": 0.95}',
-                    'metrics': '{"f1_score": 0.94}',
-                    'cost': 1.23,
-                    'user_id': 'user123'
-                }
-            })
-        })
-    }
+def mock_get_experiment_response(lambda_responses):
+    return lambda_responses.response('experiment_details')
 
 @pytest.fixture
-def mock_post_experiment_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'result': 'success',
-                'exp_id': 'exp123'
-            })
-        })
-    }
+def mock_post_experiment_response(lambda_responses):
+    return lambda_responses.response('experiment_result')
 
 @pytest.fixture
-def mock_patch_experiment_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'result': 'success',
-                'exp_id': 'exp123'
-            })
-        })
-    }
+def mock_patch_experiment_response(lambda_responses):
+    return lambda_responses.response('experiment_result')
 
 @pytest.fixture
-def mock_delete_experiment_response():
-    return {
-        'StatusCode': 200,
-        'Payload': json.dumps({
-            'statusCode': 200,
-            'body': json.dumps({
-                'result': 'success',
-                'exp_id': 'exp123',
-                'service_id': 'service123'
-            })
-        })
-    }
+def mock_delete_experiment_response(lambda_responses):
+    return lambda_responses.response('experiment_result', {'service_id': 'service123'})
 
 class TestTrainExperiments:
     def test_get_experiment(self, mock_lambda_client, mock_get_experiment_response):
@@ -259,18 +203,10 @@ class TestTrainExperiments:
         assert 'exp123' in response_json
         mock_lambda_client.invoke.assert_called_once()
 
-    def test_error_handling(self, mock_lambda_client):
+    def test_error_handling(self, mock_lambda_client, lambda_responses):
         """Test error handling for invalid requests"""
-        mock_lambda_client.invoke.return_value = {
-            'StatusCode': 400,
-            'Payload': json.dumps({
-                'statusCode': 400,
-                'body': json.dumps({
-                    'result': 'failure',
-                    'error': 'Invalid request parameters'
-                })
-            })
-        }
+        mock_lambda_client.invoke.return_value = lambda_responses.response(
+            'failure', {'error': 'Invalid request parameters'})
         
         event = {
             'httpMethod': 'POST',
@@ -0,0 +1,231 @@
+import hashlib
+import os
+import threading
+import uuid
+
+# Zips smaller than this are sent inline as ZipFile, bigger ones are staged in S3
+INLINE_ZIP_LIMIT = 10 * 1024 * 1024
+
+# S3 needs at least 5MB for every part except the last one
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+STAGING_PREFIX = 'lambda-artifacts/'
+
+ARTIFACT_CACHE_DIR = '/tmp/lambda-artifact-cache'
+ARTIFACT_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+_s3_client = None
+_s3_lock = threading.Lock()
+_artifact_cache = None
+
+
+def get_s3_client(s3_client=None):
+    global _s3_client
+    if s3_client:
+        return s3_client
+    with _s3_lock:
+        if _s3_client is None:
+            import boto3
+            _s3_client = boto3.client('s3')
+    return _s3_client
+
+
+def staging_key(function, prefix=STAGING_PREFIX):
+    return prefix + function + '.zip'
+
+
+def iter_chunks(file_name, chunk_size=UPLOAD_CHUNK_SIZE):
+    with open(file_name, 'rb') as data:
+        for chunk in iter(lambda: data.read(chunk_size), b''):
+            yield chunk
+
+
+def stage_artifact(file_name, bucket, key, s3_client=None, chunk_size=UPLOAD_CHUNK_SIZE):
+    # Uploads the zip part by part so at most one chunk is held in memory
+    s3_client = get_s3_client(s3_client)
+    if os.path.getsize(file_name) <= chunk_size:
+        with open(file_name, 'rb') as data:
+            s3_client.put_object(Bucket=bucket, Key=key, Body=data)
+        return {'S3Bucket': bucket, 'S3Key': key}
+
+    upload = s3_client.create_multipart_upload(Bucket=bucket, Key=key)
+    upload_id = upload['UploadId']
+    parts = []
+    try:
+        for part_number, chunk in enumerate(iter_chunks(file_name, chunk_size), start=1):
+            response = s3_client.upload_part(Bucket=bucket,
+                                             Key=key,
+                                             UploadId=upload_id,
+                                             PartNumber=part_number,
+                                             Body=chunk)
+            parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        s3_client.complete_multipart_upload(Bucket=bucket,
+                                            Key=key,
+                                            UploadId=upload_id,
+                                            MultipartUpload={'Parts': parts})
+    except Exception as e:
+        print('Unable to stage {} to s3://{}/{}. Error: {}'.format(file_name, bucket, key, str(e)))
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    return {'S3Bucket': bucket, 'S3Key': key}
+
+
+def get_code(zip_file_name, function, staging_bucket=None, s3_client=None, threshold=None):
+    # Returns the Code argument for create_function / update_function_code
+    if threshold is None:
+        threshold = INLINE_ZIP_LIMIT
+    if staging_bucket and os.path.getsize(zip_file_name) >= threshold:
+        return stage_artifact(zip_file_name, staging_bucket, staging_key(function), s3_client)
+    with open(zip_file_name, 'rb') as data:
+        return {'ZipFile': data.read()}
+
+
+class ArtifactCache:
+    # Content addressed zip cache keyed by bucket/key/ETag. Recency is kept
+    # in the file mtime and the least recently used zips are evicted once
+    # the cache grows past max_bytes.
+
+    def __init__(self, cache_dir=ARTIFACT_CACHE_DIR, max_bytes=ARTIFACT_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, bucket, key, etag):
+        name = hashlib.sha256('/'.join([bucket, key, etag]).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.zip')
+
+    def _key_lock(self, path):
+        with self._lock:
+            return self._key_locks.setdefault(path, threading.Lock())
+
+    def get(self, bucket, key, s3_client=None):
+        s3_client = get_s3_client(s3_client)
+        etag = s3_client.head_object(Bucket=bucket, Key=key)['ETag'].strip('"')
+        path = self.path_for(bucket, key, etag)
+        # Concurrent callers for the same artifact wait for a single download
+        with self._key_lock(path):
+            if os.path.exists(path):
+                os.utime(path)
+                with self._lock:
+                    self.hits += 1
+                return path
+            temp_path = '{}.{}.part'.format(path, uuid.uuid4())
+            try:
+                s3_client.download_file(bucket, key, temp_path)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            with self._lock:
+                self.misses += 1
+        self.evict(keep=path)
+        return path
+
+    def get_bytes(self, bucket, key, s3_client=None):
+        try:
+            path = self.get(bucket, key, s3_client)
+            with open(path, 'rb') as data:
+                return data.read()
+        except FileNotFoundError:
+            # Evicted by another rollout between get and open
+            path = self.get(bucket, key, s3_client)
+            with open(path, 'rb') as data:
+                return data.read()
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.zip'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self, keep=None):
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        return total
+
+
+def get_artifact_cache():
+    global _artifact_cache
+    with _s3_lock:
+        if _artifact_cache is None:
+            _artifact_cache = ArtifactCache()
+    return _artifact_cache
+
+
+class LocalS3Client:
+    # Minimal in-memory stand-in for the S3 calls used by the artifact helpers
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.part_sizes = []
+        self._next_upload_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _etag(data):
+        return '"{}"'.format(hashlib.md5(data).hexdigest())
+
+    def put_object(self, Bucket, Key, Body):
+        data = Body.read() if hasattr(Body, 'read') else Body
+        with self._lock:
+            self.objects[(Bucket, Key)] = data
+        return {'ETag': self._etag(data)}
+
+    def create_multipart_upload(self, Bucket, Key):
+        with self._lock:
+            self._next_upload_id += 1
+            upload_id = str(self._next_upload_id)
+            self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self.uploads[UploadId][PartNumber] = Body
+            self.part_sizes.append(len(Body))
+        return {'ETag': '"{}-{}"'.format(UploadId, PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        with self._lock:
+            parts = self.uploads.pop(UploadId)
+            numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+            self.objects[(Bucket, Key)] = b''.join(parts[number] for number in numbers)
+        return {'Bucket': Bucket, 'Key': Key}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self._lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def head_object(self, Bucket, Key):
+        data = self.objects[(Bucket, Key)]
+        return {'ContentLength': len(data), 'ETag': self._etag(data)}
+
+    def download_file(self, Bucket, Key, Filename):
+        with open(Filename, 'wb') as f:
+            f.write(self.objects[(Bucket, Key)])
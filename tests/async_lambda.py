@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+
+import lambda_utils as lutils
+from tracing import logger
+
+DEFAULT_CONCURRENCY = 32
+
+
+class AsyncLambdaClient:
+    # asyncio counterpart of lutils.invoke_lambda. The blocking boto3 calls
+    # run on a dedicated thread pool that shares one client (and its
+    # connection pool), a semaphore caps the requests in flight.
+
+    def __init__(self, client=None, concurrency=DEFAULT_CONCURRENCY):
+        self.concurrency = concurrency
+        self.client = client or lutils.create_client_resource(max_connections=concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def _invoke(self, function_name, payload, invocation_type):
+        # Same tracing hooks, metrics and REPORT parsing as the sync invokes
+        response = lutils.invoke_payload(function_name, payload, invocation_type, 'Tail', self.client)
+        if invocation_type == 'RequestResponse':
+            return json.loads(response['Payload'].read().decode('utf-8'))
+        return response
+
+    async def invoke(self,
+                     function_name,
+                     body='',
+                     query_string_params='',
+                     invocation_type='RequestResponse',
+                     http_method='POST',
+                     path=None):
+        payload = lutils.build_payload(body, query_string_params, http_method, path)
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._executor, self._invoke, function_name, payload, invocation_type)
+            except Exception as e:
+                logger.error('Error: %s', str(e))
+                return None
+
+    async def invoke_many(self, function_name, events):
+        # events are dicts with the invoke keyword arguments (body,
+        # query_string_params, http_method, path), results keep their order
+        return await asyncio.gather(*[self.invoke(function_name, **event) for event in events])
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+async def invoke_lambda_async(function_name,
+                              body='',
+                              query_string_params='',
+                              invocation_type='RequestResponse',
+                              http_method='POST',
+                              client=None,
+                              path=None):
+    # One-off helper, reuse an AsyncLambdaClient when making many calls
+    async with AsyncLambdaClient(client) as async_client:
+        return await async_client.invoke(function_name, body, query_string_params, invocation_type,
+                                         http_method, path)
@@ -0,0 +1,134 @@
+from contextlib import contextmanager
+from unittest.mock import patch
+import hashlib
+import io
+import json
+import os
+import threading
+
+import lambda_utils as lutils
+
+CASSETTE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Pytest_tests', 'cassettes')
+
+# replay: only recorded responses, record: always call AWS and store,
+# once: replay what is recorded and record what is missing
+CASSETTE_MODES = ('replay', 'record', 'once')
+DEFAULT_MODE = os.environ.get('LAMBDA_CASSETTE_MODE', 'replay')
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def _canonical_body(body):
+    # JSON bodies hash the same whatever their key order or spacing
+    if isinstance(body, (bytes, bytearray)):
+        body = body.decode('utf-8')
+    if isinstance(body, str):
+        try:
+            return json.loads(body) if body else ''
+        except ValueError:
+            return body
+    return body
+
+
+def canonical_request(function_name, payload, invocation_type='RequestResponse'):
+    if isinstance(payload, (str, bytes, bytearray)):
+        payload = json.loads(payload or '{}')
+    query = payload.get('queryStringParameters') or {}
+    return {
+        'function': function_name,
+        'invocation_type': invocation_type,
+        'method': payload.get('httpMethod'),
+        'path': payload.get('path'),
+        'query': {key: str(value) for key, value in query.items()} if isinstance(query, dict) else query,
+        'body': _canonical_body(payload.get('body', '')),
+    }
+
+
+def request_key(function_name, payload, invocation_type='RequestResponse'):
+    canonical = canonical_request(function_name, payload, invocation_type)
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class Cassette:
+    # Lambda client stand-in that replays recorded invoke responses. Each
+    # recording is one JSON line with the request key, the canonical request
+    # and the response; the whole file is loaded into a dict on open.
+
+    def __init__(self, path, mode=None, client=None):
+        mode = mode or DEFAULT_MODE
+        if mode not in CASSETTE_MODES:
+            raise ValueError('Unknown cassette mode {}'.format(mode))
+        self.path = path
+        self.mode = mode
+        self.client = client
+        self.recorded = 0
+        self.replayed = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as cassette_file:
+                for line in cassette_file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses[entry['key']] = entry['response']
+
+    def __len__(self):
+        return len(self._responses)
+
+    def _replay(self, recorded):
+        response = dict(recorded)
+        response['Payload'] = io.BytesIO(recorded['Payload'].encode('utf-8'))
+        return response
+
+    def _record(self, key, request, kwargs):
+        if self.client is None:
+            raise CassetteMiss('No client to record {} with'.format(request['function']))
+        response = self.client.invoke(**kwargs)
+        payload = response['Payload'].read()
+        recorded = {name: value for name, value in response.items()
+                    if name in ('StatusCode', 'FunctionError', 'LogResult', 'ExecutedVersion')}
+        recorded['Payload'] = payload.decode('utf-8') if isinstance(payload, bytes) else payload
+        with self._lock:
+            self._responses[key] = recorded
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as cassette_file:
+                cassette_file.write(json.dumps({'key': key, 'request': request, 'response': recorded},
+                                               sort_keys=True) + '\n')
+            self.recorded += 1
+        return self._replay(recorded)
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', LogType='None', Payload=b'{}', **kwargs):
+        key = request_key(FunctionName, Payload, InvocationType)
+        recorded = self._responses.get(key)
+        if recorded is not None and self.mode != 'record':
+            with self._lock:
+                self.replayed += 1
+            return self._replay(recorded)
+        request = canonical_request(FunctionName, Payload, InvocationType)
+        if self.mode == 'replay':
+            raise CassetteMiss('No recording for {} {} {}'.format(request['function'], request['method'],
+                                                                  request['path'] or ''))
+        return self._record(key, request, dict(kwargs, FunctionName=FunctionName, InvocationType=InvocationType,
+                                               LogType=LogType, Payload=Payload))
+
+    def __getattr__(self, name):
+        # Anything but invoke goes to the real client
+        if name.startswith('_') or self.client is None:
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+
+def cassette_path(name, directory=CASSETTE_DIR):
+    return os.path.join(directory, name + '.jsonl')
+
+
+@contextmanager
+def use_cassette(name, mode=None, directory=CASSETTE_DIR, client=None):
+    # Serves lambda_utils.LAMBDA (and so invoke_lambda, insert_into_db, ...)
+    # from the cassette. Recording goes through the client in place before.
+    cassette = Cassette(cassette_path(name, directory), mode, client or lutils.LAMBDA)
+    with patch('lambda_utils.LAMBDA', cassette):
+        yield cassette
@@ -0,0 +1,196 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import json
+import threading
+import time
+
+import lambda_utils as lutils
+from lambda_response import LambdaResponse
+from tracing import logger
+
+# Synchronous Lambda payloads are capped at 6MB, stay well below it
+DEFAULT_MAX_BATCH_BYTES = 256 * 1024
+
+
+class BatchError(Exception):
+    pass
+
+
+def _row_results(response, count):
+    # The DB lambda answers a batch with one result per row, either as a list
+    # body or as {"results": [...]}. Anything else (e.g. a lambda that does not
+    # understand batches) fails every row rather than passing for them.
+    if not response.ok:
+        raise BatchError('Batch failed with status {}: {}'.format(response.status_code, response.body))
+    body = response.body
+    if isinstance(body, dict) and isinstance(body.get('results'), list):
+        body = body['results']
+    if not isinstance(body, list) or len(body) != count:
+        raise BatchError('Expected {} row results, got: {}'.format(count, response.body))
+    return body
+
+
+class BatchWriter:
+    # Write-behind buffer for insert_into_db. Rows are coalesced into POST
+    # bodies of the form {"items": [...]} bounded by max_rows and max_bytes,
+    # and sent in the background when a bound is hit, when the oldest row is
+    # flush_interval seconds old, or when the writer is closed. add() returns
+    # a Future with the row's own result.
+
+    def __init__(self, function_name, max_rows=100, max_bytes=DEFAULT_MAX_BATCH_BYTES, flush_interval=1.0,
+                 max_in_flight=4, client=None, batch_key='items'):
+        self.function_name = function_name
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.batch_key = batch_key
+        self.client = client
+        self.batches_sent = 0
+        self._rows = []
+        self._futures = []
+        self._bytes = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_on_timer, daemon=True)
+        self._timer.start()
+
+    def add(self, row):
+        # Rows are serialized once here and joined into the batch body on flush
+        serialized = json.dumps(row)
+        future = Future()
+        with self._lock:
+            if self._closed.is_set():
+                raise BatchError('BatchWriter for {} is closed'.format(self.function_name))
+            if self._rows and self._bytes + len(serialized) > self.max_bytes:
+                self._flush_locked()
+            self._rows.append(serialized)
+            self._futures.append(future)
+            self._bytes += len(serialized)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._rows) >= self.max_rows or self._bytes >= self.max_bytes:
+                self._flush_locked()
+        return future
+
+    def add_many(self, rows):
+        return [self.add(row) for row in rows]
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._rows:
+            return
+        rows, futures = self._rows, self._futures
+        self._rows, self._futures, self._bytes, self._oldest = [], [], 0, None
+        self._executor.submit(self._send, rows, futures)
+
+    def _flush_on_timer(self):
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._lock:
+                if self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval:
+                    self._flush_locked()
+
+    def _send(self, rows, futures):
+        body = '{"' + self.batch_key + '": [' + ', '.join(rows) + ']}'
+        try:
+            response = lutils.invoke_payload(self.function_name,
+                                             {'httpMethod': 'POST', 'body': body},
+                                             client=self.client)
+            results = _row_results(LambdaResponse.from_invoke(response), len(rows))
+        except Exception as e:
+            logger.error('Batch insert into %s failed: %s', self.function_name, e)
+            for future in futures:
+                future.set_exception(e)
+            return
+        self.batches_sent += 1
+        for future, result in zip(futures, results):
+            if isinstance(result, dict) and result.get('error'):
+                future.set_exception(BatchError(result['error']))
+            else:
+                future.set_result(result)
+
+    def close(self):
+        with self._lock:
+            self._closed.set()
+            self._flush_locked()
+        self._timer.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def insert_many_into_db(function_name, rows, max_rows=100, max_bytes=DEFAULT_MAX_BATCH_BYTES, client=None):
+    # Bulk load through a BatchWriter, returns one (ok, result or error) per row
+    with BatchWriter(function_name, max_rows=max_rows, max_bytes=max_bytes, client=client) as writer:
+        futures = writer.add_many(rows)
+    outcomes = []
+    for future in futures:
+        error = future.exception()
+        outcomes.append((False, error) if error else (True, future.result()))
+    return outcomes
+
+
+def primary_key_id(primary_key):
+    # Hashable key for the outcome map, the bare value for single-field keys
+    if len(primary_key) == 1:
+        return next(iter(primary_key.values()))
+    return tuple(sorted(primary_key.items()))
+
+
+def group_updates(updates, max_keys=100):
+    # Groups (primary_key, body) pairs with identical bodies, later updates of
+    # the same key win. Returns (body, [primary_key, ...]) chunks of max_keys.
+    latest = {}
+    for primary_key, body in updates:
+        latest[primary_key_id(primary_key)] = (primary_key, body)
+    groups = {}
+    for primary_key, body in latest.values():
+        serialized = json.dumps(body, sort_keys=True)
+        groups.setdefault(serialized, (body, []))[1].append(primary_key)
+    batches = []
+    for body, primary_keys in groups.values():
+        for start in range(0, len(primary_keys), max_keys):
+            batches.append((body, primary_keys[start:start + max_keys]))
+    return batches
+
+
+def _send_update(function_name, body, primary_keys, client):
+    payload = {
+        'httpMethod': 'PATCH',
+        'queryStringParameters': {},
+        'body': json.dumps({'keys': primary_keys, 'update': body})
+    }
+    response = lutils.invoke_payload(function_name, payload, client=client)
+    return _row_results(LambdaResponse.from_invoke(response), len(primary_keys))
+
+
+def bulk_update_db_entries(function_name, updates, max_keys=100, concurrency=4, client=None):
+    # Batched counterpart of update_db_entry. Each PATCH carries
+    # {"keys": [...], "update": {...}} for every key sharing the same update.
+    # Returns {primary_key_id: {'ok', 'response', 'error'}}.
+    outcomes = {}
+    batches = group_updates(updates, max_keys)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [(executor.submit(_send_update, function_name, body, primary_keys, client), primary_keys)
+                   for body, primary_keys in batches]
+        for future, primary_keys in futures:
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error('Bulk update of %s failed for %d keys: %s', function_name, len(primary_keys), e)
+                results = [{'error': str(e)}] * len(primary_keys)
+            for primary_key, result in zip(primary_keys, results):
+                error = result.get('error') if isinstance(result, dict) else None
+                outcomes[primary_key_id(primary_key)] = {
+                    'ok': not error,
+                    'response': None if error else result,
+                    'error': error
+                }
+    return outcomes
@@ -0,0 +1,315 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+import copy
+import json
+import time
+
+import artifact_utils
+import lambda_utils as lutils
+
+REQUIRED_CONFIG = ['runtime', 'role', 'handler', 'timeout', 'memory', 'codeSource']
+
+# Operations of one function always run in this order
+OPERATION_ORDER = ['create', 'code', 'configuration', 'permission', 'event_rule']
+
+
+class SpecError(ValueError):
+    pass
+
+
+class FunctionSpec(NamedTuple):
+    function: str
+    lambda_type: str
+    runtime: str
+    handler: str
+    timeout: int
+    memory: int
+    environment: dict
+    layers: list
+    code: dict
+    code_sha256: Optional[str]
+    image_uri: Optional[str]
+    permission: Optional[dict]
+    event_rule: Optional[str]
+    overwrite_event: bool
+    # The inputs, create_lambda still does the creation itself
+    mappings: dict
+    config: dict
+    base_function_name: str = ''
+
+
+class Operation(NamedTuple):
+    function: str
+    kind: str
+    spec: FunctionSpec
+    # field: (live, desired), empty for create
+    changes: dict
+
+
+def _substitute_prefixes(environment, config):
+    # Same special cases as create_lambda: lambdas find each other and the
+    # private database through these variables
+    variables = environment.get('Variables', {})
+    if 'FN_NAME_PREFIX' in variables:
+        variables['FN_NAME_PREFIX'] = config['functionNamePrefix']
+    if 'DB_NAME_SUFFIX' in variables:
+        variables['DB_NAME_SUFFIX'] = config['databaseNameSuffix']
+    return environment
+
+
+def compile_spec(function, mappings, config, lambda_type='ZIP', base_function_name=''):
+    # Validates mappings/config the way create_lambda reads them and resolves
+    # everything the diff needs, without touching AWS
+    mappings = copy.deepcopy(mappings)
+    config = copy.deepcopy(config)
+    missing = [key for key in REQUIRED_CONFIG if key not in config]
+    if (config.get('codeSource') == 'local' or lambda_type == 'DOCKER') and 'outputDir' not in config:
+        missing.append('outputDir')
+    if missing:
+        raise SpecError('{}: missing config keys {}'.format(function, ', '.join(missing)))
+    if config['codeSource'] not in ('local', 's3'):
+        raise SpecError('{}: unsupported code type {}'.format(function, config['codeSource']))
+    prefix = config.get('functionNamePrefix', '')
+    try:
+        environment = _substitute_prefixes(mappings.get('environment', {}), config)
+    except KeyError as e:
+        raise SpecError('{}: missing config key {}'.format(function, e))
+
+    code, code_sha256, image_uri = {}, None, None
+    if lambda_type == 'DOCKER':
+        zip_location = lutils.get_zip_file_name(config['outputDir'], function)
+        docker_runtime = config['runtime'].split('.')[1] if '.' in config['runtime'] else '12'
+        tag = lutils.get_build_tag(prefix, zip_location, mappings.get('requirementsLocation'), docker_runtime)
+        image_uri = lutils.get_image_uri(base_function_name.lower(), tag)
+        code = {'zip_location': zip_location, 'req_file_loc': mappings.get('requirementsLocation'),
+                'docker_runtime': docker_runtime}
+    elif config['codeSource'] == 'local':
+        local_name = mappings.get('code', {}).get('localFile', function)
+        code = {'zip_file_name': lutils.get_zip_file_name(config['outputDir'], local_name)}
+        code_sha256 = lutils.file_sha256(code['zip_file_name'])
+    else:
+        code = mappings.get('code', {})
+        if 'S3Bucket' not in code or 'S3Key' not in code:
+            raise SpecError('{}: s3 code needs S3Bucket and S3Key'.format(function))
+
+    permission = None
+    if mappings.get('permissions'):
+        permission = dict(mappings['permissions'])
+        if 'FN_NAME_PREFIX' in permission.get('sourceArn', ''):
+            permission['sourceArn'] = permission['sourceArn'].replace('FN_NAME_PREFIX', prefix)
+        permission.setdefault('statementId', function + 'statement1')
+
+    # Event rules are only wired up in production, as in create_lambda
+    event_rule = mappings.get('eventRule') if 'production' in prefix.lower() else None
+
+    return FunctionSpec(function=function, lambda_type=lambda_type, runtime=config['runtime'],
+                        handler=config['handler'], timeout=config['timeout'], memory=config['memory'],
+                        environment=environment, layers=mappings.get('layers', []), code=code,
+                        code_sha256=code_sha256, image_uri=image_uri, permission=permission,
+                        event_rule=event_rule, overwrite_event=bool(mappings.get('overwriteEvent')),
+                        mappings=mappings, config=config, base_function_name=base_function_name)
+
+
+def _configuration_changes(spec, live):
+    desired = {
+        'Timeout': (live.get('Timeout'), spec.timeout),
+        'MemorySize': (live.get('MemorySize'), spec.memory),
+        'Environment': (live.get('Environment', {}).get('Variables', {}), spec.environment.get('Variables', {})),
+    }
+    if spec.lambda_type != 'DOCKER':
+        desired['Runtime'] = (live.get('Runtime'), spec.runtime)
+        desired['Handler'] = (live.get('Handler'), spec.handler)
+        desired['Layers'] = ([layer['Arn'] for layer in live.get('Layers', [])], list(spec.layers))
+    return {field: values for field, values in desired.items() if values[0] != values[1]}
+
+
+def _permission_changes(spec, client):
+    try:
+        policy = json.loads(client.get_policy(FunctionName=spec.function)['Policy'])
+    except Exception:
+        policy = {'Statement': []}
+    for statement in policy.get('Statement', []):
+        if statement.get('Sid') == spec.permission['statementId']:
+            source_arn = statement.get('Condition', {}).get('ArnLike', {}).get('AWS:SourceArn')
+            if source_arn == spec.permission.get('sourceArn'):
+                return {}
+            return {'SourceArn': (source_arn, spec.permission.get('sourceArn'))}
+    return {'SourceArn': (None, spec.permission.get('sourceArn'))}
+
+
+def _event_rule_changes(spec, function_arn, events_client):
+    try:
+        targets = events_client.list_targets_by_rule(Rule=spec.event_rule).get('Targets', [])
+    except Exception:
+        targets = []
+    arns = [target['Arn'] for target in targets]
+    if function_arn in arns:
+        return {}
+    return {'Targets': (arns, [function_arn])}
+
+
+def diff_spec(spec, live, client=None, events_client=None):
+    # Minimal operations that bring `live` (a get_function response or None)
+    # to the spec
+    client = lutils.get_connection(client)
+    if not live:
+        return [Operation(spec.function, 'create', spec, {})]
+    configuration = live['Configuration']
+    operations = []
+    if spec.lambda_type == 'DOCKER':
+        live_image = live.get('Code', {}).get('ImageUri')
+        if live_image != spec.image_uri:
+            operations.append(Operation(spec.function, 'code', spec, {'ImageUri': (live_image, spec.image_uri)}))
+    elif spec.code_sha256 is None or spec.code_sha256 != configuration.get('CodeSha256'):
+        # S3 code has no local hash to compare with and is always pushed
+        operations.append(Operation(spec.function, 'code', spec,
+                                    {'CodeSha256': (configuration.get('CodeSha256'), spec.code_sha256)}))
+    changes = _configuration_changes(spec, configuration)
+    if changes:
+        operations.append(Operation(spec.function, 'configuration', spec, changes))
+    if spec.permission:
+        changes = _permission_changes(spec, client)
+        if changes:
+            operations.append(Operation(spec.function, 'permission', spec, changes))
+    if spec.event_rule:
+        changes = _event_rule_changes(spec, configuration['FunctionArn'],
+                                      events_client or lutils.create_client_resource(service='events'))
+        if changes:
+            operations.append(Operation(spec.function, 'event_rule', spec, changes))
+    return operations
+
+
+def compile_specs(specs):
+    # specs are deploy_utils specs: function, mappings, config, lambda_type, base_function_name
+    compiled, errors = [], {}
+    for spec in specs:
+        try:
+            compiled.append(compile_spec(spec['function'], spec.get('mappings', {}), spec.get('config', {}),
+                                         spec.get('lambda_type', 'ZIP'), spec.get('base_function_name', '')))
+        except (SpecError, OSError) as e:
+            errors[spec['function']] = str(e)
+    return compiled, errors
+
+
+def plan(specs, client=None, max_workers=8, events_client=None):
+    # Reads the live configuration of every function concurrently, through
+    # the inventory index when one is in use. Returns the operations sorted
+    # by function and dependency order, and the specs that did not compile or
+    # whose live state could not be read.
+    client = lutils.get_connection(client)
+    compiled, errors = compile_specs(specs)
+
+    def diff(spec):
+        # Only a missing function is planned as a create, any other read error
+        # would turn into a create that conflicts with the existing function
+        try:
+            live = lutils.get_function_info(spec.function, client, strict=True)
+        except Exception as e:
+            return spec.function, [], 'Unable to read {}: {}'.format(spec.function, e)
+        return spec.function, diff_spec(spec, live, client, events_client), None
+
+    operations = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for function, ops, error in pool.map(diff, compiled):
+            operations.extend(ops)
+            if error:
+                errors[function] = error
+    return operations, errors
+
+
+def _code_stage(operation, client, retry):
+    spec = operation.spec
+    if spec.lambda_type == 'DOCKER':
+        image_uri = lutils.process_docker_image(spec.base_function_name, spec.config.get('functionNamePrefix', ''),
+                                                spec.code['req_file_loc'], spec.code['zip_location'],
+                                                spec.code['docker_runtime'])
+        return lutils.update_function_code(spec.function, None, None, client=client, image_uri=image_uri, **retry)
+    if 'zip_file_name' in spec.code:
+        code = artifact_utils.get_code(spec.code['zip_file_name'], spec.function, spec.config.get('stagingBucket'))
+        if 'ZipFile' in code:
+            return lutils.update_function_code(spec.function, None, None, zipfile=code['ZipFile'], client=client,
+                                               **retry)
+        return lutils.update_function_code(spec.function, code['S3Bucket'], code['S3Key'], client=client, **retry)
+    return lutils.update_function_code(spec.function, spec.code['S3Bucket'], spec.code['S3Key'], client=client,
+                                       **retry)
+
+
+def _configuration_stage(operation, client, retry):
+    spec = operation.spec
+    if spec.lambda_type == 'DOCKER':
+        return lutils.update_function_configuration(spec.function, spec.environment, None, None, client=client,
+                                                    timeout=spec.timeout, memory=spec.memory, **retry)
+    return lutils.update_function_configuration(spec.function, spec.environment, spec.handler, spec.layers,
+                                                client=client, runtime=spec.runtime, timeout=spec.timeout,
+                                                memory=spec.memory, **retry)
+
+
+def _permission_stage(operation, client, retry):
+    permission = operation.spec.permission
+    return lutils.add_permission(operation.function, permission['principal'], permission['sourceArn'],
+                                 statement_id=permission['statementId'], client=client)
+
+
+def _event_rule_stage(operation, client, retry):
+    function_arn = lutils.get_function_configuration(operation.function, client)['FunctionArn']
+    return lutils.add_event_rule(operation.spec.event_rule, operation.spec.overwrite_event, operation.function,
+                                 function_arn)
+
+
+STAGES = {
+    'code': _code_stage,
+    'configuration': _configuration_stage,
+    'permission': _permission_stage,
+    'event_rule': _event_rule_stage,
+}
+
+
+def _apply_function(function, operations, client, timeout):
+    operations = sorted(operations, key=lambda operation: OPERATION_ORDER.index(operation.kind))
+    kinds = [operation.kind for operation in operations]
+    if kinds[0] == 'create':
+        # create_lambda already sets code, configuration, permission and event rule
+        spec = operations[0].spec
+        start = time.perf_counter()
+        response = lutils.create_lambda(function, copy.deepcopy(spec.mappings), copy.deepcopy(spec.config), client,
+                                        lambda_type=spec.lambda_type, base_function_name=spec.base_function_name)
+        ok = isinstance(response, dict)
+        return {'function': function, 'operations': kinds, 'ok': ok, 'response': response if ok else None,
+                'error': None if ok else str(response), 'timings': {'create': time.perf_counter() - start}}
+    # The pipeline waits for the function to be ready before every stage
+    # Stages retry conflicts and throttling with the pipeline's backoff
+    pipeline = lutils.UpdatePipeline(client, timeout)
+    retry = pipeline.retry_options()
+    for operation in operations:
+        pipeline.add_stage(function, operation.kind,
+                           lambda operation=operation: STAGES[operation.kind](operation, client, retry))
+    result = pipeline.run(max_workers=1)[function]
+    result['operations'] = kinds
+    return result
+
+
+def apply(operations, client=None, max_workers=8, timeout=300):
+    # Functions are applied concurrently, the operations of one function in
+    # dependency order. Returns {function: result} like UpdatePipeline.run.
+    client = lutils.get_connection(client)
+    by_function = {}
+    for operation in operations:
+        by_function.setdefault(operation.function, []).append(operation)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {function: pool.submit(_apply_function, function, ops, client, timeout)
+                   for function, ops in by_function.items()}
+    results = {}
+    for function, future in futures.items():
+        try:
+            results[function] = future.result()
+        except Exception as e:
+            results[function] = {'function': function, 'operations': [op.kind for op in by_function[function]],
+                                 'ok': False, 'response': None, 'error': str(e), 'timings': {}}
+    return results
+
+
+def rollout(specs, client=None, max_workers=8, dry_run=False, events_client=None):
+    # Plans and applies, functions already in the desired state are not touched
+    operations, errors = plan(specs, client, max_workers, events_client)
+    results = {} if dry_run else apply(operations, client, max_workers)
+    return {'operations': operations, 'errors': errors, 'results': results}
@@ -0,0 +1,276 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import copy
+import time
+
+import artifact_utils
+import lambda_utils as lutils
+
+
+def _spec_name(spec):
+    return spec['function']
+
+
+def _upload_zip(function, zip_file_name, client, staging_bucket=None, skip_unchanged=False, **retry):
+    code = artifact_utils.get_code(zip_file_name, function, staging_bucket)
+    if 'ZipFile' in code:
+        return lutils.update_function_code(function, None, None, zipfile=code['ZipFile'], client=client,
+                                           skip_unchanged=skip_unchanged, **retry)
+    return lutils.update_function_code(function, code['S3Bucket'], code['S3Key'], client=client, **retry)
+
+
+def _docker_image(spec):
+    function = spec['function']
+    config = spec.get('config', {})
+    runtime = config.get('runtime', '')
+    docker_runtime = runtime.split('.')[1] if '.' in runtime else '12'
+    return lutils.process_docker_image(spec.get('base_function_name', ''), config['functionNamePrefix'],
+                                       spec.get('mappings', {}).get('requirementsLocation'),
+                                       lutils.get_zip_file_name(config.get('outputDir', ''), function),
+                                       docker_runtime)
+
+
+def _environment(mappings, config):
+    # Same special cases as create_lambda, on a copy so the spec is left as is
+    environment = copy.deepcopy(mappings.get('environment', {}))
+    variables = environment.get('Variables', {})
+    if 'FN_NAME_PREFIX' in variables and 'functionNamePrefix' in config:
+        variables['FN_NAME_PREFIX'] = config['functionNamePrefix']
+    if 'DB_NAME_SUFFIX' in variables and 'databaseNameSuffix' in config:
+        variables['DB_NAME_SUFFIX'] = config['databaseNameSuffix']
+    return environment
+
+
+def _update_from_spec(spec, client, throttle, base_delay=0.5, max_delay=8):
+    function = spec['function']
+    mappings = spec.get('mappings', {})
+    config = spec.get('config', {})
+
+    # Code and configuration run through one pipeline so the configuration
+    # update waits for the code update instead of hitting a conflict. Throttled
+    # stages back off through the rollout's shared budget.
+    pipeline = lutils.UpdatePipeline(client, throttle=throttle, base_delay=base_delay, max_delay=max_delay)
+    retry = pipeline.retry_options()
+    docker = spec.get('lambda_type', 'ZIP') == 'DOCKER'
+    if docker:
+        # Image functions take an image, built (or reused from ECR) as create_lambda does
+        pipeline.add_stage(function, 'code',
+                           lambda: lutils.update_function_code(function, None, None, client=client,
+                                                               image_uri=_docker_image(spec), **retry))
+    elif config.get('aws_account'):
+        # Connected accounts cannot read the source bucket, the code is
+        # downloaded once through the shared cache and uploaded as zip bytes
+        code = mappings['code']
+        pipeline.add_stage(function, 'code',
+                           lambda: lutils.update_function_code(
+                               function, None, None, client=client, **retry,
+                               zipfile=artifact_utils.get_artifact_cache().get_bytes(code['S3Bucket'], code['S3Key'])))
+    elif config.get('codeSource') == 's3':
+        code = mappings['code']
+        pipeline.add_code_update(function, code['S3Bucket'], code['S3Key'])
+    else:
+        local_name = mappings.get('code', {}).get('localFile', function)
+        zip_file_name = lutils.get_zip_file_name(config.get('outputDir', ''), local_name)
+        pipeline.add_stage(function, 'code',
+                           lambda: _upload_zip(function, zip_file_name, client, config.get('stagingBucket'),
+                                               skip_unchanged=spec.get('skip_unchanged', False), **retry))
+
+    environment = _environment(mappings, config)
+    if docker:
+        # No handler, layers or runtime on image functions
+        pipeline.add_configuration_update(function, environment, None, None, timeout=config.get('timeout'),
+                                          memory=config.get('memory'))
+    elif 'handler' in config:
+        pipeline.add_configuration_update(function,
+                                          environment,
+                                          config['handler'],
+                                          mappings.get('layers', []),
+                                          runtime=config.get('runtime'),
+                                          timeout=config.get('timeout'),
+                                          memory=config.get('memory'))
+    return pipeline.run(max_workers=1)[function]
+
+
+def deploy_one(spec, client=None, throttle=None, base_delay=0.5, max_delay=8):
+    # spec keys: function, mappings, config and optionally lambda_type,
+    # base_function_name, skip_unchanged and mode ('create', 'update' or 'auto').
+    # base_delay/max_delay bound the backoff while waiting out running updates.
+    client = lutils.get_connection(client)
+    function = _spec_name(spec)
+    mode = spec.get('mode', 'auto')
+    start = time.perf_counter()
+    result = {'function': function, 'action': None, 'ok': False, 'response': None, 'error': None}
+    try:
+        if mode == 'auto':
+            mode = 'update' if lutils.is_lambda_defined(function, client) else 'create'
+        result['action'] = mode
+        if mode == 'create':
+            response = lutils.create_lambda(function,
+                                            spec.get('mappings', {}),
+                                            spec.get('config', {}),
+                                            client,
+                                            lambda_type=spec.get('lambda_type', 'ZIP'),
+                                            base_function_name=spec.get('base_function_name', ''),
+                                            throttle=throttle)
+        else:
+            update = _update_from_spec(spec, client, throttle, base_delay, max_delay)
+            result['timings'] = update['timings']
+            response = update['response'] if update['ok'] else update['error']
+        # create_lambda reports failures as False, a message or the exception
+        if isinstance(response, dict):
+            result['ok'] = True
+            result['response'] = response
+        else:
+            result['error'] = str(response)
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def summarize(results, wall_seconds, throttle=None):
+    durations = [result['seconds'] for result in results]
+    return {
+        'total': len(results),
+        'succeeded': sum(1 for result in results if result['ok']),
+        'failed': sum(1 for result in results if not result['ok']),
+        'created': sum(1 for result in results if result['ok'] and result['action'] == 'create'),
+        'updated': sum(1 for result in results if result['ok'] and result['action'] == 'update'),
+        'throttled': throttle.throttled if throttle else 0,
+        'wall_seconds': wall_seconds,
+        'busy_seconds': sum(durations),
+        'slowest': max(results, key=lambda result: result['seconds'])['function'] if results else None,
+    }
+
+
+def deploy_many(specs, max_workers=8, client=None, throttle=None, base_delay=0.5, max_delay=8):
+    # All workers share one client and one throttling budget so a
+    # TooManyRequestsException slows the whole rollout down together
+    if client is None and max_workers > lutils.DEFAULT_MAX_POOL_CONNECTIONS:
+        # One connection per worker instead of queueing on botocore's default pool
+        client = lutils.create_client_resource(max_connections=max_workers)
+    client = lutils.get_connection(client)
+    if throttle is None:
+        throttle = lutils.ThrottleBudget()
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(deploy_one, spec, client, throttle, base_delay, max_delay) for spec in specs]
+        for future in as_completed(futures):
+            result = future.result()
+            status = 'ok' if result['ok'] else 'FAILED'
+            print('{} {} {} in {:.2f}s'.format(result['function'], result['action'], status, result['seconds']))
+            results.append(result)
+
+    order = {_spec_name(spec): index for index, spec in enumerate(specs)}
+    results.sort(key=lambda result: order.get(result['function'], 0))
+    return {'results': results, 'summary': summarize(results, time.perf_counter() - start, throttle)}
+
+
+def _account_label(account, index):
+    return account.get('AccountId', str(index))
+
+
+def _deploy_to_account(specs, account, region, max_workers):
+    client = lutils.create_client_resource(account, region, max_connections=max_workers)
+    if not client:
+        return None
+    account_specs = copy.deepcopy(specs)
+    for spec in account_specs:
+        spec.setdefault('config', {})['aws_account'] = account
+    # Throttling limits are per account, so each account gets its own budget
+    return deploy_many(account_specs, max_workers=max_workers, client=client, throttle=lutils.ThrottleBudget())
+
+
+def deploy_to_accounts(specs, accounts, region='us-east-1', max_accounts=4, max_workers=8):
+    # Deploys the same function set into every connected account at once. The
+    # code zips come from the shared artifact cache so each one is downloaded
+    # a single time for the whole fan-out.
+    outputs = {}
+    with ThreadPoolExecutor(max_workers=max_accounts) as pool:
+        futures = {
+            pool.submit(_deploy_to_account, specs, account, region, max_workers): _account_label(account, index)
+            for index, account in enumerate(accounts)
+        }
+        for future in as_completed(futures):
+            label = futures[future]
+            try:
+                outputs[label] = future.result()
+            except Exception as e:
+                print('Unable to deploy to account {}. Error: {}'.format(label, str(e)))
+                outputs[label] = None
+    return outputs
+
+
+def _update_code_if_changed(function, output_dir, client, staging_bucket):
+    start = time.perf_counter()
+    result = {'function': function, 'action': 'unchanged', 'ok': True, 'error': None}
+    try:
+        zip_file_name = lutils.get_zip_file_name(output_dir, function)
+        if lutils.file_sha256(zip_file_name) != lutils.get_deployed_code_sha256(function, client):
+            _upload_zip(function, zip_file_name, client, staging_bucket)
+            result['action'] = 'updated'
+    except Exception as e:
+        result['ok'] = False
+        result['action'] = 'failed'
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def update_code_if_changed(functions, output_dir, max_workers=8, client=None, staging_bucket=None):
+    # Hashes each local zip and compares it with the deployed CodeSha256,
+    # only the functions whose code differs get uploaded
+    client = lutils.get_connection(client)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(lambda function: _update_code_if_changed(function, output_dir, client, staging_bucket),
+                                functions))
+    return {result['function']: result for result in results}
+
+
+def _build_image(build):
+    start = time.perf_counter()
+    result = {'function': build['function_name'], 'image_uri': None, 'ok': False, 'error': None}
+    try:
+        result['image_uri'] = lutils.process_docker_image(build['function_name'],
+                                                          build['prefix'],
+                                                          build.get('req_file_loc'),
+                                                          build['zip_location'],
+                                                          build.get('docker_runtime', '12'))
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def build_images(builds, max_workers=4):
+    # builds are dicts with the process_docker_image arguments. Images whose
+    # content tag is already in ECR are skipped, the rest build concurrently
+    # (bounded again by lutils.DOCKER_BUILD_SLOTS).
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(_build_image, builds))
+    return {result['function']: result for result in results}
+
+
+def _promote_image(function_name, source_prefix, target_prefix):
+    start = time.perf_counter()
+    result = {'function': function_name, 'image_uri': None, 'ok': False, 'error': None}
+    try:
+        source_tag = lutils.find_image_tag(function_name.lower(), prefix=source_prefix)
+        if not source_tag:
+            raise Exception('No image tagged {}* for {}'.format(source_prefix, function_name))
+        target_tag = lutils.promoted_tag(source_tag, source_prefix, target_prefix)
+        result['image_uri'] = lutils.promote_image(function_name, source_tag, target_tag)
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def promote_images(functions, source_prefix, target_prefix, max_workers=8):
+    # Moves the latest source_prefix build of every function to target_prefix
+    # (e.g. yasanthi_ to production_) with manifest copies only
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(lambda function: _promote_image(function, source_prefix, target_prefix), functions))
+    return {result['function']: result for result in results}
@@ -0,0 +1,414 @@
+from base64 import b64encode
+from typing import NamedTuple
+import io
+import json
+import random
+import threading
+import time
+
+import deploy_utils
+import lambda_utils as lutils
+
+
+class Scenario(NamedTuple):
+    name: str
+    # Service latency is lognormal around latency_ms with a sigma of latency_sigma
+    latency_ms: float = 20
+    latency_sigma: float = 0.5
+    throttle_rate: float = 0.0
+    conflict_rate: float = 0.0
+    cold_start_ms: float = 0.0
+    cold_start_rate: float = 0.0
+    # How long LastUpdateStatus stays InProgress after an update
+    update_ms: float = 0.0
+    seed: int = 0
+
+
+SCENARIOS = {
+    'baseline': Scenario('baseline'),
+    'slow': Scenario('slow', latency_ms=120, latency_sigma=0.8),
+    'throttled': Scenario('throttled', throttle_rate=0.2),
+    'conflicts': Scenario('conflicts', conflict_rate=0.3, update_ms=50),
+    'cold_starts': Scenario('cold_starts', cold_start_ms=400, cold_start_rate=0.05),
+}
+
+
+class FakeClientError(Exception):
+    # Reads like botocore's ClientError, callers match on the error code in str(e)
+
+    def __init__(self, code, operation, message):
+        self.code = code
+        super().__init__('An error occurred ({}) when calling the {} operation: {}'.format(code, operation, message))
+
+
+class FaultInjector:
+    # Draws latencies and failures for every fake API call from one seeded
+    # random source and counts what it injected
+
+    def __init__(self, scenario, sleep=time.sleep, time_scale=1.0):
+        self.scenario = scenario
+        self.sleep = sleep
+        self.time_scale = time_scale
+        self.counts = {'calls': 0, 'throttled': 0, 'conflicts': 0, 'cold_starts': 0}
+        self._random = random.Random(scenario.seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            return self._random.random()
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def pause(self, ms):
+        if ms > 0:
+            self.sleep(ms * self.time_scale / 1000)
+
+    def latency_ms(self):
+        scenario = self.scenario
+        if scenario.latency_ms <= 0:
+            return 0
+        with self._lock:
+            return self._random.lognormvariate(0, scenario.latency_sigma) * scenario.latency_ms
+
+    def call(self, operation):
+        # Latency first, then maybe a throttle, like a request that reached the service
+        self.count('calls')
+        self.pause(self.latency_ms())
+        if self.scenario.throttle_rate and self._draw() < self.scenario.throttle_rate:
+            self.count('throttled')
+            raise FakeClientError('TooManyRequestsException', operation, 'Rate exceeded')
+
+    def conflict(self, operation, function):
+        if self.scenario.conflict_rate and self._draw() < self.scenario.conflict_rate:
+            self.count('conflicts')
+            raise FakeClientError('ResourceConflictException', operation,
+                                  'An update is in progress for resource: ' + function)
+
+    def cold_start(self, first_call):
+        if first_call or (self.scenario.cold_start_rate and self._draw() < self.scenario.cold_start_rate):
+            if self.scenario.cold_start_ms:
+                self.count('cold_starts')
+                self.pause(self.scenario.cold_start_ms)
+            return True
+        return False
+
+
+class FakeLambdaBackend:
+    # In-memory Lambda API with injected faults. Invocations echo the event
+    # as a proxy response unless a handler(function_name, event) is given.
+
+    def __init__(self, injector, handler=None, region='us-east-1'):
+        self.injector = injector
+        self.handler = handler
+        self.region = region
+        self.functions = {}
+        self.policies = {}
+        self._lock = threading.Lock()
+
+    def _arn(self, function):
+        return 'arn:aws:lambda:{}:{}:function:{}'.format(self.region, lutils.ACCOUNT_ID, function)
+
+    def _function(self, function, operation):
+        with self._lock:
+            entry = self.functions.get(function)
+        if entry is None:
+            raise FakeClientError('ResourceNotFoundException', operation, 'Function not found: ' + function)
+        return entry
+
+    def _configuration(self, entry):
+        configuration = dict(entry['configuration'])
+        if entry['busy_until'] > time.monotonic():
+            configuration['LastUpdateStatus'] = 'InProgress'
+        return configuration
+
+    def _start_update(self, entry, operation, function):
+        if entry['busy_until'] > time.monotonic():
+            self.injector.count('conflicts')
+            raise FakeClientError('ResourceConflictException', operation,
+                                  'An update is in progress for resource: ' + function)
+        self.injector.conflict(operation, function)
+        entry['busy_until'] = time.monotonic() + self.injector.scenario.update_ms * self.injector.time_scale / 1000
+
+    def create_function(self, FunctionName, **kwargs):
+        self.injector.call('CreateFunction')
+        with self._lock:
+            if FunctionName in self.functions:
+                raise FakeClientError('ResourceConflictException', 'CreateFunction',
+                                      'Function already exist: ' + FunctionName)
+            configuration = {
+                'FunctionName': FunctionName,
+                'FunctionArn': self._arn(FunctionName),
+                'Runtime': kwargs.get('Runtime'),
+                'Handler': kwargs.get('Handler'),
+                'Timeout': kwargs.get('Timeout', 3),
+                'MemorySize': kwargs.get('MemorySize', 128),
+                'Environment': kwargs.get('Environment', {}),
+                'Layers': [{'Arn': arn} for arn in kwargs.get('Layers', [])],
+                'CodeSha256': lutils.code_sha256(kwargs['Code']['ZipFile']) if 'ZipFile' in kwargs.get('Code', {})
+                else None,
+                'State': 'Active',
+                'LastUpdateStatus': 'Successful'
+            }
+            self.functions[FunctionName] = {'configuration': configuration, 'busy_until': 0.0, 'warm': False}
+        return dict(configuration, ResponseMetadata={'HTTPStatusCode': 201})
+
+    def get_function(self, FunctionName):
+        self.injector.call('GetFunction')
+        entry = self._function(FunctionName, 'GetFunction')
+        return {'ResponseMetadata': {'HTTPStatusCode': 200}, 'Configuration': self._configuration(entry),
+                'Code': {'RepositoryType': 'S3'}}
+
+    def get_function_configuration(self, FunctionName):
+        self.injector.call('GetFunctionConfiguration')
+        return self._configuration(self._function(FunctionName, 'GetFunctionConfiguration'))
+
+    def update_function_code(self, FunctionName, **kwargs):
+        self.injector.call('UpdateFunctionCode')
+        entry = self._function(FunctionName, 'UpdateFunctionCode')
+        with self._lock:
+            self._start_update(entry, 'UpdateFunctionCode', FunctionName)
+            if 'ZipFile' in kwargs:
+                entry['configuration']['CodeSha256'] = lutils.code_sha256(kwargs['ZipFile'])
+            entry['warm'] = False
+        return dict(entry['configuration'], ResponseMetadata={'HTTPStatusCode': 200})
+
+    def update_function_configuration(self, FunctionName, **kwargs):
+        self.injector.call('UpdateFunctionConfiguration')
+        entry = self._function(FunctionName, 'UpdateFunctionConfiguration')
+        with self._lock:
+            self._start_update(entry, 'UpdateFunctionConfiguration', FunctionName)
+            configuration = entry['configuration']
+            for key in ['Environment', 'Handler', 'Runtime', 'Timeout', 'MemorySize']:
+                if key in kwargs:
+                    configuration[key] = kwargs[key]
+            if 'Layers' in kwargs:
+                configuration['Layers'] = [{'Arn': arn} for arn in kwargs['Layers']]
+            entry['warm'] = False
+        return dict(configuration, ResponseMetadata={'HTTPStatusCode': 200})
+
+    def delete_function(self, FunctionName):
+        self.injector.call('DeleteFunction')
+        self._function(FunctionName, 'DeleteFunction')
+        with self._lock:
+            del self.functions[FunctionName]
+        return {'ResponseMetadata': {'HTTPStatusCode': 204}}
+
+    def add_permission(self, FunctionName, StatementId, **kwargs):
+        self.injector.call('AddPermission')
+        with self._lock:
+            self.policies.setdefault(FunctionName, {})[StatementId] = kwargs
+        return {'Statement': json.dumps(dict(kwargs, Sid=StatementId))}
+
+    def remove_permission(self, FunctionName, StatementId):
+        self.injector.call('RemovePermission')
+        with self._lock:
+            if StatementId not in self.policies.get(FunctionName, {}):
+                raise FakeClientError('ResourceNotFoundException', 'RemovePermission', 'No policy is found')
+            del self.policies[FunctionName][StatementId]
+        return {}
+
+    def list_functions(self, MaxItems=50, Marker=None):
+        self.injector.call('ListFunctions')
+        with self._lock:
+            names = sorted(self.functions)
+        start = int(Marker or 0)
+        response = {'Functions': [self.functions[name]['configuration'] for name in names[start:start + MaxItems]]}
+        if start + MaxItems < len(names):
+            response['NextMarker'] = str(start + MaxItems)
+        return response
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', LogType='None', Payload=b'{}', **kwargs):
+        self.injector.call('Invoke')
+        entry = self._function(FunctionName, 'Invoke')
+        with self._lock:
+            first_call, entry['warm'] = not entry['warm'], True
+        start = time.perf_counter()
+        cold = self.injector.cold_start(first_call)
+        init_ms = (time.perf_counter() - start) * 1000
+        if InvocationType == 'Event':
+            return {'StatusCode': 202, 'Payload': io.BytesIO(b'')}
+        event = json.loads(Payload or b'{}')
+        if self.handler:
+            result = self.handler(FunctionName, event)
+        else:
+            result = {'statusCode': 200, 'body': json.dumps({'status': 'success', 'data': event, 'errors': []})}
+        response = {
+            'ResponseMetadata': {'HTTPStatusCode': 200},
+            'StatusCode': 200,
+            'Payload': io.BytesIO(json.dumps(result).encode('utf-8'))
+        }
+        if LogType == 'Tail':
+            duration_ms = (time.perf_counter() - start) * 1000 - init_ms
+            report = ('REPORT RequestId: fake\tDuration: {:.2f} ms\tBilled Duration: {} ms\tMemory Size: {} MB\t'
+                      'Max Memory Used: {} MB\t').format(duration_ms, int(duration_ms) + 1,
+                                                         entry['configuration']['MemorySize'],
+                                                         entry['configuration']['MemorySize'] // 2)
+            if cold:
+                report += 'Init Duration: {:.2f} ms\t'.format(init_ms)
+            response['LogResult'] = b64encode(report.encode('utf-8')).decode('utf-8')
+        return response
+
+
+class _OnePagePaginator:
+    def __init__(self, call):
+        self.call = call
+
+    def paginate(self, **kwargs):
+        yield self.call(**kwargs)
+
+
+class FakeEcrBackend:
+    def __init__(self, injector):
+        self.injector = injector
+        self.repositories = {}
+        self._lock = threading.Lock()
+
+    def create_repository(self, repositoryName, **kwargs):
+        self.injector.call('CreateRepository')
+        with self._lock:
+            if repositoryName in self.repositories:
+                raise FakeClientError('RepositoryAlreadyExistsException', 'CreateRepository', repositoryName)
+            self.repositories[repositoryName] = {}
+        return {'repository': {'repositoryName': repositoryName}}
+
+    def describe_repositories(self, **kwargs):
+        self.injector.call('DescribeRepositories')
+        with self._lock:
+            return {'repositories': [{'repositoryName': name} for name in sorted(self.repositories)]}
+
+    def describe_images(self, repositoryName, imageIds=None, **kwargs):
+        self.injector.call('DescribeImages')
+        with self._lock:
+            images = self.repositories.get(repositoryName, {})
+            tags = [image['imageTag'] for image in imageIds] if imageIds else list(images)
+            missing = [tag for tag in tags if tag not in images]
+        if imageIds and missing:
+            raise FakeClientError('ImageNotFoundException', 'DescribeImages', ', '.join(missing))
+        return {'imageDetails': [{'imageTags': [tag]} for tag in tags]}
+
+    def get_paginator(self, operation):
+        return _OnePagePaginator(getattr(self, operation))
+
+
+class FakeEventsBackend:
+    def __init__(self, injector):
+        self.injector = injector
+        self.targets = {}
+        self._lock = threading.Lock()
+
+    def list_targets_by_rule(self, Rule):
+        self.injector.call('ListTargetsByRule')
+        with self._lock:
+            return {'Targets': list(self.targets.get(Rule, {}).values())}
+
+    def put_targets(self, Rule, Targets):
+        self.injector.call('PutTargets')
+        with self._lock:
+            for target in Targets:
+                self.targets.setdefault(Rule, {})[target['Id']] = target
+        return {'FailedEntryCount': 0}
+
+    def remove_targets(self, Rule, Ids):
+        self.injector.call('RemoveTargets')
+        with self._lock:
+            for target_id in Ids:
+                self.targets.get(Rule, {}).pop(target_id, None)
+        return {'FailedEntryCount': 0}
+
+
+def make_specs(count, prefix='bench_', mode='create'):
+    return [{
+        'function': '{}function{}'.format(prefix, index),
+        'mode': mode,
+        'mappings': {
+            'code': {'S3Bucket': 'code-bucket', 'S3Key': 'function{}.zip'.format(index)},
+            'environment': {'Variables': {'VERSION': mode}}
+        },
+        'config': {
+            'runtime': 'python3.12',
+            'role': 'arn:aws:iam::{}:role/NavigatorBot'.format(lutils.ACCOUNT_ID),
+            'handler': 'lambda_function.lambda_handler',
+            'timeout': 30,
+            'memory': 256,
+            'codeSource': 's3',
+            'outputDir': '',
+            'functionNamePrefix': prefix
+        }
+    } for index in range(count)]
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+
+def run_benchmark(scenario, functions=20, invocations=200, max_workers=8, concurrency=16, time_scale=1.0):
+    # Creates, updates and invokes a fleet against the fake backend and
+    # reports end-to-end throughput. Backoff delays are shrunk by time_scale
+    # together with the injected latencies.
+    injector = FaultInjector(scenario, time_scale=time_scale)
+    backend = FakeLambdaBackend(injector)
+
+    def deploy(mode):
+        throttle = lutils.ThrottleBudget(base_delay=0.05 * time_scale, max_delay=1.0 * time_scale, max_retries=8)
+        start = time.perf_counter()
+        output = deploy_utils.deploy_many(make_specs(functions, mode=mode), max_workers=max_workers,
+                                          client=backend, throttle=throttle, base_delay=0.5 * time_scale,
+                                          max_delay=8 * time_scale)
+        return output['summary'], time.perf_counter() - start
+
+    created, create_seconds = deploy('create')
+    updated, update_seconds = deploy('update')
+
+    # invoke_many targets one function, spread the events round robin
+    names = sorted(backend.functions)
+    by_function = {name: [] for name in names}
+    for index in range(invocations if names else 0):
+        by_function[names[index % len(names)]].append({'body': json.dumps({'n': index})})
+    latencies, invoke_errors = [], 0
+    start = time.perf_counter()
+    for function, events in by_function.items():
+        for result in lutils.invoke_many(function, events, concurrency=concurrency, client=backend):
+            latencies.append(result['seconds'])
+            invoke_errors += 1 if result['error'] else 0
+    invoke_seconds = time.perf_counter() - start
+
+    return {
+        'scenario': scenario.name,
+        'created': created['created'],
+        'create_failed': created['failed'],
+        'create_per_second': created['created'] / create_seconds if create_seconds else None,
+        'updated': updated['updated'],
+        'update_failed': updated['failed'],
+        'update_per_second': updated['updated'] / update_seconds if update_seconds else None,
+        'invocations': len(latencies),
+        'invoke_errors': invoke_errors,
+        # Failed invocations return fast, only successes count as throughput
+        'invokes_per_second': (len(latencies) - invoke_errors) / invoke_seconds if invoke_seconds else None,
+        'invoke_p50_ms': _percentile(latencies, 0.5) * 1000 if latencies else None,
+        'invoke_p95_ms': _percentile(latencies, 0.95) * 1000 if latencies else None,
+        'injected': dict(injector.counts),
+    }
+
+
+def run_benchmarks(scenarios=None, **kwargs):
+    return [run_benchmark(scenario, **kwargs) for scenario in (scenarios or SCENARIOS.values())]
+
+
+def format_report(results):
+    header = '{:<12} {:>10} {:>10} {:>10} {:>9} {:>9} {:>10} {:>10} {:>10} {:>9} {:>9}'.format(
+        'scenario', 'create/s', 'update/s', 'invoke/s', 'p50 ms', 'p95 ms', 'invoke err', 'create err',
+        'update err', 'throttled', 'conflicts')
+    lines = [header, '-' * len(header)]
+    for result in results:
+        lines.append('{:<12} {:>10.1f} {:>10.1f} {:>10.1f} {:>9.1f} {:>9.1f} {:>10} {:>10} {:>10} {:>9} {:>9}'.format(
+            result['scenario'], result['create_per_second'] or 0, result['update_per_second'] or 0,
+            result['invokes_per_second'] or 0, result['invoke_p50_ms'] or 0, result['invoke_p95_ms'] or 0,
+            result['invoke_errors'], result['create_failed'], result['update_failed'],
+            result['injected']['throttled'], result['injected']['conflicts']))
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    print(format_report(run_benchmarks(time_scale=0.1)))
@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import threading
+import time
+
+INVENTORY_DB = '/tmp/lambda-inventory.sqlite'
+
+# Entries older than this are ignored and the lookup goes to the API again
+INVENTORY_TTL = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS functions (
+    region TEXT NOT NULL,
+    function_name TEXT NOT NULL,
+    response TEXT,
+    code_sha256 TEXT,
+    runtime TEXT,
+    memory_size INTEGER,
+    timeout INTEGER,
+    layers TEXT,
+    environment TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (region, function_name)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    region TEXT PRIMARY KEY,
+    taken_at REAL NOT NULL
+);
+"""
+
+
+class InventoryIndex:
+    # SQLite index of get_function responses for one region. Rows are written
+    # by a snapshot or by a live lookup, invalidate() keeps a stale row so a
+    # function created after the snapshot is not reported as missing.
+
+    def __init__(self, path=INVENTORY_DB, ttl=INVENTORY_TTL, region='us-east-1', client=None):
+        self.path = path
+        self.ttl = ttl
+        self.region = region
+        self.client = client
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def _fresh(self, fetched_at):
+        return time.time() - fetched_at <= self.ttl
+
+    def _row(self, function, response, fetched_at):
+        configuration = response.get('Configuration', {})
+        return (self.region, function, json.dumps(response, default=str), configuration.get('CodeSha256'),
+                configuration.get('Runtime'), configuration.get('MemorySize'), configuration.get('Timeout'),
+                json.dumps([layer['Arn'] for layer in configuration.get('Layers', [])]),
+                json.dumps(configuration.get('Environment', {}).get('Variables', {})),
+                fetched_at)
+
+    def put(self, function, response):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO functions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             self._row(function, response, time.time()))
+
+    def replace_all(self, responses):
+        # Swaps in a complete snapshot in one transaction, functions deleted
+        # since the last one go away
+        taken_at = time.time()
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM functions WHERE region = ?', (self.region,))
+            self._db.executemany('INSERT INTO functions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 [self._row(function, response, taken_at) for function, response in responses.items()])
+            self._db.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?)', (self.region, taken_at))
+
+    def get(self, function):
+        # The stored get_function response, None when missing or stale
+        with self._lock:
+            row = self._db.execute('SELECT response, fetched_at FROM functions WHERE region = ? AND function_name = ?',
+                                   (self.region, function)).fetchone()
+        if row and row[0] and self._fresh(row[1]):
+            return json.loads(row[0])
+        return None
+
+    def knows_absent(self, function):
+        # True when a fresh snapshot was taken and the function was not in it
+        with self._lock:
+            snapshot = self._db.execute('SELECT taken_at FROM snapshots WHERE region = ?', (self.region,)).fetchone()
+            row = self._db.execute('SELECT 1 FROM functions WHERE region = ? AND function_name = ?',
+                                   (self.region, function)).fetchone()
+        return bool(snapshot and self._fresh(snapshot[0]) and not row)
+
+    def invalidate(self, function):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO functions (region, function_name, fetched_at) VALUES (?, ?, 0)',
+                             (self.region, function))
+
+    def functions(self):
+        with self._lock:
+            rows = self._db.execute('SELECT function_name, code_sha256, runtime, memory_size, timeout, layers, '
+                                    'environment FROM functions WHERE region = ? AND response IS NOT NULL '
+                                    'ORDER BY function_name', (self.region,)).fetchall()
+        return [{'FunctionName': name, 'CodeSha256': sha, 'Runtime': runtime, 'MemorySize': memory,
+                 'Timeout': timeout, 'Layers': json.loads(layers), 'Environment': json.loads(environment)}
+                for name, sha, runtime, memory, timeout, layers, environment in rows]
+
+    def close(self):
+        self._db.close()
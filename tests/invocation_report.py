@@ -0,0 +1,109 @@
+from base64 import b64decode
+from collections import deque
+from typing import NamedTuple, Optional
+import re
+import threading
+
+REPORT_PATTERN = re.compile(
+    r'REPORT RequestId: (?P<request_id>\S+)\s+'
+    r'Duration: (?P<duration>[\d.]+) ms\s+'
+    r'Billed Duration: (?P<billed_duration>[\d.]+) ms\s+'
+    r'Memory Size: (?P<memory_size>\d+) MB\s+'
+    r'Max Memory Used: (?P<max_memory_used>\d+) MB'
+    r'(?:\s+Init Duration: (?P<init_duration>[\d.]+) ms)?'
+)
+
+
+class InvocationReport(NamedTuple):
+    request_id: str
+    duration_ms: float
+    billed_duration_ms: float
+    memory_size_mb: int
+    max_memory_used_mb: int
+    init_duration_ms: Optional[float] = None
+
+    @property
+    def cold_start(self):
+        return self.init_duration_ms is not None
+
+
+def parse_report(log_text):
+    # Returns the last REPORT line of the log tail as an InvocationReport
+    matches = list(REPORT_PATTERN.finditer(log_text))
+    if not matches:
+        return None
+    match = matches[-1]
+    init_duration = match.group('init_duration')
+    return InvocationReport(request_id=match.group('request_id'),
+                            duration_ms=float(match.group('duration')),
+                            billed_duration_ms=float(match.group('billed_duration')),
+                            memory_size_mb=int(match.group('memory_size')),
+                            max_memory_used_mb=int(match.group('max_memory_used')),
+                            init_duration_ms=float(init_duration) if init_duration else None)
+
+
+def decode_log_result(response):
+    log_result = response.get('LogResult')
+    if not log_result:
+        return ''
+    return b64decode(log_result).decode('utf-8', errors='replace')
+
+
+def report_from_response(response):
+    log_text = decode_log_result(response)
+    return parse_report(log_text) if log_text else None
+
+
+class ReportAggregator:
+    # Keeps the last `window` reports of every function
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._reports = {}
+        self._lock = threading.Lock()
+
+    def record(self, function_name, report):
+        with self._lock:
+            reports = self._reports.get(function_name)
+            if reports is None:
+                reports = deque(maxlen=self.window)
+                self._reports[function_name] = reports
+            reports.append(report)
+
+    def reports(self, function_name):
+        with self._lock:
+            return list(self._reports.get(function_name, []))
+
+    def summary(self, function_name):
+        reports = self.reports(function_name)
+        if not reports:
+            return None
+        durations = sorted(report.duration_ms for report in reports)
+        cold_starts = [report for report in reports if report.cold_start]
+        max_memory_used = max(report.max_memory_used_mb for report in reports)
+        memory_size = reports[-1].memory_size_mb
+        return {
+            'count': len(reports),
+            'cold_starts': len(cold_starts),
+            'cold_start_rate': len(cold_starts) / len(reports),
+            'avg_init_duration_ms': (sum(report.init_duration_ms for report in cold_starts) / len(cold_starts)
+                                     if cold_starts else None),
+            'avg_duration_ms': sum(durations) / len(durations),
+            'p95_duration_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            'billed_duration_ms': sum(report.billed_duration_ms for report in reports),
+            'max_memory_used_mb': max_memory_used,
+            'memory_size_mb': memory_size,
+            'memory_headroom': 1 - max_memory_used / memory_size if memory_size else None,
+        }
+
+    def summaries(self):
+        with self._lock:
+            function_names = list(self._reports)
+        return {function_name: self.summary(function_name) for function_name in function_names}
+
+    def reset(self):
+        with self._lock:
+            self._reports = {}
+
+
+REPORTS = ReportAggregator()
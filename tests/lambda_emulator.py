@@ -0,0 +1,217 @@
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import importlib
+import io
+import json
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+from config import FUNCTION_NAME_PREFIX
+
+# Lambda only returns the last 4KB of the log with LogType='Tail'
+TAIL_BYTES = 4096
+
+
+class ResourceNotFoundException(Exception):
+    pass
+
+
+class _ThreadStdout:
+    # Sends print() output of handler threads to their invocation log and
+    # everything else to the real stream
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class LambdaContext:
+    def __init__(self, function_name, memory_size, timeout, request_id, region):
+        self.function_name = function_name
+        self.function_version = '$LATEST'
+        self.memory_limit_in_mb = memory_size
+        self.aws_request_id = request_id
+        self.invoked_function_arn = 'arn:aws:lambda:{}:000000000000:function:{}'.format(region, function_name)
+        self.log_group_name = '/aws/lambda/' + function_name
+        self.log_stream_name = 'local/' + request_id
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+class _WarmFunction:
+    # One loaded handler module, reused by every invocation like a warm container
+
+    def __init__(self, function_name, handler, memory_size, timeout):
+        self.function_name = function_name
+        self.handler = handler
+        self.memory_size = memory_size
+        self.timeout = timeout
+        self.init_duration_ms = None
+        self.invocations = 0
+
+
+class LocalLambdaClient:
+    # Stand-in for the boto3 Lambda client that runs `lambda_handler` of local
+    # modules in a worker pool. FUNCTION_NAME_PREFIX + name maps to the
+    # registered handler of `name`, or to the module `package.name`. Responses
+    # have the botocore shape: StatusCode, FunctionError, a Payload stream and,
+    # with LogType='Tail', a base64 LogResult with START/END/REPORT lines.
+
+    def __init__(self, handlers=None, prefix=FUNCTION_NAME_PREFIX, package=None, max_workers=8, memory_size=128,
+                 timeout=30, region='us-east-1'):
+        self.prefix = prefix
+        self.package = package
+        self.memory_size = memory_size
+        self.timeout = timeout
+        self.region = region
+        self._targets = {name: (target, None, None) for name, target in (handlers or {}).items()}
+        self._functions = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._stdout = None
+
+    def register(self, name, target, memory_size=None, timeout=None):
+        # target is a module name, a module or a handler callable
+        with self._lock:
+            self._targets[name] = (target, memory_size, timeout)
+            self._functions.pop(name, None)
+
+    def _name(self, function_name):
+        function_name = function_name.rsplit(':', 1)[-1]
+        if self.prefix and function_name.startswith(self.prefix):
+            return function_name[len(self.prefix):]
+        return function_name
+
+    def _load(self, name, function_name):
+        target, memory_size, timeout = self._targets.get(name, (None, None, None))
+        start = time.perf_counter()
+        if target is None:
+            if not self.package:
+                raise ResourceNotFoundException(
+                    'An error occurred (ResourceNotFoundException) when calling the Invoke operation: '
+                    'Function not found: {}'.format(function_name))
+            target = '{}.{}'.format(self.package, name)
+        if isinstance(target, str):
+            try:
+                target = importlib.import_module(target)
+            except ModuleNotFoundError as e:
+                # A missing dependency of the handler is a real error, not a missing function
+                if e.name != target:
+                    raise
+                raise ResourceNotFoundException(
+                    'An error occurred (ResourceNotFoundException) when calling the Invoke operation: '
+                    'Function not found: {}'.format(function_name))
+        handler = getattr(target, 'lambda_handler', target)
+        function = _WarmFunction(function_name, handler, memory_size or self.memory_size, timeout or self.timeout)
+        function.init_duration_ms = (time.perf_counter() - start) * 1000
+        return function
+
+    def _get_function(self, function_name):
+        name = self._name(function_name)
+        with self._lock:
+            function = self._functions.get(name)
+            if function is None:
+                function = self._load(name, function_name)
+                self._functions[name] = function
+            if self._stdout is None:
+                self._stdout = _ThreadStdout(sys.stdout)
+                sys.stdout = self._stdout
+        return function
+
+    def _run(self, function, event, request_id):
+        log = io.StringIO()
+        self._stdout.local.buffer = log
+        try:
+            context = LambdaContext(function.function_name, function.memory_size, function.timeout, request_id,
+                                    self.region)
+            return function.handler(event, context), None, log
+        except Exception as e:
+            traceback.print_exc(file=log)
+            return {
+                'errorMessage': str(e),
+                'errorType': type(e).__name__,
+                'stackTrace': traceback.format_tb(e.__traceback__)
+            }, 'Unhandled', log
+        finally:
+            self._stdout.local.buffer = None
+
+    def _log_text(self, function, request_id, log, duration_ms, init_duration_ms):
+        report = ('REPORT RequestId: {}\tDuration: {:.2f} ms\tBilled Duration: {} ms\tMemory Size: {} MB\t'
+                  'Max Memory Used: {} MB\t').format(request_id, duration_ms, int(duration_ms) + 1,
+                                                     function.memory_size, function.memory_size)
+        if init_duration_ms is not None:
+            report += 'Init Duration: {:.2f} ms\t'.format(init_duration_ms)
+        return 'START RequestId: {} Version: $LATEST\n{}END RequestId: {}\n{}\n'.format(
+            request_id, log, request_id, report)
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', LogType='None', Payload=b'{}', **kwargs):
+        function = self._get_function(FunctionName)
+        if InvocationType == 'DryRun':
+            return {'StatusCode': 204, 'Payload': io.BytesIO(b'')}
+        event = json.loads(Payload or b'{}')
+        request_id = str(uuid.uuid4())
+        with self._lock:
+            init_duration_ms = function.init_duration_ms if function.invocations == 0 else None
+            function.invocations += 1
+
+        start = time.perf_counter()
+        future = self._executor.submit(self._run, function, event, request_id)
+        if InvocationType == 'Event':
+            return {'StatusCode': 202, 'Payload': io.BytesIO(b'')}
+        try:
+            result, function_error, log = future.result(timeout=function.timeout)
+            log = log.getvalue()
+        except TimeoutError:
+            # The thread cannot be stopped, it finishes in the background
+            result, function_error = {
+                'errorMessage': 'Task timed out after {:.2f} seconds'.format(function.timeout),
+                'errorType': 'TimeoutError'
+            }, 'Unhandled'
+            log = ''
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        response = {
+            'ResponseMetadata': {'RequestId': request_id, 'HTTPStatusCode': 200},
+            'StatusCode': 200,
+            'ExecutedVersion': '$LATEST',
+            'Payload': io.BytesIO(json.dumps(result, default=str).encode('utf-8'))
+        }
+        if function_error:
+            response['FunctionError'] = function_error
+        if LogType == 'Tail':
+            log_text = self._log_text(function, request_id, log, duration_ms, init_duration_ms).encode('utf-8')
+            response['LogResult'] = b64encode(log_text[-TAIL_BYTES:]).decode('utf-8')
+        return response
+
+    def invocations(self, function_name):
+        function = self._functions.get(self._name(function_name))
+        return function.invocations if function else 0
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            if self._stdout is not None and sys.stdout is self._stdout:
+                sys.stdout = self._stdout.stream
+            self._stdout = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,98 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson is several times faster for large experiment listings. It is opt-in,
+# with LAMBDA_RESPONSE_ORJSON=1, because it reads integers beyond 64 bits as
+# floats. Payloads it rejects, such as NaN or Infinity, are decoded by json.
+USE_ORJSON = orjson is not None and os.environ.get('LAMBDA_RESPONSE_ORJSON') == '1'
+
+
+def loads(data):
+    if USE_ORJSON:
+        try:
+            return orjson.loads(data)
+        except json.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+class LambdaResponse:
+    # Envelope around a Lambda proxy response. The Payload stream is read and
+    # decoded once, the inner `body` string is only decoded when accessed.
+    # `report` is the parsed REPORT line of the log tail, when there was one.
+    __slots__ = ('status_code', 'function_error', 'payload', 'report', 'log_result', '_body', '_decoded')
+
+    def __init__(self, payload, function_error=None, report=None, log_result=None):
+        self.payload = payload
+        self.function_error = function_error
+        self.report = report
+        self.log_result = log_result
+        if isinstance(payload, dict):
+            self.status_code = payload.get('statusCode')
+            self._body = payload.get('body', payload)
+        else:
+            self.status_code = None
+            self._body = payload
+        self._decoded = not isinstance(self._body, (str, bytes, bytearray))
+
+    @classmethod
+    def from_invoke(cls, response):
+        raw = response['Payload']
+        if hasattr(raw, 'read'):
+            raw = raw.read()
+        payload = loads(raw) if isinstance(raw, (str, bytes, bytearray)) else raw
+        return cls(payload, function_error=response.get('FunctionError'), report=response.get('Report'),
+                   log_result=response.get('LogResult'))
+
+    @classmethod
+    def parse(cls, response):
+        # Accepts a raw invoke response, a decoded payload or a JSON string
+        if isinstance(response, LambdaResponse):
+            return response
+        if isinstance(response, (str, bytes, bytearray)):
+            response = loads(response)
+        if isinstance(response, dict) and 'Payload' in response:
+            return cls.from_invoke(response)
+        return cls(response)
+
+    @property
+    def body(self):
+        if not self._decoded:
+            self._body = loads(self._body)
+            self._decoded = True
+        return self._body
+
+    def get(self, key, default=None):
+        body = self.body
+        return body.get(key, default) if isinstance(body, dict) else default
+
+    def __getitem__(self, key):
+        return self.body[key]
+
+    def __contains__(self, key):
+        body = self.body
+        return isinstance(body, dict) and key in body
+
+    @property
+    def status(self):
+        return self.get('status')
+
+    @property
+    def data(self):
+        return self.get('data')
+
+    @property
+    def errors(self):
+        return self.get('errors')
+
+    @property
+    def ok(self):
+        return self.function_error is None and (self.status_code is None or self.status_code < 400)
+
+    def __repr__(self):
+        return 'LambdaResponse(status_code={!r}, body={!r})'.format(self.status_code, self._body)
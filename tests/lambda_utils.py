@@ -1,39 +1,226 @@
 from typing import Literal
-import boto3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
 from time import sleep
+import hashlib
+import importlib
 import json
+import logging
+import time
 import os
+import queue
+import random
+import shutil
 import subprocess
 import sys
-import uuid
+import tempfile
+import threading
+import zipfile
 
-from base64 import b64encode
+from base64 import b64decode, b64encode
+
+import artifact_utils
+import invocation_report
+import lambda_response
+import tracing
+from tracing import logger
 
 LambdaType = Literal["ZIP", "DOCKER"]
 
-LAMBDA = boto3.client('lambda')
 
-ecr_client = boto3.client("ecr")
+
+class LazyModule:
+    # Imports the module on first attribute access. boto3 alone takes longer
+    # to import than the rest of this file, and most callers mock it anyway.
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+class LazyClient:
+    # Stand-in for a boto3 client that builds the real one on first use, so
+    # importing this module and patching LAMBDA never touch boto3
+
+    def __init__(self, service, **kwargs):
+        self._service = service
+        self._kwargs = kwargs
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = boto3.client(self._service, **self._kwargs)
+        return self._client
+
+    @property
+    def created(self):
+        return self._client is not None
+
+    def __getattr__(self, name):
+        # mock.patch and inspect probe private and dunder names, answering them
+        # must not build a client. Use get_client() for botocore internals.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.get_client(), name)
+
+    def __repr__(self):
+        return 'LazyClient({!r}, created={})'.format(self._service, self.created)
+
+
+boto3 = LazyModule('boto3')
+
+LAMBDA = LazyClient('lambda')
+
+ecr_client = LazyClient("ecr")
 
 ACCOUNT_ID = "787991150675"
 
+
+class ThrottleBudget:
+    # Shared backoff state for callers hitting the same account/region.
+    # When one caller gets a TooManyRequestsException every caller sharing
+    # the budget pauses until the cool-down has passed.
+    def __init__(self, base_delay=1, max_delay=32, max_retries=5):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.throttled = 0
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            sleep(delay)
+
+    def backoff(self, retries):
+        delay = min(self.max_delay, self.base_delay * 2**retries)
+        with self._lock:
+            self.throttled += 1
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        return delay
+
+
 def get_image_uri(function_name: str, prefix=""):
     account_uri = f"{ACCOUNT_ID}.dkr.ecr.us-east-1.amazonaws.com"
     return f"{account_uri}/{function_name.lower()}:{prefix}"
 
 
+class EcrRepositoryIndex:
+    # Repository names loaded with one paginated describe_repositories call
+    # instead of one call per function
+
+    def __init__(self, client=None):
+        self._client = client
+        self._names = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        return self._client or ecr_client
+
+    def _list_names(self):
+        names = set()
+        paginator = self.client.get_paginator("describe_repositories")
+        for page in paginator.paginate():
+            names.update(repository["repositoryName"] for repository in page.get("repositories", []))
+        return names
+
+    def load(self):
+        names = self._list_names()
+        with self._lock:
+            self._names = names
+        return names
+
+    def invalidate(self):
+        with self._lock:
+            self._names = None
+
+    def exists(self, name: str):
+        names = self._names
+        if names is None:
+            names = self.load()
+        return name in names
+
+    def ensure(self, name: str):
+        # Creates the repository only when it is missing, returns True if it was created
+        if self.exists(name):
+            return False
+        with self._lock:
+            # An invalidate() since exists() leaves nothing to check against
+            if self._names is None:
+                self._names = self._list_names()
+            if name in self._names:
+                return False
+            try:
+                create_repository(name)
+            except Exception as exc:
+                if "RepositoryAlreadyExistsException" not in str(exc):
+                    raise
+                self._names.add(name)
+                return False
+            self._names.add(name)
+        return True
+
+
+class EcrAuthCache:
+    # Keeps the docker login for each registry until its token is about to expire
+
+    def __init__(self, client=None, refresh_margin=300):
+        self._client = client
+        self.refresh_margin = refresh_margin
+        self._expires_at = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        return self._client or ecr_client
+
+    def is_valid(self, registry: str):
+        expires_at = self._expires_at.get(registry)
+        return expires_at is not None and expires_at - self.refresh_margin > time.time()
+
+    def login(self, registry=None):
+        registry = registry or f"{ACCOUNT_ID}.dkr.ecr.us-east-1.amazonaws.com"
+        with self._lock:
+            if self.is_valid(registry):
+                return False
+            response = self.client.get_authorization_token()
+            auth = response["authorizationData"][0]
+            password = b64decode(auth["authorizationToken"]).decode("utf-8").split(":", 1)[1]
+            result = subprocess.run(
+                ["docker", "login", "--username", "AWS", "--password-stdin", registry],
+                input=password.encode("utf-8"),
+            )
+            if result.returncode != 0:
+                raise Exception(f"docker login failed for {registry}")
+            self._expires_at[registry] = auth["expiresAt"].timestamp()
+        return True
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = {}
+
+
+ECR_REPOSITORIES = EcrRepositoryIndex()
+
+ECR_AUTH = EcrAuthCache()
+
+
 def ecr_repository_exists(name: str):
-    result = True
     try:
-        res = ecr_client.describe_repositories(
-            repositoryNames=[
-                name,
-            ]
-        )
+        return ECR_REPOSITORIES.exists(name)
     except Exception as exc:
-        result = False
-    
-    return result
+        return False
 
 
 def create_repository(name: str):
@@ -46,11 +233,56 @@ def create_repository(name: str):
     )
 
 
-def upload_image(rep_id, name: str, manifest):
-    return ecr_client.put_image(
-        repositoryName=name,
-        imageTag="latest",
+def upload_image(rep_id, name: str, manifest, tag="latest", media_type=None):
+    kwargs = {
+        "repositoryName": name,
+        "imageManifest": manifest,
+        "imageTag": tag,
+    }
+    if rep_id:
+        kwargs["registryId"] = rep_id
+    if media_type:
+        kwargs["imageManifestMediaType"] = media_type
+    return ecr_client.put_image(**kwargs)
+
+
+def find_image_tag(name: str, prefix="", suffix=""):
+    # Most recently pushed tag of the repository matching prefix and suffix
+    best = None
+    paginator = ecr_client.get_paginator("describe_images")
+    for page in paginator.paginate(repositoryName=name, filter={"tagStatus": "TAGGED"}):
+        for image in page.get("imageDetails", []):
+            for tag in image.get("imageTags", []):
+                if tag.startswith(prefix) and tag.endswith(suffix):
+                    if best is None or image["imagePushedAt"] > best[0]:
+                        best = (image["imagePushedAt"], tag)
+    return best[1] if best else None
+
+
+def promote_image(function_name: str, source_tag: str, target_tag: str):
+    # Copies the manifest to the new tag, the layers are already in ECR so
+    # nothing is rebuilt or pushed
+    repo_func_name = function_name.lower()
+    response = ecr_client.batch_get_image(
+        repositoryName=repo_func_name,
+        imageIds=[{"imageTag": source_tag}],
     )
+    images = response.get("images", [])
+    if not images:
+        raise Exception(f"Image {repo_func_name}:{source_tag} not found")
+    image = images[0]
+    try:
+        upload_image(None, repo_func_name, image["imageManifest"], tag=target_tag,
+                     media_type=image.get("imageManifestMediaType"))
+    except Exception as exc:
+        # put_image refuses to re-tag a digest that already carries the tag
+        if "ImageAlreadyExistsException" not in str(exc):
+            raise
+    return get_image_uri(repo_func_name, target_tag)
+
+
+def promoted_tag(tag: str, source_prefix: str, target_prefix: str):
+    return target_prefix + tag.removeprefix(source_prefix)
 
 
 def generate_docker_file(req_file_loc: str, zip_name: str, docker_runtime: str):
@@ -66,19 +298,58 @@ def generate_docker_file(req_file_loc: str, zip_name: str, docker_runtime: str):
         CMD [ "lambda_function.lambda_handler" ]
         """
 
-def create_files_dir(zip_loc: str):
-    zip_name = zip_loc.removesuffix(".zip")
-    subprocess.run(["unzip", "-o", zip_loc, "-d", zip_name])
+DOCKER_CODE_DIR = "code"
+
+DOCKER_REQUIREMENTS = "requirements.txt"
+
+# docker build is CPU and disk heavy, keep the number of parallel builds bounded
+DOCKER_BUILD_SLOTS = threading.BoundedSemaphore(4)
+
+
+def create_files_dir(zip_loc: str, dest_dir=None):
+    zip_name = dest_dir or zip_loc.removesuffix(".zip")
+    with zipfile.ZipFile(zip_loc) as archive:
+        archive.extractall(zip_name)
     return zip_name
 
-def create_docker_file(docker_file: str):
-    with open("Dockerfile", "w") as f:
+def create_docker_file(docker_file: str, context_dir="."):
+    with open(os.path.join(context_dir, "Dockerfile"), "w") as f:
         f.write(docker_file)
 
 
+def get_build_tag(prefix: str, zip_location: str, req_file_loc: str, docker_runtime: str):
+    # Same code, requirements and runtime always give the same tag
+    digest = hashlib.sha256()
+    for file_name in [zip_location, req_file_loc]:
+        if file_name:
+            digest.update(file_sha256(file_name).encode("utf-8"))
+    digest.update(generate_docker_file(DOCKER_REQUIREMENTS, DOCKER_CODE_DIR, docker_runtime).encode("utf-8"))
+    return prefix + digest.hexdigest()[:16]
+
+
+def ecr_image_exists(name: str, tag: str):
+    try:
+        ecr_client.describe_images(repositoryName=name, imageIds=[{"imageTag": tag}])
+        return True
+    except Exception:
+        return False
+
+
+def create_build_context(req_file_loc: str, zip_location: str, docker_runtime: str):
+    # Every build gets its own directory so parallel builds never share a Dockerfile
+    context_dir = tempfile.mkdtemp(prefix="lambda-build-")
+    create_files_dir(zip_location, os.path.join(context_dir, DOCKER_CODE_DIR))
+    if req_file_loc:
+        shutil.copyfile(req_file_loc, os.path.join(context_dir, DOCKER_REQUIREMENTS))
+    else:
+        open(os.path.join(context_dir, DOCKER_REQUIREMENTS), "w").close()
+    create_docker_file(generate_docker_file(DOCKER_REQUIREMENTS, DOCKER_CODE_DIR, docker_runtime), context_dir)
+    return context_dir
+
+
 def deploy_image(function_name: str, prefix: str, image_uri: str):
 
-    os.system(f"aws ecr get-login-password --region us-east-1 | docker login --username AWS --password-stdin {ACCOUNT_ID}.dkr.ecr.us-east-1.amazonaws.com")
+    ECR_AUTH.login()
 
     subprocess.call([
         "docker", "tag", f"{function_name}:{prefix}", image_uri
@@ -91,57 +362,129 @@ def process_docker_image(
     function_name: str, prefix: str, req_file_loc: str, zip_location: str, docker_runtime: str
 ):
     repo_func_name = function_name.lower()
-    image_name = f"{repo_func_name}:{prefix}"
-    zip_name = create_files_dir(zip_location)
-    docker_file = generate_docker_file(req_file_loc, zip_name, docker_runtime)
-
-    create_docker_file(docker_file)
-
-    subprocess.run(
-        [
-            "docker",
-            "build",
-            "--platform",
-            "linux/amd64",
-            "-t",
-            image_name,
-            ".",
-        ]
-    )
+    tag = get_build_tag(prefix, zip_location, req_file_loc, docker_runtime)
+    image_name = f"{repo_func_name}:{tag}"
+    image_uri = get_image_uri(repo_func_name, tag)
+
+    created = ECR_REPOSITORIES.ensure(repo_func_name)
+    if not created:
+        if ecr_image_exists(repo_func_name, tag):
+            print(f"Image {image_name} already exists, skipping build")
+            return image_uri
+        # The same build may already be in ECR under another environment prefix
+        existing_tag = find_image_tag(repo_func_name, suffix=tag.removeprefix(prefix))
+        if existing_tag:
+            print(f"Promoting {repo_func_name}:{existing_tag} to {tag}")
+            return promote_image(repo_func_name, existing_tag, tag)
+
+    with DOCKER_BUILD_SLOTS:
+        context_dir = create_build_context(req_file_loc, zip_location, docker_runtime)
+        try:
+            result = subprocess.run(
+                [
+                    "docker",
+                    "build",
+                    "--platform",
+                    "linux/amd64",
+                    "-t",
+                    image_name,
+                    context_dir,
+                ]
+            )
+            if result.returncode != 0:
+                raise Exception(f"docker build failed for {image_name}")
+
+            deploy_image(repo_func_name, tag, image_uri)
+        finally:
+            shutil.rmtree(context_dir, ignore_errors=True)
 
-    repo_exists = ecr_repository_exists(repo_func_name)
-    if not repo_exists:
-        create_repository(repo_func_name)
+    return image_uri
 
-    image_uri = get_image_uri(repo_func_name, prefix)
+# botocore's default connection pool size per client
+DEFAULT_MAX_POOL_CONNECTIONS = 10
 
-    deploy_image(repo_func_name, prefix, image_uri)
 
-    return image_uri
+class ClientPool:
+    # Thread safe cache of boto3 clients keyed by (account, region, service).
+    # Clients built from STS credentials are dropped once the session token
+    # is about to expire.
 
-def create_client_resource(aws_account=None, region='us-east-1'):
-    if not aws_account:
-        if region == 'us-east-1':
-            return LAMBDA
-        else:
-            return boto3.client('lambda', region_name=region)
-    else:
-        try:
-            client = boto3.client('lambda',
-                                  region_name=region,
-                                  aws_access_key_id=aws_account['AccessKeyId'],
-                                  aws_secret_access_key=aws_account['SecretAccessKey'],
-                                  aws_session_token=aws_account['SessionToken'])
-            return client
-        except Exception as e:
-            print(aws_account)
-            print('Unable to get a new connection for the provided credentials' + str(e))
+    def __init__(self, expiry_margin=300):
+        self.expiry_margin = expiry_margin
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _expires_at(aws_account):
+        expiration = aws_account.get('Expiration') if aws_account else None
+        if expiration is None:
             return None
+        if isinstance(expiration, str):
+            expiration = datetime.fromisoformat(expiration)
+        return expiration.timestamp()
+
+    @staticmethod
+    def _create(aws_account, region, service, max_connections):
+        from botocore.config import Config
+        kwargs = {
+            'region_name': region,
+            'config': Config(max_pool_connections=max_connections)
+        }
+        if aws_account:
+            kwargs['aws_access_key_id'] = aws_account['AccessKeyId']
+            kwargs['aws_secret_access_key'] = aws_account['SecretAccessKey']
+            kwargs['aws_session_token'] = aws_account['SessionToken']
+        return boto3.client(service, **kwargs)
+
+    def _is_fresh(self, entry):
+        return entry['expires_at'] is None or entry['expires_at'] - self.expiry_margin > time.time()
+
+    def get(self, aws_account=None, region='us-east-1', service='lambda', max_connections=None):
+        key = (aws_account['AccessKeyId'] if aws_account else None, region, service)
+        max_connections = max_connections or DEFAULT_MAX_POOL_CONNECTIONS
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry and self._is_fresh(entry) and entry['max_connections'] >= max_connections:
+                return entry['client']
+            client = self._create(aws_account, region, service, max_connections)
+            self._clients[key] = {
+                'client': client,
+                'expires_at': self._expires_at(aws_account),
+                'max_connections': max_connections
+            }
+            return client
+
+    def evict_expired(self):
+        with self._lock:
+            expired = [key for key, entry in self._clients.items() if not self._is_fresh(entry)]
+            for key in expired:
+                del self._clients[key]
+        return len(expired)
 
+    def clear(self):
+        with self._lock:
+            self._clients = {}
 
-def get_connection(client):
+
+CLIENT_POOL = ClientPool()
+
+
+def create_client_resource(aws_account=None, region='us-east-1', service='lambda', max_connections=None):
+    if not aws_account and region == 'us-east-1' and service == 'lambda' and not max_connections:
+        return LAMBDA
+    try:
+        return CLIENT_POOL.get(aws_account, region, service, max_connections)
+    except Exception as e:
+        print(aws_account)
+        print('Unable to get a new connection for the provided credentials' + str(e))
+        return None
+
+
+def get_connection(client, aws_account=None, region='us-east-1'):
     if client:
         return client
+    elif aws_account or region != 'us-east-1':
+        return create_client_resource(aws_account, region)
     else:
         return LAMBDA
 
@@ -156,6 +499,26 @@ def get_zipfile_bytes(function, input_dir):
         return data.read()
 
 
+def code_sha256(zipfile):
+    # Lambda reports CodeSha256 as the base64 encoded SHA-256 digest
+    return b64encode(hashlib.sha256(zipfile).digest()).decode('utf-8')
+
+
+def file_sha256(file_name, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as data:
+        for chunk in iter(lambda: data.read(chunk_size), b''):
+            digest.update(chunk)
+    return b64encode(digest.digest()).decode('utf-8')
+
+
+def get_deployed_code_sha256(function, client=None):
+    configuration = get_function_configuration(function, client)
+    if configuration:
+        return configuration.get('CodeSha256')
+    return None
+
+
 def create_prediction_lambda(name, code_bucket, code_key,
                              model_bucket, model_key, client=None):
     client = get_connection(client)
@@ -242,7 +605,7 @@ def add_permission_for_apigateway(rest_api, lambda_uri, http_method='POST',
 
 
 def add_event_rule(event_rule, overwrite_event, function_name, function_arn):
-    event_client = boto3.client('events')
+    event_client = create_client_resource(service='events')
     try:
         response = event_client.list_targets_by_rule(Rule=event_rule)
     except Exception as e:
@@ -271,63 +634,273 @@ def add_event_rule(event_rule, overwrite_event, function_name, function_arn):
     return response
 
 
-def update_function_code(name, s3_bucket, s3_key, zipfile=None, client=None):
+def update_function_code(name, s3_bucket, s3_key, zipfile=None, client=None, skip_unchanged=False, image_uri=None,
+                         throttle=None, base_delay=0.5, max_delay=8):
     response = None
     try:
         client = get_connection(client)
-        if zipfile:
-            response = client.update_function_code(FunctionName=name,
-                                                ZipFile=zipfile)
+        if zipfile and skip_unchanged:
+            # Only zip uploads can be compared, S3 code would need a download first
+            configuration = get_function_configuration(name, client)
+            if configuration and configuration.get('CodeSha256') == code_sha256(zipfile):
+                print('Code of {} is unchanged, skipping upload'.format(name))
+                return configuration
+        _invalidate_inventory(name, client)
+        if image_uri:
+            code = {'ImageUri': image_uri}
+        elif zipfile:
+            code = {'ZipFile': zipfile}
         else:
-            response = client.update_function_code(FunctionName=name,
-                                                S3Bucket=s3_bucket,
-                                                S3Key=s3_key)
+            code = {'S3Bucket': s3_bucket, 'S3Key': s3_key}
+        response = retry_on_conflict(name, lambda: client.update_function_code(FunctionName=name, **code), client,
+                                     throttle, base_delay, max_delay)
         #print('Response update_function_code: {}'.format(response))
     except Exception as err:
         print('Unable to update function code! Error: ', str(err))
         raise
     return response
 
-def update_function_configuration(name, environment, handler, layers, client=None, runtime=None):
-    response = None
+def backoff_delay(retries, base_delay=0.5, max_delay=8):
+    # Capped exponential backoff with full jitter
+    return random.uniform(0, min(max_delay, base_delay * 2**retries))
+
+
+def is_function_ready(configuration):
+    # Updates are rejected while the function is Pending or an update is InProgress
+    return configuration.get('State') != 'Pending' and configuration.get('LastUpdateStatus') != 'InProgress'
+
+
+def wait_until_ready(function, client=None, timeout=300, base_delay=0.5, max_delay=8):
+    client = get_connection(client)
+    deadline = time.monotonic() + timeout
+    retries = 0
+    while True:
+        try:
+            configuration = client.get_function_configuration(FunctionName=function)
+            if is_function_ready(configuration):
+                if configuration.get('LastUpdateStatus') == 'Failed':
+                    print('Last update of {} failed: {}'.format(function, configuration.get('LastUpdateStatusReason')))
+                return configuration
+        except Exception as e:
+            print('Unable to get lambda state {}'.format(function) + str(e))
+        delay = backoff_delay(retries, base_delay, max_delay)
+        if time.monotonic() + delay > deadline:
+            print('Timed out waiting for {} to become ready'.format(function))
+            return None
+        retries += 1
+        sleep(delay)
+
+
+# Updates retried while an earlier update of the function is still in progress
+MAX_CONFLICT_RETRIES = 10
+
+
+def retry_on_conflict(function, call, client=None, throttle=None, base_delay=0.5, max_delay=8):
+    # Runs an update call, on ResourceConflictException waits for the function
+    # to be ready and tries again. With a ThrottleBudget a TooManyRequestsException
+    # backs off through the shared budget and is retried too. Other errors are raised.
+    retries = 0
+    throttled = 0
+    while True:
+        if throttle:
+            throttle.wait()
+        try:
+            return call()
+        except Exception as e:
+            if throttle and 'TooManyRequestsException' in str(e) and throttled < throttle.max_retries:
+                throttled += 1
+                print('TooManyRequestsException: {}. Retrying in {}s'.format(str(e), throttle.backoff(throttled)))
+                continue
+            if 'ResourceConflictException' not in str(e) or retries >= MAX_CONFLICT_RETRIES:
+                raise
+            # Another update is still in progress, wait for it instead of sleeping blindly
+            print(' Warning: ', str(e))
+            retries += 1
+            if not wait_until_ready(function, client, base_delay=base_delay, max_delay=max_delay):
+                raise
+
+
+def update_function_configuration(name, environment, handler, layers, client=None, runtime=None, timeout=None,
+                                  memory=None, throttle=None, base_delay=0.5, max_delay=8):
+    client = get_connection(client)
     kwargs = {
         'FunctionName': name,
-        'Environment': environment,
-        'Handler': handler,
-        'Layers': layers
+        'Environment': environment
     }
+    # Image functions have no handler or layers
+    if handler is not None:
+        kwargs['Handler'] = handler
+    if layers is not None:
+        kwargs['Layers'] = layers
     if runtime:
         kwargs['Runtime'] = runtime
+    if timeout:
+        kwargs['Timeout'] = timeout
+    if memory:
+        kwargs['MemorySize'] = memory
+    _invalidate_inventory(name, client)
     response = None
     try:
-        MAX_RETRIES = 10
-        retries = 0
-        while not response and retries < MAX_RETRIES:
-            timeout = 4**retries
-            if retries:
-                sleep(timeout)
-            try:
-                response = client.update_function_configuration(**kwargs)
-            except client.exceptions.ResourceConflictException as err:
-                print(' Warning: ', str(err))
-                response = None
-                retries += 1
-                print('pausing execution for {} seconds'.format(timeout))
-                sleep(timeout)
-            except Exception as e:
-                print('Error during Lambda function configuration update of {}. Error:'.format(name), str(e))
-                return None
-    except Exception as err:
-        print('Unable to update function configuration! Error: ', str(err))
-        print('Unable to update function configuration for {}! Error: '.format(name), str(err))
+        response = retry_on_conflict(name, lambda: client.update_function_configuration(**kwargs), client, throttle,
+                                     base_delay, max_delay)
+    except Exception as e:
+        print('Error during Lambda function configuration update of {}. Error:'.format(name), str(e))
+    if not response:
+        print('Unable to update function configuration for {}!'.format(name))
     return response
 
 
+class UpdatePipeline:
+    # Queues the updates of each function and runs them back-to-back, waiting
+    # for the function to be ready before every stage so they never conflict.
+    # Different functions run in parallel. A ThrottleBudget shared with other
+    # callers retries throttled updates. base_delay and max_delay bound the
+    # polling backoff while waiting for the function.
+
+    def __init__(self, client=None, timeout=300, throttle=None, base_delay=0.5, max_delay=8):
+        self.client = get_connection(client)
+        self.timeout = timeout
+        self.throttle = throttle
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._queues = {}
+
+    def add_stage(self, function, name, call):
+        self._queues.setdefault(function, []).append((name, call))
+
+    def add_code_update(self, function, s3_bucket=None, s3_key=None, zipfile=None, image_uri=None):
+        self.add_stage(function, 'code',
+                       lambda: update_function_code(function, s3_bucket, s3_key, zipfile=zipfile,
+                                                    client=self.client, image_uri=image_uri,
+                                                    **self.retry_options()))
+
+    def add_configuration_update(self, function, environment, handler, layers, runtime=None, timeout=None,
+                                 memory=None):
+        self.add_stage(function, 'configuration',
+                       lambda: update_function_configuration(function, environment, handler, layers,
+                                                             client=self.client, runtime=runtime, timeout=timeout,
+                                                             memory=memory, **self.retry_options()))
+
+    def retry_options(self):
+        # Keyword arguments for update calls made from custom stages
+        return {'throttle': self.throttle, 'base_delay': self.base_delay, 'max_delay': self.max_delay}
+
+    def _wait(self, function):
+        return wait_until_ready(function, self.client, self.timeout, self.base_delay, self.max_delay)
+
+    def _timed(self, timings, name, call):
+        start = time.perf_counter()
+        try:
+            return call()
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    def _run_function(self, function, stages):
+        timings = {}
+        result = {'function': function, 'ok': False, 'response': None, 'error': None, 'timings': timings}
+        try:
+            for name, call in stages:
+                if not self._timed(timings, name + '_wait', lambda: self._wait(function)):
+                    result['error'] = 'Timed out waiting before {} update'.format(name)
+                    return result
+                response = self._timed(timings, name, call)
+                if not response:
+                    result['error'] = '{} update failed'.format(name)
+                    return result
+                result['response'] = response
+            if not self._timed(timings, 'ready', lambda: self._wait(function)):
+                result['error'] = 'Timed out waiting for the last update'
+                return result
+            result['ok'] = True
+        except Exception as e:
+            result['error'] = str(e)
+        finally:
+            timings['total'] = sum(timings.values())
+        return result
+
+    def run(self, max_workers=8):
+        queues, self._queues = self._queues, {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(lambda item: self._run_function(*item), queues.items()))
+        return {result['function']: result for result in results}
+
+
+# InventoryIndex consulted by the lookups below, see use_inventory
+INVENTORY = None
+
+
+def use_inventory(index, client=None):
+    # Serve is_lambda_defined, get_function_info and get_function_configuration
+    # for `client` from the index, None switches back to the API
+    global INVENTORY
+    if index is not None:
+        index.client = get_connection(client)
+    INVENTORY = index
+
+
+def _inventory_for(client):
+    if INVENTORY is not None and client is INVENTORY.client:
+        return INVENTORY
+    return None
+
+
+def _invalidate_inventory(function, client):
+    index = _inventory_for(client)
+    if index:
+        index.invalidate(function)
+
+
+def _get_function(function, client):
+    index = _inventory_for(client)
+    if index:
+        response = index.get(function)
+        if response:
+            return response
+    response = client.get_function(FunctionName=function)
+    if index:
+        index.put(function, response)
+    return response
+
+
+def snapshot_inventory(index, client=None, max_workers=8, page_size=50):
+    # Pulls get_function for every function with at most max_workers calls
+    # in flight and replaces the region's rows in the index
+    client = get_connection(client)
+    responses = {}
+
+    def fetch(name):
+        try:
+            return name, client.get_function(FunctionName=name)
+        except Exception as e:
+            # Deleted between list_functions and get_function
+            if 'ResourceNotFoundException' not in str(e):
+                raise
+            logger.info('Skipping %s, deleted during the inventory snapshot', name)
+            return name, None
+
+    def collect(futures):
+        responses.update(response for response in (future.result() for future in futures) if response[1])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for configuration in iter_functions(client, page_size):
+            pending.add(pool.submit(fetch, configuration['FunctionName']))
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(pending)
+    index.replace_all(responses)
+    return len(responses)
+
+
 def is_lambda_defined(function, client=None):
     result = False
     client = get_connection(client)
+    index = _inventory_for(client)
+    if index and index.knows_absent(function):
+        return False
     try:
-        response = client.get_function(FunctionName=function)
+        response = _get_function(function, client)
         # print(response)
         metadata = response['ResponseMetadata']
         if metadata['HTTPStatusCode'] == 200 and response['Configuration']:
@@ -338,12 +911,15 @@ def is_lambda_defined(function, client=None):
     return result
 
 
-def get_function_info(function, client):
+def get_function_info(function, client, strict=False):
+    # None when the function cannot be read. With strict only a missing
+    # function gives None, throttling, AccessDenied, ... are raised.
     client = get_connection(client)
     try:
-        response = client.get_function(FunctionName=function)
-        return response
-    except:
+        return _get_function(function, client)
+    except Exception as e:
+        if strict and 'ResourceNotFoundException' not in str(e):
+            raise
         print('Unable to get the function {} details!'.format(function))
         return None
 
@@ -351,6 +927,7 @@ def get_function_info(function, client):
 def delete_lambda(function, client=None):
     result = False
     client = get_connection(client)
+    _invalidate_inventory(function, client)
     try:
         response = client.delete_function(FunctionName=function)
         # print(response)
@@ -365,6 +942,11 @@ def delete_lambda(function, client=None):
 def get_function_configuration(function, client=None):
     response = None
     client = get_connection(client)
+    index = _inventory_for(client)
+    if index:
+        cached = index.get(function)
+        if cached:
+            return cached['Configuration']
     try:
         response = client.get_function_configuration(FunctionName=function)
     except Exception as e:
@@ -372,7 +954,7 @@ def get_function_configuration(function, client=None):
     return response
 
 
-def create_lambda(function, mappings, config, client=None, *, lambda_type="ZIP", base_function_name=""):
+def create_lambda(function, mappings, config, client=None, *, lambda_type="ZIP", base_function_name="", throttle=None):
     output_dir = ''
     client = get_connection(client)
     try:
@@ -455,20 +1037,10 @@ def create_lambda(function, mappings, config, client=None, *, lambda_type="ZIP",
         if aws_account:
             # For connected accounts we need to download the code locally
             # They upload it via zip bytes
-            uuid_str = str(uuid.uuid4())
-            temp_zip_loc = '/tmp/' + uuid_str + '.zip'
-            print(temp_zip_loc)
-            if os.path.exists(temp_zip_loc):
-                os.remove(temp_zip_loc)
-            # Download the predict zip file
-            # NOTE: this is the code from the pyxeda account
-            s3_client = boto3.client('s3')
-            s3_client.download_file(mappings['code']['S3Bucket'],
-                                    mappings['code']['S3Key'],
-                                    temp_zip_loc)
-            # get_zipfile_bytes constructs the file differently
-            code = {'ZipFile': get_zipfile_bytes(uuid_str, '/tmp/')}
-            os.remove(temp_zip_loc)
+            # NOTE: this is the code from the pyxeda account, the shared cache
+            # downloads it once per ETag for every function and account
+            code = {'ZipFile': artifact_utils.get_artifact_cache().get_bytes(mappings['code']['S3Bucket'],
+                                                                            mappings['code']['S3Key'])}
         elif lambda_type == "DOCKER":
             docker_runtime = "12"
             try:
@@ -479,10 +1051,13 @@ def create_lambda(function, mappings, config, client=None, *, lambda_type="ZIP",
             image_uri = process_docker_image(base_function_name, config['functionNamePrefix'], req_file_loc , get_zip_file_name(output_dir, function), docker_runtime)
         else:
             if code_type == 'local':
+                # Large zips are staged in S3 when a staging bucket is configured
+                staging_bucket = config.get('stagingBucket')
                 if 'code' in mappings and 'localFile' in mappings['code']:
-                    code = {'ZipFile': get_zipfile_bytes(mappings['code']['localFile'], output_dir)}
+                    zip_file_name = get_zip_file_name(output_dir, mappings['code']['localFile'])
                 else:
-                    code = {'ZipFile': get_zipfile_bytes(function, output_dir)}
+                    zip_file_name = get_zip_file_name(output_dir, function)
+                code = artifact_utils.get_code(zip_file_name, function, staging_bucket)
             elif code_type == 's3':
                 code = mappings['code']
             else:
@@ -493,11 +1068,14 @@ def create_lambda(function, mappings, config, client=None, *, lambda_type="ZIP",
         print('Error: ', str(e))
         pass
 
+    _invalidate_inventory(function, client)
     retries = 0
-    max_retries = 5
+    max_retries = throttle.max_retries if throttle else 5
     response = None
     while retries < max_retries:
         try:
+            if throttle:
+                throttle.wait()
             if lambda_type == "DOCKER":
                 response = client.create_function(FunctionName=function,
                                             Role=role,
@@ -529,6 +1107,11 @@ def create_lambda(function, mappings, config, client=None, *, lambda_type="ZIP",
             if 'TooManyRequestsException' in str(e):
                 print(f"TooManyRequestsException: {str(e)}. Retrying with exponential backoff...")
                 retries += 1
+                if throttle:
+                    # The shared budget decides the pause, wait() applies it
+                    backoff = throttle.backoff(retries)
+                    print(f'Attempting retry: {retries}, Retrying in {backoff}s......')
+                    continue
                 backoff = 2**retries
                 print(f'Attempting retry: {retries}, Retrying in {backoff}s......')
                 sleep(backoff)    
@@ -575,50 +1158,86 @@ def update_lambda(function, input_dir):
     return
 
 
-def update_lambda_code(function: str, output_dir: str, lambda_type: LambdaType, client=None):
+def update_lambda_code(function: str, output_dir: str, lambda_type: LambdaType, client=None, skip_unchanged=False,
+                       staging_bucket=None):
 
     client = get_connection(client)
 
-    zip_file = get_zipfile_bytes(function, output_dir)
+    zip_file_name = get_zip_file_name(output_dir, function)
+
+    if skip_unchanged:
+        configuration = get_function_configuration(function, client)
+        if configuration and configuration.get('CodeSha256') == file_sha256(zip_file_name):
+            print('Code of {} is unchanged, skipping upload'.format(function))
+            return configuration
 
-    params = {
-        "FunctionName": function,
-        "ZipFile": zip_file,
-        "Architectures": ["x86_64"],
-    }
-    
     # if lambda_type == "DOCKER":
     #     docker_uri = get_image_uri()
     #     "ImageUri": "string",
 
-
+    _invalidate_inventory(function, client)
     try:
-        client.update_function_code(
+        code = artifact_utils.get_code(zip_file_name, function, staging_bucket)
+        return client.update_function_code(
             FunctionName=function,
-            ZipFile=zip_file,
             # ImageUri="string",
             Architectures=["x86_64"],
+            **code,
         )
     except Exception as exc:
         print(f"Failed to deploy {exc}")
 
 
+def _traced_invoke(client, function_name, invocation_type, log_type, payload):
+    # Runs client.invoke through the tracer, returns the raw response
+    span = tracing.TRACER.start(function_name, payload)
+    try:
+        response = client.invoke(FunctionName=function_name,
+                                 InvocationType=invocation_type,
+                                 LogType=log_type,
+                                 Payload=json.dumps(payload))
+    except Exception as e:
+        tracing.TRACER.finish(span, error=e)
+        raise
+    tracing.TRACER.finish(span, response, response.get('FunctionError'))
+    if log_type == 'Tail':
+        attach_report(function_name, response)
+    return response
+
+
+def invoke_payload(function_name, payload, invocation_type='RequestResponse', log_type='None', client=None):
+    # Traced invoke of a ready-made payload, returns the raw boto3 response
+    return _traced_invoke(get_connection(client), function_name, invocation_type, log_type, payload)
+
+
+def attach_report(function_name, response):
+    # Parses the REPORT line of the base64 log tail into response['Report']
+    # and feeds the rolling per-function aggregator
+    if not isinstance(response, dict) or not response.get('LogResult'):
+        return None
+    try:
+        report = invocation_report.report_from_response(response)
+    except Exception as e:
+        logger.warning('Unable to parse the log tail of %s: %s', function_name, e)
+        return None
+    if report:
+        response['Report'] = report
+        invocation_report.REPORTS.record(function_name, report)
+    return report
+
+
 def insert_into_db(function_name, params, invocation_type='RequestResponse'):
     body = {}
     for key, param in params.items():
-        print(key, param)
         body[key] = param
     log_type = 'None'
     payload = {}
     payload['httpMethod'] = 'POST'
 
     payload['body'] = json.dumps(body)
-    print('Payload: {}'.format(json.dumps(payload)))
+    tracing.log_payload('Payload: %s', payload)
 
-    response = LAMBDA.invoke(FunctionName=function_name,
-                             InvocationType=invocation_type,
-                             LogType=log_type,
-                             Payload=json.dumps(payload))
+    response = _traced_invoke(LAMBDA, function_name, invocation_type, log_type, payload)
     # print(response)
     string_response = response['Payload'].read().decode('utf-8')
     if invocation_type == 'RequestResponse':
@@ -634,12 +1253,10 @@ def insert_into_db(function_name, params, invocation_type='RequestResponse'):
 def update_db_entry(function_name, primary_key_params, body_params):
     query_string_params = {}
     for key, param in primary_key_params.items():
-        print(key, param)
         query_string_params[key] = param
     # Setup the update params
     body = {}
     for key, param in body_params.items():
-        print(key, param)
         body[key] = param
     invocation_type = 'RequestResponse'
     log_type = 'None'
@@ -647,12 +1264,9 @@ def update_db_entry(function_name, primary_key_params, body_params):
     payload['httpMethod'] = 'PATCH'
     payload['queryStringParameters'] = query_string_params
     payload['body'] = json.dumps(body)
-    print('Payload: {}'.format(json.dumps(payload)))
+    tracing.log_payload('Payload: %s', payload)
 
-    response = LAMBDA.invoke(FunctionName=function_name,
-                             InvocationType=invocation_type,
-                             LogType=log_type,
-                             Payload=json.dumps(payload))
+    response = _traced_invoke(LAMBDA, function_name, invocation_type, log_type, payload)
     # print(response)
     string_response = response["Payload"].read().decode('utf-8')
     try:
@@ -666,6 +1280,17 @@ def update_db_entry(function_name, primary_key_params, body_params):
     return parsed_response
 
 
+def build_payload(body='', query_string_params='', http_method='POST', path=None):
+    payload = {
+        'body': body,
+        'queryStringParameters': query_string_params,
+        'httpMethod': http_method
+    }
+    if path:
+        payload['path'] = path
+    return payload
+
+
 def invoke_lambda(function_name,
                   body='',
                   query_string_params='',
@@ -673,33 +1298,101 @@ def invoke_lambda(function_name,
                   client_context='',
                   http_method='POST',
                   client=None,
-                  path=None):
+                  path=None,
+                  envelope=False):
+    # envelope=True returns a lambda_response.LambdaResponse that decodes
+    # the inner body lazily instead of the decoded payload dict
     if not client:
         client = LAMBDA
-    payload = {
-        'body': body,
-        'queryStringParameters': query_string_params,
-        'httpMethod': http_method
-    }
-    if path:
-        payload['path'] = path
-    print(function_name, json.dumps(payload), invocation_type)
+    payload = build_payload(body, query_string_params, http_method, path)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('%s %s %s', function_name, json.dumps(payload), invocation_type)
     try:
-        response = client.invoke(FunctionName=function_name,
-                             InvocationType=invocation_type,
-                             LogType='Tail',
-                             Payload=json.dumps(payload))
+        response = _traced_invoke(client, function_name, invocation_type, 'Tail', payload)
         if invocation_type == 'RequestResponse':
+            if envelope:
+                return lambda_response.LambdaResponse.from_invoke(response)
             response_payload = json.loads(response['Payload'].read().decode("utf-8"))
-            print ("response_payload: {}".format(response_payload))
+            tracing.log_payload('response_payload: %s', response_payload)
             return response_payload
         else:
             return response
     except Exception as e:
-        print('Error: ', str(e))
+        logger.error('Error: %s', str(e))
         return None
 
 
+def _invoke_item(function_name, index, event, client):
+    start = time.perf_counter()
+    result = {'index': index, 'event': event, 'response': None, 'error': None, 'report': None}
+    try:
+        invocation_type = event.get('invocation_type', 'RequestResponse')
+        payload = build_payload(event.get('body', ''),
+                                event.get('query_string_params', ''),
+                                event.get('http_method', 'POST'),
+                                event.get('path'))
+        response = _traced_invoke(client, function_name, invocation_type, 'Tail', payload)
+        result['report'] = response.get('Report')
+        if invocation_type == 'RequestResponse':
+            result['response'] = json.loads(response['Payload'].read().decode("utf-8"))
+            if response.get('FunctionError'):
+                # The handler raised, the payload holds errorMessage/errorType
+                result['error'] = '{}: {}'.format(response['FunctionError'],
+                                                  result['response'].get('errorMessage', ''))
+        else:
+            result['response'] = response
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def invoke_many(function_name, events, concurrency=8, ordered=False, client=None):
+    # Generator over invoke results for many events. Each event is a dict with
+    # the invoke_lambda arguments (body, query_string_params, http_method,
+    # path, invocation_type). Results carry index, event, response, error and
+    # seconds and are yielded in completion order, or input order if ordered.
+    # Only a window of 2 * concurrency events is in flight or, in ordered
+    # mode, waiting for an earlier result at any time.
+    client = get_connection(client)
+    events = enumerate(events)
+    window = concurrency * 2
+    pending = {}
+    buffered = {}
+    next_index = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        def fill():
+            while len(pending) + len(buffered) < window:
+                item = next(events, None)
+                if item is None:
+                    return
+                index, event = item
+                pending[pool.submit(_invoke_item, function_name, index, event, client)] = index
+
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                results = []
+                for future in done:
+                    del pending[future]
+                    results.append(future.result())
+                if ordered:
+                    buffered.update((result['index'], result) for result in results)
+                    results = []
+                    while next_index in buffered:
+                        results.append(buffered.pop(next_index))
+                        next_index += 1
+                # Refill before handing results to the caller so the pool stays busy
+                fill()
+                for result in results:
+                    yield result
+        finally:
+            # The caller stopped early, drop what has not started yet
+            for future in pending:
+                future.cancel()
+
+
 def publish_layer_version(client, layer_name, description, content, run_times=['python3.8'], license_info='MIT'):
     try:
         response = client.publish_layer_version(LayerName=layer_name,
@@ -724,7 +1417,7 @@ def list_layers(client, compatible_runtime='python3.12', marker=None, max_items=
     response = None
     try:
         response = client.list_layers(**kwargs)
-        print(response)
+        logger.debug('list_layers: %s', response)
     except Exception as e:
         print('Unale to list the layers! Error: ', str(e))
     return response
@@ -742,7 +1435,7 @@ def list_layer_versions(client, layer_name, compatible_runtime='python3.12', mar
 
     try:
         response = client.list_layer_versions(**kwargs)
-        print(response)
+        logger.debug('list_layer_versions: %s', response)
     except Exception as e:
         print('Unale to list the layer versions! Error: ', str(e))
     return response
@@ -756,7 +1449,91 @@ def list_functions(client, marker=None, max_items=None):
     response = None
     try:
         response = client.list_functions(**kwargs)
-        print(response)
+        logger.debug('list_functions: %s', response)
     except Exception as e:
         print('Unale to list the functions! Error: ', str(e))
     return response
+
+
+def iter_pages(list_call, result_key, page_size=50, **kwargs):
+    # Follows NextMarker lazily, only one page is held in memory at a time
+    marker = None
+    while True:
+        if marker:
+            kwargs['Marker'] = marker
+        response = list_call(MaxItems=page_size, **kwargs)
+        yield from response.get(result_key, [])
+        marker = response.get('NextMarker')
+        if not marker:
+            return
+
+
+def iter_functions(client=None, page_size=50):
+    return iter_pages(get_connection(client).list_functions, 'Functions', page_size)
+
+
+def iter_layers(client=None, compatible_runtime=None, page_size=50):
+    kwargs = {'CompatibleRuntime': compatible_runtime} if compatible_runtime else {}
+    return iter_pages(get_connection(client).list_layers, 'Layers', page_size, **kwargs)
+
+
+def iter_layer_versions(layer_name, client=None, compatible_runtime=None, page_size=50):
+    kwargs = {'LayerName': layer_name}
+    if compatible_runtime:
+        kwargs['CompatibleRuntime'] = compatible_runtime
+    return iter_pages(get_connection(client).list_layer_versions, 'LayerVersions', page_size, **kwargs)
+
+
+_REGION_DONE = object()
+
+
+def iter_functions_in_regions(regions, aws_account=None, page_size=50, buffer_size=200):
+    # Scans every region in its own thread and yields (region, function) as
+    # pages arrive. The hand-off queue is bounded, so memory stays constant
+    # however many functions there are. A failing region is raised once the
+    # other regions have been drained.
+    items = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def scan(region):
+        try:
+            client = create_client_resource(aws_account, region)
+            if client is None:
+                raise Exception('No Lambda client for region {}'.format(region))
+            for function in iter_functions(client, page_size):
+                if not put((region, function)):
+                    return
+            put((region, _REGION_DONE))
+        except Exception as e:
+            put((region, e))
+
+    regions = list(regions)
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(len(regions), 1)) as pool:
+        for region in regions:
+            pool.submit(scan, region)
+        try:
+            remaining = len(regions)
+            while remaining:
+                region, item = items.get()
+                if item is _REGION_DONE:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    logger.error('Unable to list the functions in %s: %s', region, item)
+                    errors.append(item)
+                    remaining -= 1
+                else:
+                    yield region, item
+        finally:
+            stop.set()
+    if errors:
+        raise errors[0]
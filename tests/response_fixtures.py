@@ -0,0 +1,153 @@
+import io
+import json
+import threading
+
+# Canonical Lambda proxy responses of the suites: name -> (statusCode, body).
+# Each one is serialized once per session by ResponseFactory.
+RESPONSE_SHAPES = {
+    'launch_fe_ready': (200, {
+        'report_id': 'report123',
+        'service_id': 'service123',
+        'data_id': 'data123',
+        'predict_col': 'target',
+        'status': 'ready',
+        'cloud': 'AWS',
+        'result': 'success',
+        'engine': 'aws-sklearn-serverless'
+    }),
+    'launch_fe_status': (200, {
+        'report123': {
+            'status': 'ready',
+            'engine': 'aws-sklearn-serverless',
+            'result': 'success'
+        }
+    }),
+    'download_url': (200, {
+        'result': 'success',
+        'url': 'https://s3-url.com/train.csv'
+    }),
+    'failure': (400, {
+        'result': 'failure',
+        'error': 'Missing required parameters'
+    }),
+    'retrain_details': (200, {
+        'retrain123': {
+            'retrainId': 'retrain123',
+            'serId': 'service123',
+            'dataId': 'data123',
+            'userId': 'user123',
+            'predictCol': 'target',
+            'reportId': 'report123',
+            'expId': 'exp123',
+            'depId': 'dep123',
+            'timestamp': '2025-04-09T10:25:14',
+            'currentStage': 'training',
+            'status': 'Running',
+            'message': 'Training in progress',
+            'dataLocation': 's3://bucket/data123'
+        }
+    }),
+    'retrain_result': (200, {
+        'result': 'success',
+        'retrainId': 'retrain123'
+    }),
+    'retrain_updated': (200, {
+        'retrainId': 'retrain123'
+    }),
+    'train_started': (200, {
+        'exp_id': 'exp123',
+        'experimentId': 'exp123',
+        'jobIds': ['job1', 'job2'],
+        'user': 'user123',
+        'serviceId': 'service123',
+        'startTimeStamp': 1234567890
+    }),
+    'train_logs': (200, {
+        'logs': ['log1', 'log2', 'log3'],
+        'result': 'success'
+    }),
+    'train_code': (200, {
+        'code': 'def train_model():\n    pass',
+        'result': 'success'
+    }),
+    'train_import': (200, {
+        'importId': 'import123',
+        'result': 'success'
+    }),
+    'train_status': (200, {
+        'status': 'completed',
+        'jobIds': ['job1', 'job2'],
+        'result': 'success'
+    }),
+    'train_params': (200, {
+        'params': {
+            'algorithm': 'RandomForest',
+            'hyperparameters': {
+                'n_estimators': 100,
+                'max_depth': 10
+            }
+        },
+        'result': 'success'
+    }),
+    'experiment_details': (200, {
+        'exp123': {
+            'exp_id': 'exp123',
+            'ser_id': 'service123',
+            'report_id': 'report123',
+            'creation_date': '2025-04-09T10:25:14',
+            'name': 'test_experiment',
+            'mode': 'aws-sklearn-serverless',
+            'launch_mode': 'automatic',
+            'instance_type': 'ml.m5.large',
+            'status': 'Completed',
+            'train_data_id': 'train123',
+            'test_data_id': 'test123',
+            'predict_column': 'target',
+            'job_ids': '["job1", "job2"]',
+            'hyper_params': '{"n_estimators": 100}',
+            'job_status_details': '{"status": "Completed"}',
+            'result': '{"accuracy": 0.95}',
+            'metrics': '{"f1_score": 0.94}',
+            'cost': 1.23,
+            'user_id': 'user123'
+        }
+    }),
+    'experiment_result': (200, {
+        'result': 'success',
+        'exp_id': 'exp123'
+    }),
+}
+
+
+class ResponseFactory:
+    # Serializes every (shape, overrides) combination once and returns the
+    # same immutable bytes afterwards. Overrides replace top-level body keys.
+    # Responses are new dicts around the shared bytes, with stream=True the
+    # Payload is a BytesIO over them as boto3 returns it.
+
+    def __init__(self, shapes=RESPONSE_SHAPES):
+        self.shapes = shapes
+        self.builds = 0
+        self._payloads = {}
+        self._interned = {}
+        self._lock = threading.Lock()
+
+    def payload(self, name, overrides=None, status_code=None):
+        key = (name, json.dumps(overrides, sort_keys=True) if overrides else None, status_code)
+        payload = self._payloads.get(key)
+        if payload is None:
+            default_status, body = self.shapes[name]
+            if overrides:
+                body = dict(body, **overrides)
+            data = json.dumps({'statusCode': status_code or default_status, 'body': json.dumps(body)}).encode('utf-8')
+            with self._lock:
+                self.builds += 1
+                payload = self._payloads.setdefault(key, self._interned.setdefault(data, data))
+        return payload
+
+    def response(self, name, overrides=None, status_code=None, stream=False):
+        payload = self.payload(name, overrides, status_code)
+        return {
+            'StatusCode': status_code or self.shapes[name][0],
+            'Payload': io.BytesIO(payload) if stream else payload
+        }
@@ -0,0 +1,220 @@
+from typing import NamedTuple
+import argparse
+import heapq
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATHS = ('Pytest_tests', 'Model_generated_files')
+DURATIONS_FILE = os.path.join(TESTS_DIR, '.test_durations.json')
+# Tests without history are packed with this estimate until they have run once
+DEFAULT_DURATION = 0.1
+DURATIONS_ENV = 'SHARD_RUNNER_DURATIONS'
+# File with the node ids a shard runs, one per line. Keeps them off the
+# command line, which has a length limit.
+TESTS_ENV = 'SHARD_RUNNER_TESTS'
+POLL_INTERVAL = 0.01
+# The suites share test module basenames (test_ask_ai.py), importlib mode lets
+# one process collect both
+PYTEST_ARGS = ['-p', 'no:cacheprovider', '--import-mode=importlib']
+
+
+class ShardResult(NamedTuple):
+    index: int
+    tests: list
+    predicted: float
+    wall: float
+    returncode: int
+    output: str
+    durations: dict
+
+
+# pytest plugin, loaded in each shard with `-p shard_runner`: keeps the tests
+# listed where TESTS_ENV points, sums setup, call and teardown time per test
+# and writes them where DURATIONS_ENV points
+_recorded = {}
+
+
+def pytest_collection_modifyitems(config, items):
+    path = os.environ.get(TESTS_ENV)
+    if not path:
+        return
+    with open(path) as tests_file:
+        selected = set(tests_file.read().splitlines())
+    deselected = [item for item in items if item.nodeid not in selected]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = [item for item in items if item.nodeid in selected]
+
+
+def pytest_runtest_logreport(report):
+    _recorded[report.nodeid] = _recorded.get(report.nodeid, 0.0) + report.duration
+
+
+def pytest_sessionfinish(session):
+    path = os.environ.get(DURATIONS_ENV)
+    if path:
+        with open(path, 'w') as durations_file:
+            json.dump(_recorded, durations_file)
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [TESTS_DIR, env.get('PYTHONPATH')]))
+    return env
+
+
+def collect(paths=DEFAULT_PATHS, cwd=TESTS_DIR, python=sys.executable):
+    result = subprocess.run([python, '-m', 'pytest', '--collect-only', '-q', '--rootdir', cwd] + PYTEST_ARGS
+                            + list(paths),
+                            cwd=cwd, env=_env(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if result.returncode not in (0, 5):
+        raise RuntimeError('Test collection failed:\n' + result.stdout)
+    return [line.strip() for line in result.stdout.splitlines() if '::' in line and not line.startswith(' ')]
+
+
+def load_durations(path=DURATIONS_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as durations_file:
+        return json.load(durations_file)
+
+
+def save_durations(durations, path=DURATIONS_FILE):
+    # Merges into the history so tests outside this run keep their timings
+    history = load_durations(path)
+    history.update(durations)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as durations_file:
+        json.dump(history, durations_file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    return history
+
+
+def estimate(tests, durations):
+    # Unknown tests get the median of the known ones
+    known = [durations[test] for test in tests if test in durations]
+    default = statistics.median(known) if known else DEFAULT_DURATION
+    return {test: durations.get(test, default) for test in tests}
+
+
+def pack(tests, durations, shards):
+    # Longest processing time first: each test goes to the least loaded shard.
+    # Returns [(predicted seconds, [tests])], tests in collection order.
+    estimates = estimate(tests, durations)
+    order = {test: i for i, test in enumerate(tests)}
+    heap = [(0.0, index) for index in range(max(1, shards))]
+    bins = [[] for _ in heap]
+    loads = [0.0 for _ in heap]
+    for test in sorted(tests, key=lambda test: (-estimates[test], order[test])):
+        load, index = heapq.heappop(heap)
+        bins[index].append(test)
+        loads[index] = load + estimates[test]
+        heapq.heappush(heap, (loads[index], index))
+    return [(load, sorted(tests, key=order.get)) for load, tests in zip(loads, bins)]
+
+
+def _run_shard(index, tests, predicted, paths, cwd, python, extra_args, workdir):
+    # Output goes to a file so a shard never blocks on a full pipe while
+    # another one is being waited on
+    base = os.path.join(workdir, 'shard-{}'.format(index))
+    with open(base + '.tests', 'w') as tests_file:
+        tests_file.write('\n'.join(tests))
+    env = _env()
+    env[DURATIONS_ENV] = base + '.json'
+    env[TESTS_ENV] = base + '.tests'
+    output = open(base + '.log', 'w+')
+    start = time.perf_counter()
+    process = subprocess.Popen([python, '-m', 'pytest', '-q', '-p', 'shard_runner', '--rootdir', cwd] + PYTEST_ARGS
+                               + list(extra_args) + list(paths), cwd=cwd, env=env, stdout=output,
+                               stderr=subprocess.STDOUT, text=True)
+    return index, tests, predicted, start, process, output, base + '.json'
+
+
+def _shard_result(running, wall):
+    index, tests, predicted, _, process, output, durations_path = running
+    output.seek(0)
+    text = output.read()
+    output.close()
+    durations = {}
+    if os.path.exists(durations_path):
+        with open(durations_path) as shard_file:
+            durations = json.load(shard_file)
+    return ShardResult(index, tests, predicted, wall, process.returncode, text, durations)
+
+
+def run_shards(paths=DEFAULT_PATHS, shards=None, durations_file=DURATIONS_FILE, cwd=TESTS_DIR,
+               python=sys.executable, extra_args=()):
+    tests = collect(paths, cwd, python)
+    packed = pack(tests, load_durations(durations_file), shards or os.cpu_count() or 1)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        running = [_run_shard(index, shard_tests, predicted, paths, cwd, python, extra_args, workdir)
+                   for index, (predicted, shard_tests) in enumerate(packed) if shard_tests]
+        # Polls all shards so each wall time ends when that shard exits
+        while running:
+            for shard in list(running):
+                if shard[4].poll() is not None:
+                    results.append(_shard_result(shard, time.perf_counter() - shard[3]))
+                    running.remove(shard)
+            if running:
+                time.sleep(POLL_INTERVAL)
+    results.sort(key=lambda result: result.index)
+    durations = {}
+    for result in results:
+        durations.update(result.durations)
+    if durations:
+        save_durations(durations, durations_file)
+    return results
+
+
+def imbalance(results):
+    # How much longer the slowest shard took than the average one
+    walls = [result.wall for result in results]
+    if not walls or not sum(walls):
+        return 0.0
+    return max(walls) / (sum(walls) / len(walls)) - 1
+
+
+def format_report(results, slowest=10):
+    durations = {}
+    for result in results:
+        durations.update(result.durations)
+    lines = ['Slowest {} tests:'.format(min(slowest, len(durations)))]
+    for test, seconds in sorted(durations.items(), key=lambda item: -item[1])[:slowest]:
+        lines.append('  {:8.3f}s  {}'.format(seconds, test))
+    lines.append('Shards:')
+    for result in results:
+        lines.append('  #{:<3} {:4} tests  predicted {:7.3f}s  wall {:7.3f}s  {}'.format(
+            result.index, len(result.tests), result.predicted, result.wall,
+            'ok' if result.returncode == 0 else 'FAILED ({})'.format(result.returncode)))
+    lines.append('Imbalance: {:.1%} (slowest shard vs mean)'.format(imbalance(results)))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the test suites in duration-balanced parallel shards')
+    parser.add_argument('paths', nargs='*', help='test paths, default: {}'.format(' '.join(DEFAULT_PATHS)))
+    parser.add_argument('-n', '--shards', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--durations-file', default=DURATIONS_FILE)
+    parser.add_argument('--slowest', type=int, default=10)
+    args, extra_args = parser.parse_known_args(argv)
+
+    # Node ids, and so the history keys, stay relative to the tests directory
+    paths = [os.path.relpath(os.path.abspath(path), TESTS_DIR) for path in args.paths] or DEFAULT_PATHS
+    results = run_shards(paths, args.shards, args.durations_file, extra_args=extra_args)
+    for result in results:
+        if result.returncode != 0:
+            print('--- shard #{} ---'.format(result.index))
+            print(result.output)
+    print(format_report(results, args.slowest))
+    return max([result.returncode for result in results] or [0])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
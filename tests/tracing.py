@@ -0,0 +1,126 @@
+from bisect import bisect_left
+import json
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger('lambda_utils')
+
+# Upper bounds of the latency histogram buckets in milliseconds
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float('inf')]
+
+
+def log_payload(message, payload):
+    # Payloads are only serialized when debug logging is switched on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, json.dumps(payload))
+
+
+class InvocationMetrics:
+    # Per-function call counts, error counts and latency histograms
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def record(self, function_name, seconds, error=False):
+        index = bisect_left(self.buckets, seconds * 1000)
+        with self._lock:
+            stats = self._functions.get(function_name)
+            if stats is None:
+                stats = {'count': 0, 'errors': 0, 'seconds': 0.0, 'buckets': [0] * len(self.buckets)}
+                self._functions[function_name] = stats
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['buckets'][index] += 1
+            if error:
+                stats['errors'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                function_name: dict(stats, buckets=list(stats['buckets']))
+                for function_name, stats in self._functions.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._functions = {}
+
+    def render_prometheus(self):
+        lines = []
+        for function_name, stats in sorted(self.snapshot().items()):
+            label = 'function="{}"'.format(function_name)
+            cumulative = 0
+            for bound, count in zip(self.buckets, stats['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else str(bound / 1000)
+                lines.append('lambda_invoke_seconds_bucket{{{},le="{}"}} {}'.format(label, le, cumulative))
+            lines.append('lambda_invoke_seconds_sum{{{}}} {}'.format(label, stats['seconds']))
+            lines.append('lambda_invoke_seconds_count{{{}}} {}'.format(label, stats['count']))
+            lines.append('lambda_invoke_errors_total{{{}}} {}'.format(label, stats['errors']))
+        return '\n'.join(lines) + '\n'
+
+
+class Tracer:
+    # Pre/post invoke hooks with sampling. Hooks are called as
+    # pre(function_name, payload) and
+    # post(function_name, payload, response, error, seconds).
+    # With no hooks and metrics off, start() returns None and the invoke
+    # path does no extra work.
+
+    def __init__(self, sample_rate=1.0, metrics=True):
+        self.sample_rate = sample_rate
+        self.metrics_enabled = metrics
+        self.metrics = InvocationMetrics()
+        self.pre_invoke_hooks = []
+        self.post_invoke_hooks = []
+
+    @property
+    def enabled(self):
+        return self.metrics_enabled or bool(self.pre_invoke_hooks or self.post_invoke_hooks)
+
+    def add_pre_invoke_hook(self, hook):
+        self.pre_invoke_hooks.append(hook)
+
+    def add_post_invoke_hook(self, hook):
+        self.post_invoke_hooks.append(hook)
+
+    def clear_hooks(self):
+        self.pre_invoke_hooks = []
+        self.post_invoke_hooks = []
+
+    def _sampled(self):
+        if not (self.pre_invoke_hooks or self.post_invoke_hooks):
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _call_hooks(self, hooks, *args):
+        for hook in hooks:
+            try:
+                hook(*args)
+            except Exception as e:
+                logger.warning('Tracing hook %s failed: %s', hook, e)
+
+    def start(self, function_name, payload):
+        if not self.enabled:
+            return None
+        sampled = self._sampled()
+        if sampled:
+            self._call_hooks(self.pre_invoke_hooks, function_name, payload)
+        return (function_name, payload, time.perf_counter(), sampled)
+
+    def finish(self, span, response=None, error=None):
+        if span is None:
+            return
+        function_name, payload, start, sampled = span
+        seconds = time.perf_counter() - start
+        if self.metrics_enabled:
+            self.metrics.record(function_name, seconds, error is not None)
+        if sampled:
+            self._call_hooks(self.post_invoke_hooks, function_name, payload, response, error, seconds)
+
+
+TRACER = Tracer()